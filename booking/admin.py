@@ -1,5 +1,14 @@
-from django.contrib import admin
-from .models import Airport, Flight, Account, TicketType, FlightTicketType, Booking, Payment, Card, Voucher, Passenger
+import io
+import tempfile
+from django.contrib import admin, messages
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import path, reverse
+from django.utils.translation import gettext_lazy as _
+from .exports import MERGED_PDF_MAX_TICKETS, stream_ticket_zip, write_merged_pdf
+from .forms import ScheduleImportForm
+from .schedule_import import ScheduleRowError, import_schedule
+from .models import Airport, Flight, Account, TicketType, FlightTicketType, Booking, Payment, Card, Voucher, Passenger, Job
 
 admin.site.register(Airport)
 @admin.register(Flight)
@@ -7,11 +16,70 @@ class FlightAdmin(admin.ModelAdmin):
     list_display = ('flight_number', 'departure_airport', 'arrival_airport', 'departure_time', 'arrival_time')
     list_filter = ('departure_airport', 'arrival_airport', 'departure_time', 'arrival_time')
     search_fields = ('flight_number', 'departure_airport__name', 'arrival_airport__name')
+    change_list_template = 'admin/booking/flight/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_schedule_view), name='booking_flight_import'),
+        ] + super().get_urls()
+
+    def import_schedule_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect(reverse('admin:booking_flight_changelist'))
+        form = ScheduleImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            # Django keeps large uploads on disk, this only reads them line by line
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                report = import_schedule(stream, batch_size=form.cleaned_data['batch_size'])
+            except ScheduleRowError as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, str(report))
+                for error in report.errors:
+                    messages.warning(request, error)
+                return redirect(reverse('admin:booking_flight_changelist'))
+        return render(request, 'admin/booking/flight/import_schedule.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Import schedule'),
+            'form': form,
+        })
 admin.site.register(Account)
 admin.site.register(TicketType)
 admin.site.register(FlightTicketType)
-admin.site.register(Booking)
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ('booking_id', 'account', 'flight_ticket_type', 'booking_date', 'status')
+    list_filter = ('status',)
+    list_select_related = ('account', 'flight_ticket_type__flight', 'flight_ticket_type__ticket_type')
+    actions = ['export_tickets_zip', 'export_tickets_pdf']
+
+    @admin.action(description=_("Download tickets as a ZIP archive"))
+    def export_tickets_zip(self, request, queryset):
+        response = StreamingHttpResponse(stream_ticket_zip(queryset), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="tickets.zip"'
+        return response
+
+    @admin.action(description=_("Download tickets as one PDF"))
+    def export_tickets_pdf(self, request, queryset):
+        if queryset.count() > MERGED_PDF_MAX_TICKETS:
+            self.message_user(request, _(
+                "Select at most %(limit)s bookings for one PDF, or download them as a ZIP archive."
+            ) % {'limit': MERGED_PDF_MAX_TICKETS}, messages.ERROR)
+            return None
+        # The merged PDF goes to a temporary file so it is not held in memory while it is sent
+        output = tempfile.TemporaryFile()
+        write_merged_pdf(queryset, output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename='tickets.pdf', content_type='application/pdf')
 admin.site.register(Payment)
 admin.site.register(Card)
 admin.site.register(Voucher)
 admin.site.register(Passenger)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'name', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
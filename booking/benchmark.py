@@ -0,0 +1,170 @@
+import json
+import math
+import platform
+import random
+import time
+from collections import defaultdict
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .datagen import airport_code, generate
+from .jobs import run_pending
+from .models import Account, FlightSearchIndex
+
+FUNNEL = ['index', 'book_infor', 'payment', 'process', 'print_ticket']
+
+BENCH_USERNAME = 'benchuser'
+BENCH_PASSWORD = 'benchpass'
+# Queries per request a run may add over the baseline without failing
+QUERY_SLACK = 0.1
+
+
+def seed(scale, seed=0, log=None):
+    """Fill an empty database with a generated data set and the benchmark account.
+
+    The generator always links its two biggest hubs in both directions
+    every day; the benchmark searches and books on that route.
+    """
+    generate(**scale, seed=seed, log=log)
+    Account.objects.create_user(
+        username=BENCH_USERNAME, password=BENCH_PASSWORD, email='benchuser@example.com',
+        phone_number='0123456789', role='Member'
+    )
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Recorder:
+    """Collects the latency and query count of every request per view."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+
+    def call(self, name, method, *args, **kwargs):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = method(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} answered {response.status_code}.")
+        self.latencies[name].append(elapsed)
+        self.queries[name].append(len(captured.captured_queries))
+        return response
+
+    def report(self):
+        """Return per view throughput, p50/p90/p99 latency in ms and queries per request."""
+        report = {}
+        for name in FUNNEL:
+            latencies = self.latencies.get(name)
+            if not latencies:
+                continue
+            report[name] = {
+                'requests': len(latencies),
+                'throughput': round(len(latencies) / sum(latencies), 2),
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+                'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+                'queries': round(sum(self.queries[name]) / len(latencies), 2),
+            }
+        return report
+
+
+def run_funnel(iterations, seed=0, recorder=None):
+    """Search, pick a flight, enter a passenger, pay and print, iterations times."""
+    rng = random.Random(seed)
+    recorder = recorder or Recorder()
+    client = Client()
+    client.force_login(Account.objects.get(username=BENCH_USERNAME))
+    origin, destination = airport_code(0), airport_code(1)
+    days = sorted(set(FlightSearchIndex.objects.filter(
+        departure_airport=origin, arrival_airport=destination).values_list('departure_date', flat=True)))
+    for _iteration in range(iterations):
+        day = rng.choice(days)
+        response = recorder.call('index', client.get, reverse('index'), {
+            'tripType': 'oneway',
+            'from': origin,
+            'to': destination,
+            'departureDate': day.strftime('%Y-%m-%d'),
+            'numPassengers': 1,
+            'chairType': 'Economy',
+        })
+        flight = response.context['departure_flights'][0]
+        recorder.call('book_infor', client.get, reverse('book_infor'), {
+            'd_flight_id': flight.flight_id,
+            'flight_ticket_type': 'Economy',
+            'num_passengers': 1,
+        })
+        response = recorder.call('payment', client.post, reverse('payment'), {
+            'flight1': flight.flight_id,
+            'flight1Class': 'Economy',
+            'countryCode': '84',
+            'mobile': '123456789',
+            'email': 'benchuser@example.com',
+            'numPassengers': '1',
+            'passenger0Fname': 'Bench',
+            'passenger0Lname': 'User',
+            'passenger0Gender': 'Male',
+            'passenger0DateOfBirth': '1990-01-01',
+            'passenger0Nationality': 'Viet Nam',
+            # Only used when the flight is international
+            'passenger0PassportNumber': 'B1234567',
+            'passenger0CountryOfIssue': 'Viet Nam',
+            'passenger0PassportExpireDate': '2060-01-01',
+        })
+        booking_id = response.context['ticket1']
+        recorder.call('process', client.post, reverse('process'), {
+            'ticket1': booking_id,
+            'cardNumber': '4111111111111111',
+            'cardHolderName': 'Bench User',
+            'expMonth': '01',
+            'expYear': '2060',
+            'cardType': 'Visa',
+        })
+        # In production runworker does this alongside the requests
+        run_pending()
+        recorder.call('print_ticket', client.post, reverse('print_ticket', kwargs={'booking_id': booking_id}))
+    return recorder
+
+
+def environment(scale_name):
+    """Describe where a result was measured, so baselines are compared like for like."""
+    return {
+        'scale': scale_name,
+        'database': connection.vendor,
+        'python': platform.python_version(),
+    }
+
+
+def compare(report, baseline, latency_tolerance):
+    """Return the regressions of report against a baseline report, as text lines.
+
+    Query counts must not grow by more than QUERY_SLACK per request, which
+    only absorbs the odd timing-dependent query (a hold sweep, a heartbeat)
+    and never a whole query added to every request. Latencies depend
+    on the machine, so only the p90 is gated and it may grow by
+    latency_tolerance (0.5 = 50 %); the p99 of a short run is close to its
+    slowest request and too noisy to fail on.
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        measured = report.get(name)
+        if measured is None:
+            continue
+        if measured['queries'] > expected['queries'] + QUERY_SLACK:
+            regressions.append(f"{name}: {measured['queries']} queries per request, baseline {expected['queries']}")
+        if measured['p90_ms'] > expected['p90_ms'] * (1 + latency_tolerance):
+            regressions.append(f"{name}: p90 {measured['p90_ms']} ms, baseline {expected['p90_ms']} ms")
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as source:
+        return json.load(source)
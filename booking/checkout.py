@@ -0,0 +1,72 @@
+from django.db import connections, router, transaction
+from django.db.models import Q
+from .holds import place_holds
+from .models import Booking, FlightTicketType
+
+
+def _insert(objs):
+    """Insert new rows and fill in their primary keys.
+
+    Backends that return ids from a multi-row INSERT get a single query;
+    MySQL does not, so the rows are saved one by one there.
+    """
+    if not objs:
+        return objs
+    model = type(objs[0])
+    if connections[router.db_for_write(model)].features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+    for obj in objs:
+        obj.save(force_insert=True)
+    return objs
+
+
+def resolve_legs(legs):
+    """Return the FlightTicketType of every (flight, ticket type name) leg in one query.
+
+    Raises FlightTicketType.DoesNotExist if a flight does not sell that class.
+    """
+    condition = Q(pk__in=[])
+    for flight, ticket_type_name in legs:
+        condition |= Q(flight=flight, ticket_type__name=ticket_type_name)
+    found = {
+        (ftt.flight_id, ftt.ticket_type.name): ftt
+        for ftt in FlightTicketType.objects.filter(condition).select_related('ticket_type')
+    }
+    try:
+        return [found[(flight.pk, ticket_type_name)] for flight, ticket_type_name in legs]
+    except KeyError:
+        raise FlightTicketType.DoesNotExist("The flight does not sell this ticket type.")
+
+
+def checkout(user, passengers, seat_count, legs, phone_number, email):
+    """Create one booking per leg for the same passengers and hold their seats.
+
+    passengers are unsaved Passenger objects. They are all validated
+    before anything is written. The writes then happen in one
+    transaction with a fixed number of statements: passengers,
+    bookings and passenger links are each one bulk INSERT, the account
+    is one UPDATE, and each leg holds its seats with a single UPDATE.
+    Returns the bookings in leg order; InsufficientSeats rolls
+    everything back.
+    """
+    for passenger in passengers:
+        # The form posts gender as a translated label, so it is not held to the choices
+        passenger.full_clean(exclude=['gender'])
+    flight_ticket_types = resolve_legs(legs)
+    with transaction.atomic():
+        _insert(passengers)
+        user.phone_number = phone_number
+        user.email = email
+        user.save(update_fields=['phone_number', 'email'])
+        bookings = _insert([
+            Booking(account=user, flight_ticket_type=flight_ticket_type, seat_number=seat_count)
+            for flight_ticket_type in flight_ticket_types
+        ])
+        Through = Booking.passengers.through
+        Through.objects.bulk_create([
+            Through(booking_id=booking.pk, passenger_id=passenger.pk)
+            for booking in bookings
+            for passenger in passengers
+        ])
+        place_holds(bookings)
+    return bookings
@@ -0,0 +1,180 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from .constants import (
+    CONNECTION_MIN_LAYOVER_MINUTES, CONNECTION_MAX_LAYOVER_MINUTES, CONNECTION_MAX_STOPS,
+    CONNECTION_RESULT_LIMIT, CONNECTION_BUDGET_MS, CONNECTION_GRAPH_TTL_SECONDS
+)
+from .models import FlightSearchIndex
+
+# Connections can run into the next day, so the graph keeps two extra days
+GRAPH_EXTRA_DAYS = 2
+GRAPH_CACHE_SIZE = 32
+BUDGET_CHECK_EVERY = 256
+
+Itinerary = namedtuple('Itinerary', ['price', 'duration', 'legs'])
+Leg = namedtuple('Leg', ['flight_id', 'departure_airport', 'arrival_airport', 'departure_time', 'arrival_time', 'price'])
+
+
+def _epoch(value):
+    return int(value.timestamp())
+
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc)
+
+
+class FlightGraph:
+    """The flights of a few days for one ticket type, as compact adjacency arrays.
+
+    Airports are numbered, and flights are sorted by departure airport
+    and then departure time, so the flights leaving an airport are the
+    slice offsets[a]:offsets[a + 1] of every column. The first flight
+    leaving after a given moment is found with a binary search in that
+    slice. Times are epoch seconds and prices whole currency units.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row[1], row[3]))
+        self.codes = sorted({row[1] for row in rows} | {row[2] for row in rows})
+        self.index = {code: number for number, code in enumerate(self.codes)}
+        self.flight_ids = array('q')
+        self.destinations = array('l')
+        self.departures = array('q')
+        self.arrivals = array('q')
+        self.prices = array('q')
+        self.seats = array('l')
+        self.dates = []
+        self.offsets = array('l', [0] * (len(self.codes) + 1))
+        for flight_id, origin, destination, departure, arrival, price, seats, departure_date in rows:
+            self.flight_ids.append(flight_id)
+            self.destinations.append(self.index[destination])
+            self.departures.append(_epoch(departure))
+            self.arrivals.append(_epoch(arrival))
+            self.prices.append(int(price))
+            self.seats.append(seats)
+            self.dates.append(departure_date)
+            self.offsets[self.index[origin] + 1] += 1
+        for number in range(len(self.codes)):
+            self.offsets[number + 1] += self.offsets[number]
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def load(cls, first_day, ticket_type_id):
+        """Read the graph of first_day and the days after it from the search index."""
+        rows = FlightSearchIndex.objects.filter(
+            departure_date__range=(first_day, first_day + timedelta(days=GRAPH_EXTRA_DAYS)),
+            ticket_type=ticket_type_id,
+        ).values_list(
+            'flight_id', 'departure_airport_id', 'arrival_airport_id', 'departure_time',
+            'arrival_time', 'price', 'available_seats', 'departure_date'
+        )
+        return cls(rows)
+
+    def departures_after(self, airport, moment):
+        """Return the range of flights leaving airport at or after moment."""
+        start, end = self.offsets[airport], self.offsets[airport + 1]
+        return range(bisect_left(self.departures, moment, start, end), end)
+
+
+_graphs = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def get_graph(first_day, ticket_type_id):
+    """Return the graph of a day, built at most once per CONNECTION_GRAPH_TTL_SECONDS.
+
+    Seats in a cached graph can be up to that old; the booking pages
+    check them again before anything is sold.
+    """
+    key = (first_day, ticket_type_id)
+    with _graphs_lock:
+        graph = _graphs.get(key)
+        if graph is not None and time.monotonic() - graph.built_at < CONNECTION_GRAPH_TTL_SECONDS:
+            _graphs.move_to_end(key)
+            return graph
+    graph = FlightGraph.load(first_day, ticket_type_id)
+    with _graphs_lock:
+        _graphs[key] = graph
+        _graphs.move_to_end(key)
+        while len(_graphs) > GRAPH_CACHE_SIZE:
+            _graphs.popitem(last=False)
+    return graph
+
+
+def clear_graphs():
+    with _graphs_lock:
+        _graphs.clear()
+
+
+def search_graph(graph, origin, destination, day, num_passengers=1, max_stops=CONNECTION_MAX_STOPS,
+                 limit=CONNECTION_RESULT_LIMIT, min_layover=CONNECTION_MIN_LAYOVER_MINUTES,
+                 max_layover=CONNECTION_MAX_LAYOVER_MINUTES, budget_ms=CONNECTION_BUDGET_MS):
+    """Return (itineraries, complete) from origin to destination leaving on day.
+
+    Partial itineraries are expanded cheapest first, then shortest, so
+    complete ones come out in (price, duration) order and the search can
+    stop at the limit-th. Layovers stay between min_layover and
+    max_layover minutes and no airport is visited twice. If budget_ms
+    runs out first, the itineraries found so far are returned with
+    complete set to False.
+    """
+    if origin not in graph.index or destination not in graph.index:
+        return [], True
+    deadline = time.perf_counter() + budget_ms / 1000
+    origin, destination = graph.index[origin], graph.index[destination]
+    min_layover, max_layover = min_layover * 60, max_layover * 60
+    heap = []
+    start, end = graph.offsets[origin], graph.offsets[origin + 1]
+    for flight in range(start, end):
+        if graph.dates[flight] == day and graph.seats[flight] >= num_passengers:
+            heap.append((graph.prices[flight], graph.arrivals[flight] - graph.departures[flight], (flight,)))
+    heapq.heapify(heap)
+    found = []
+    expanded = 0
+    while heap and len(found) < limit:
+        expanded += 1
+        if expanded % BUDGET_CHECK_EVERY == 0 and time.perf_counter() > deadline:
+            return found, False
+        price, duration, path = heapq.heappop(heap)
+        last = path[-1]
+        airport = graph.destinations[last]
+        if airport == destination:
+            found.append(Itinerary(price, duration, path))
+            continue
+        if len(path) > max_stops:
+            continue
+        visited = {origin} | {graph.destinations[flight] for flight in path}
+        landed = graph.arrivals[last]
+        first_departure = graph.departures[path[0]]
+        for flight in graph.departures_after(airport, landed + min_layover):
+            if graph.departures[flight] > landed + max_layover:
+                break
+            if graph.seats[flight] < num_passengers or graph.destinations[flight] in visited:
+                continue
+            heapq.heappush(heap, (
+                price + graph.prices[flight], graph.arrivals[flight] - first_departure, path + (flight,)))
+    return found, True
+
+
+def legs(graph, itinerary):
+    """Spell out the flights of an itinerary found in graph."""
+    result = []
+    for flight in itinerary.legs:
+        origin = graph.codes[bisect_left(graph.offsets, flight + 1) - 1]
+        result.append(Leg(
+            graph.flight_ids[flight], origin, graph.codes[graph.destinations[flight]],
+            _datetime(graph.departures[flight]), _datetime(graph.arrivals[flight]), graph.prices[flight]
+        ))
+    return result
+
+
+def find_connections(origin, destination, day, ticket_type_id, num_passengers=1, **options):
+    """Search the cached graph of day; return (list of (itinerary, legs), complete)."""
+    graph = get_graph(day, ticket_type_id)
+    itineraries, complete = search_graph(graph, origin, destination, day, num_passengers, **options)
+    return [(itinerary, legs(graph, itinerary)) for itinerary in itineraries], complete
@@ -31,6 +31,13 @@ BOOKING_STATUS = [
     ('DeniedCancellation', _('DeniedCancellation'))
 ]
 
+JOB_STATUS = [
+    ('Pending', _('Pending')),
+    ('Running', _('Running')),
+    ('Done', _('Done')),
+    ('Failed', _('Failed')),
+]
+
 PAYMENT_METHOD_CHOICES = [
         ('Credit Card', _('Credit Card')),
         ('PayPal', _('PayPal')),
@@ -47,3 +54,55 @@ REGEX_PATTERN_EMAIL = r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
 PRICE_FORMAT = '{:,.0f}'
 
 ISO = 'ISO-8859-1'
+
+SEAT_HOLD_TTL_MINUTES = 15
+
+SEAT_HOLD_SWEEP_BATCH_SIZE = 500
+
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+IDEMPOTENCY_KEY_FIELD = 'idempotencyKey'
+
+FLIGHT_LIST_PAGE_SIZE = 20
+
+BOOKING_LIST_PAGE_SIZE = 20
+
+ROUND_TRIP_MIN_GAP_MINUTES = 60
+
+ROUND_TRIP_PAIR_LIMIT = 10
+
+CONNECTION_MIN_LAYOVER_MINUTES = 45
+
+CONNECTION_MAX_LAYOVER_MINUTES = 360
+
+CONNECTION_MAX_STOPS = 2
+
+CONNECTION_RESULT_LIMIT = 10
+
+CONNECTION_BUDGET_MS = 200
+
+CONNECTION_GRAPH_TTL_SECONDS = 60
+
+FARE_CALENDAR_DAYS = 3
+
+FARE_CALENDAR_MAX_DAYS = 15
+
+SEARCH_API_CHUNK_SIZE = 500
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+JOB_MAX_ATTEMPTS = 5
+
+JOB_RETRY_BASE_SECONDS = 10
+
+JOB_RETRY_MAX_SECONDS = 3600
+
+JOB_LOCK_TIMEOUT_SECONDS = 600
+
+JOB_HEARTBEAT_SECONDS = 60
+
+JOB_POLL_SECONDS = 1
+
+CONFIRMATION_EMAIL_BATCH_SIZE = 100
+
+CONFIRMATION_EMAIL_DELAY_SECONDS = 5
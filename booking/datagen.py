@@ -0,0 +1,271 @@
+import math
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from .models import (
+    Account, Airport, Booking, Flight, FlightSearchIndex, FlightTicketType, TicketType
+)
+
+SCALES = {
+    'small': {'airports': 50, 'days': 30, 'flights_per_day': 40, 'accounts': 200, 'bookings': 2000},
+    'medium': {'airports': 1000, 'days': 365, 'flights_per_day': 500, 'accounts': 20000, 'bookings': 200000},
+    'large': {'airports': 5000, 'days': 365, 'flights_per_day': 5000, 'accounts': 200000, 'bookings': 2000000},
+}
+
+CHUNK_SIZE = 5000
+
+# name, price multiplier, seat range
+TICKET_TYPES = [
+    ('Economy', 1, (150, 200)),
+    ('Business', 3, (8, 30)),
+]
+
+TIMEZONES = [
+    'Asia/Ho_Chi_Minh', 'Asia/Bangkok', 'Asia/Singapore', 'Asia/Tokyo', 'Asia/Seoul',
+    'Europe/London', 'Europe/Paris', 'America/New_York', 'America/Los_Angeles', 'Australia/Sydney',
+]
+
+BOOKING_STATUSES = [
+    ('Confirmed', 88),
+    ('Canceled', 7),
+    ('PendingCancellation', 3),
+    ('DeniedCancellation', 2),
+]
+
+# Monday to Sunday
+WEEKDAY_FACTORS = [1.0, 0.9, 0.9, 1.0, 1.15, 1.05, 1.1]
+
+PASSWORD = 'generated'
+
+
+def airport_code(index):
+    """Return a three letter code for the index-th airport: AAA, AAB, ..."""
+    letters = []
+    for _position in range(3):
+        index, letter = divmod(index, 26)
+        letters.append(chr(ord('A') + letter))
+    return ''.join(reversed(letters))
+
+
+def season_factor(day):
+    """Relative amount of traffic on a date: a summer peak and busy weekends."""
+    yearly = 1 + 0.2 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 200) / 365.25)
+    return yearly * WEEKDAY_FACTORS[day.weekday()]
+
+
+def bulk_insert(model, rows, chunk_size=CHUNK_SIZE):
+    """Insert rows from an iterable chunk by chunk; return how many were written."""
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _weighted_index(rng, cumulative):
+    """Pick an index from cumulative weights."""
+    total = cumulative[-1]
+    point = rng.random() * total
+    low, high = 0, len(cumulative) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if cumulative[middle] <= point:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def build_routes(rng, airports, count):
+    """Return count distinct routes as (origin index, destination index, weight, minutes).
+
+    Airport popularity follows a Zipf distribution, so a few hubs carry
+    most of the traffic. The first two routes always link the two
+    biggest hubs in both directions.
+    """
+    popularity = [1 / (rank + 1) for rank in range(airports)]
+    cumulative = []
+    running = 0
+    for weight in popularity:
+        running += weight
+        cumulative.append(running)
+    # Keep the routes under half of the possible pairs so random picks stay fast
+    count = min(count, max(2, airports * (airports - 1) // 2))
+    pairs = [(0, 1), (1, 0)][:count]
+    seen = set(pairs)
+    while len(pairs) < count:
+        pair = (_weighted_index(rng, cumulative), _weighted_index(rng, cumulative))
+        if pair[0] != pair[1] and pair not in seen:
+            seen.add(pair)
+            pairs.append(pair)
+    return [
+        (origin, destination, popularity[origin] * popularity[destination], rng.randrange(45, 600, 5))
+        for origin, destination in pairs
+    ]
+
+
+class Generator:
+    """Writes a synthetic schedule, inventory, accounts and booking history.
+
+    Every row is produced by one seeded random generator and written
+    with bulk_create in chunks, with primary keys worked out up front,
+    so the output is the same for the same seed and start day and memory
+    stays flat however many rows are asked for.
+    """
+
+    def __init__(self, airports, days, flights_per_day, accounts, bookings,
+                 seed=0, start=None, chunk_size=CHUNK_SIZE, log=None):
+        self.airports = airports
+        self.days = days
+        self.flights_per_day = flights_per_day
+        self.accounts = accounts
+        self.bookings = bookings
+        self.rng = random.Random(seed)
+        self.start = start or (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.codes = [airport_code(index) for index in range(airports)]
+        self.account_offset = 0
+        self.flight_count = 0
+        self.ftt_count = 0
+
+    def timed(self, label, step):
+        started = time.perf_counter()
+        count = step()
+        elapsed = time.perf_counter() - started
+        self.log(f"{count} {label} in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} rows/s)")
+        return count
+
+    def run(self, index=True):
+        """Generate everything; return the first departure day."""
+        self.timed('airports', self.generate_airports)
+        self.timed('ticket types', self.generate_ticket_types)
+        self.timed('flights', self.generate_flights)
+        self.timed('accounts', self.generate_accounts)
+        self.timed('bookings', self.generate_bookings)
+        if index:
+            self.timed('search rows', lambda: FlightSearchIndex.rebuild(batch_size=self.chunk_size))
+        return self.start
+
+    def generate_airports(self):
+        return bulk_insert(Airport, (
+            Airport(
+                airport_code=code, name=f"{code} International Airport", city=f"City {code}",
+                country='Viet Nam' if index % 3 == 0 else f"Country {index % 97}",
+                timezone=TIMEZONES[index % len(TIMEZONES)]
+            )
+            for index, code in enumerate(self.codes)
+        ), self.chunk_size)
+
+    def generate_ticket_types(self):
+        existing = dict(TicketType.objects.values_list('name', 'ticket_type_id'))
+        missing = [TicketType(name=name) for name, _factor, _seats in TICKET_TYPES if name not in existing]
+        for ticket_type in missing:
+            ticket_type.save()
+            existing[ticket_type.name] = ticket_type.pk
+        self.ticket_type_ids = [existing[name] for name, _factor, _seats in TICKET_TYPES]
+        return len(missing)
+
+    def generate_flights(self):
+        """Write flights and their ticket types day by day, in step with each other."""
+        rng = self.rng
+        routes = build_routes(rng, self.airports, max(2, self.flights_per_day))
+        total_weight = sum(weight for _origin, _destination, weight, _minutes in routes)
+        flight_id = Flight.objects.order_by('-flight_id').values_list('flight_id', flat=True).first() or 0
+        ftt_id = FlightTicketType.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.first_ftt_id = ftt_id + 1
+        flights, flight_ticket_types = [], []
+        for day_number in range(self.days):
+            day = self.start + timedelta(days=day_number)
+            factor = season_factor(day)
+            for route_number, (origin, destination, weight, minutes) in enumerate(routes):
+                expected = self.flights_per_day * weight / total_weight * factor
+                count = int(expected) + (rng.random() < expected - int(expected))
+                if route_number < 2:
+                    count = max(count, 1)
+                for _flight in range(count):
+                    flight_id += 1
+                    departure = day + timedelta(minutes=rng.randrange(6 * 60, 22 * 60, 5))
+                    flights.append(Flight(
+                        flight_id=flight_id, flight_number=f"GD{flight_id}", airline=f"Air {origin % 20}",
+                        departure_airport_id=self.codes[origin], arrival_airport_id=self.codes[destination],
+                        departure_time=departure,
+                        arrival_time=departure + timedelta(minutes=minutes + rng.randrange(-10, 15, 5)),
+                    ))
+                    base = (500000 + minutes * 8000) * factor
+                    for ticket_type_id, (_name, multiplier, seats) in zip(self.ticket_type_ids, TICKET_TYPES):
+                        ftt_id += 1
+                        flight_ticket_types.append(FlightTicketType(
+                            flight_ticket_types_id=ftt_id, flight_id=flight_id, ticket_type_id=ticket_type_id,
+                            price=round(base * multiplier * rng.uniform(0.85, 1.3), -4),
+                            available_seats=rng.randint(*seats),
+                        ))
+                    if len(flights) >= self.chunk_size:
+                        self._write_flights(flights, flight_ticket_types)
+        self._write_flights(flights, flight_ticket_types)
+        return self.flight_count
+
+    def _write_flights(self, flights, flight_ticket_types):
+        Flight.objects.bulk_create(flights)
+        FlightTicketType.objects.bulk_create(flight_ticket_types)
+        self.flight_count += len(flights)
+        self.ftt_count += len(flight_ticket_types)
+        flights.clear()
+        flight_ticket_types.clear()
+
+    def generate_accounts(self):
+        self.account_offset = Account.objects.order_by('-account_id').values_list('account_id', flat=True).first() or 0
+        password = make_password(PASSWORD)
+        return bulk_insert(Account, (
+            Account(
+                account_id=self.account_offset + number, username=f"user{self.account_offset + number:08d}",
+                email=f"user{self.account_offset + number}@example.com", phone_number='0123456789',
+                password=password, role='Member'
+            )
+            for number in range(1, self.accounts + 1)
+        ), self.chunk_size)
+
+    def generate_bookings(self):
+        if not self.accounts or not self.ftt_count:
+            return 0
+        rng = self.rng
+        statuses = [status for status, _weight in BOOKING_STATUSES]
+        weights = [weight for _status, weight in BOOKING_STATUSES]
+        offset = Booking.objects.order_by('-booking_id').values_list('booking_id', flat=True).first() or 0
+        per_flight = len(TICKET_TYPES)
+        flight_count = self.ftt_count // per_flight
+        now = timezone.now()
+
+        def bookings():
+            for number in range(1, self.bookings + 1):
+                # Most tickets sold are economy
+                ticket_type = 0 if rng.random() < 0.9 else rng.randrange(1, per_flight)
+                status = rng.choices(statuses, weights)[0]
+                yield Booking(
+                    booking_id=offset + number,
+                    account_id=self.account_offset + rng.randint(1, self.accounts),
+                    flight_ticket_type_id=self.first_ftt_id + rng.randrange(flight_count) * per_flight + ticket_type,
+                    seat_number=str(rng.choices((1, 2, 3, 4), (70, 20, 7, 3))[0]),
+                    status=status,
+                    # Generated data needs no confirmation emails
+                    confirmation_sent_at=now if status == 'Confirmed' else None,
+                )
+        return bulk_insert(Booking, bookings(), self.chunk_size)
+
+
+def generate(airports, days, flights_per_day, accounts, bookings, seed=0, start=None,
+             chunk_size=CHUNK_SIZE, log=None, index=True):
+    """Generate a data set; see Generator. Returns the first departure day."""
+    return Generator(
+        airports, days, flights_per_day, accounts, bookings,
+        seed=seed, start=start, chunk_size=chunk_size, log=log
+    ).run(index=index)
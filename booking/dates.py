@@ -0,0 +1,72 @@
+from datetime import MAXYEAR, date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db.models import Q
+from django.utils import timezone
+
+
+def get_zone(tz_name=None):
+    """Return the tzinfo of a zone name, falling back to the current time zone."""
+    if tz_name:
+        try:
+            return ZoneInfo(tz_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_current_timezone()
+
+
+def local_date(value, tz_name=None):
+    """Return the calendar date of an aware datetime in a time zone."""
+    return timezone.localdate(value, get_zone(tz_name))
+
+
+def local_day_range(day, tz_name=None):
+    """Return the half-open UTC range [start, end) of a local calendar date.
+
+    Comparing the raw column against two constants keeps the filter
+    sargable, where a __date lookup wraps every row in a function call.
+    """
+    zone = get_zone(tz_name)
+    end = _utc_midnight(day + timedelta(days=1), zone) if day < date.max else _utc_limit(day)
+    return _utc_midnight(day, zone), end
+
+
+def _utc_limit(day):
+    """The earliest or latest representable UTC datetime, whichever day is closer to."""
+    return (datetime.max if day.year == MAXYEAR else datetime.min).replace(tzinfo=dt_timezone.utc)
+
+
+def _utc_midnight(day, zone):
+    """Midnight of day in zone as UTC, clamped at the ends of the datetime range."""
+    try:
+        return datetime.combine(day, time.min, tzinfo=zone).astimezone(dt_timezone.utc)
+    except OverflowError:
+        return _utc_limit(day)
+
+
+def local_days_range(first_day, last_day, tz_name=None):
+    """Return the half-open UTC range covering first_day through last_day."""
+    start, _ = local_day_range(first_day, tz_name)
+    _, end = local_day_range(last_day, tz_name)
+    return start, end
+
+
+def local_date_q(first_day, last_day, airports, field='departure_time', airport_field='departure_airport'):
+    """Filter rows whose datetime falls on the given local dates of their airport.
+
+    airports is an iterable of dicts with airport_code and timezone, as
+    returned by the reference-data cache. Airports sharing a time zone
+    share one range, so the filter has one branch per zone. Either day
+    may be None to leave that end of the range open.
+    """
+    codes_by_zone = {}
+    for airport in airports:
+        codes_by_zone.setdefault(airport.get('timezone'), []).append(airport['airport_code'])
+    condition = Q(pk__in=[])
+    for tz_name, codes in codes_by_zone.items():
+        lookups = {f'{airport_field}__in': codes}
+        if first_day is not None:
+            lookups[f'{field}__gte'] = local_day_range(first_day, tz_name)[0]
+        if last_day is not None:
+            lookups[f'{field}__lt'] = local_day_range(last_day, tz_name)[1]
+        condition |= Q(**lookups)
+    return condition
@@ -0,0 +1,101 @@
+import logging
+from itertools import groupby
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .constants import CONFIRMATION_EMAIL_BATCH_SIZE
+from .models import Booking
+from .tickets import schedule_ticket, ticket_context, ticket_queryset
+
+logger = logging.getLogger(__name__)
+
+CONFIRMATION_SUBJECT_TEMPLATE = 'emails/booking_confirmation_subject.txt'
+CONFIRMATION_BODY_TEMPLATE = 'emails/booking_confirmation.txt'
+
+
+def ticket_filename(ticket):
+    return f"ticket-{ticket.booking_id}.pdf"
+
+
+def confirmation_message(account, tickets, paths):
+    """Build the confirmation email of an account's tickets, with their PDFs attached."""
+    context = {'account': account, 'tickets': tickets}
+    subject = ''.join(render_to_string(CONFIRMATION_SUBJECT_TEMPLATE, context).splitlines())
+    message = EmailMessage(subject, render_to_string(CONFIRMATION_BODY_TEMPLATE, context), to=[account.email])
+    for ticket, path in zip(tickets, paths):
+        message.attach(ticket_filename(ticket), path.read_bytes(), 'application/pdf')
+    return message
+
+
+def _claim(booking_ids, now):
+    """Mark bookings as mailed unless another worker already did; True if all were ours."""
+    claimed = Booking.objects.filter(
+        booking_id__in=booking_ids, confirmation_sent_at__isnull=True
+    ).update(confirmation_sent_at=now)
+    if claimed == len(booking_ids):
+        return True
+    Booking.objects.filter(booking_id__in=booking_ids, confirmation_sent_at=now).update(confirmation_sent_at=None)
+    return False
+
+
+def _render(tickets):
+    """Render the PDFs of tickets and return their paths by booking id.
+
+    Tickets that cannot be rendered, such as a booking confirmed by hand
+    without a payment, are logged and left out.
+    """
+    # Schedule every render first so the tickets render in parallel
+    scheduled = []
+    for ticket in tickets:
+        try:
+            scheduled.append((ticket, schedule_ticket(ticket_context(ticket))))
+        except Exception:
+            logger.exception("Could not render the ticket of booking %s, it is not mailed.", ticket.booking_id)
+    paths = {}
+    for ticket, future in scheduled:
+        try:
+            paths[ticket.booking_id] = future.result()
+        except Exception:
+            logger.exception("Could not render the ticket of booking %s, it is not mailed.", ticket.booking_id)
+    return paths
+
+
+def send_confirmations(batch_size=CONFIRMATION_EMAIL_BATCH_SIZE):
+    """Email every confirmed booking that has not been mailed yet. Returns the messages sent.
+
+    Each account gets one message with all its new tickets attached. The
+    PDFs come from the ticket cache, so a ticket rendered for the email
+    is the same file print_ticket later serves, and the other way round.
+    All messages go out over one mail server connection, batch_size
+    accounts at a time. A booking is marked as mailed right before its
+    message is sent and unmarked if sending fails, so a retry neither
+    skips nor repeats it. A ticket that cannot be rendered is skipped and
+    does not hold up the others.
+    """
+    unmailed = Booking.objects.filter(status='Confirmed', confirmation_sent_at__isnull=True)
+    sent = 0
+    last_account_id = 0
+    with get_connection() as connection:
+        while True:
+            account_ids = list(unmailed.filter(account_id__gt=last_account_id).order_by('account_id')
+                               .values_list('account_id', flat=True).distinct()[:batch_size])
+            if not account_ids:
+                return sent
+            last_account_id = account_ids[-1]
+            tickets = list(ticket_queryset().filter(
+                pk__in=unmailed.filter(account_id__in=account_ids).values('pk')
+            ).order_by('account_id', 'booking_id'))
+            paths = _render(tickets)
+            rendered = [ticket for ticket in tickets if ticket.booking_id in paths]
+            for _account_id, group in groupby(rendered, key=lambda ticket: ticket.account_id):
+                group = list(group)
+                booking_ids = [ticket.booking_id for ticket in group]
+                message = confirmation_message(group[0].account, group, [paths[pk] for pk in booking_ids])
+                if not _claim(booking_ids, timezone.now()):
+                    continue
+                try:
+                    connection.send_messages([message])
+                except Exception:
+                    Booking.objects.filter(booking_id__in=booking_ids).update(confirmation_sent_at=None)
+                    raise
+                sent += 1
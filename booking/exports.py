@@ -0,0 +1,148 @@
+import logging
+import zipfile
+from collections import deque
+from django.conf import settings
+from django.template.loader import get_template
+from pypdf import PdfReader, PdfWriter
+from .models import Payment
+from .tickets import TICKET_TEMPLATE, ticket_queryset, ticket_context, schedule_ticket
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 200
+# The merged PDF stays in memory until it is written, so the admin merges at most this many tickets
+MERGED_PDF_MAX_TICKETS = 200
+
+
+def export_window():
+    """How many tickets may be rendering at once during an export."""
+    return max(1, settings.TICKET_RENDER_WORKERS) * 2
+
+
+def iter_ticket_files(bookings, window=None):
+    """Yield (booking, pdf path) for every booking that has a ticket, in order.
+
+    bookings is a Booking queryset; it is read in chunks and at most
+    window renders are in flight, so memory does not grow with the size
+    of the export. Cached tickets are reused and the ticket template is
+    compiled once for the whole run. Bookings without a payment are
+    logged and skipped; a ticket that fails to render is logged and
+    yielded with None as its path, so one bad ticket does not end the
+    export.
+    """
+    window = window or export_window()
+    template = get_template(TICKET_TEMPLATE)
+    queryset = ticket_queryset().filter(pk__in=bookings.values('pk')).order_by('booking_id')
+    pending = deque()
+    for ticket in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        try:
+            future = schedule_ticket(ticket_context(ticket), template=template)
+        except Payment.DoesNotExist:
+            logger.warning("Booking %s has no payment, skipping its ticket.", ticket.booking_id)
+            continue
+        except Exception:
+            logger.exception("Could not render the ticket of booking %s.", ticket.booking_id)
+            future = None
+        pending.append((ticket, future))
+        if len(pending) >= window:
+            yield _collect(pending.popleft())
+    while pending:
+        yield _collect(pending.popleft())
+
+
+def _collect(item):
+    ticket, future = item
+    if future is None:
+        return ticket, None
+    try:
+        return ticket, future.result()
+    except Exception:
+        logger.exception("Could not render the ticket of booking %s.", ticket.booking_id)
+        return ticket, None
+
+
+def ticket_filename(ticket):
+    return f"ticket-{ticket.booking_id}.pdf"
+
+
+def error_filename(ticket):
+    return f"ticket-{ticket.booking_id}.error.txt"
+
+
+def error_message(ticket):
+    return f"The ticket of booking {ticket.booking_id} could not be rendered; see the server log.\n".encode()
+
+
+class _ChunkBuffer:
+    """Write-only file object that hands its bytes back in chunks."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_ticket_zip(bookings, window=None):
+    """Yield a ZIP archive of the bookings' tickets piece by piece.
+
+    PDFs are already compressed, so they are stored as is. A ticket that
+    failed to render gets a short error entry instead.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for ticket, path in iter_ticket_files(bookings, window):
+            if path is None:
+                archive.writestr(error_filename(ticket), error_message(ticket))
+                yield buffer.take()
+                continue
+            with open(path, 'rb') as source, archive.open(ticket_filename(ticket), 'w') as target:
+                for data in iter(lambda: source.read(64 * 1024), b''):
+                    target.write(data)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def write_ticket_zip(bookings, output, window=None):
+    """Write the bookings' tickets to output as a ZIP archive; return how many.
+
+    A ticket that failed to render gets a short error entry instead.
+    """
+    count = 0
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for ticket, path in iter_ticket_files(bookings, window):
+            if path is None:
+                archive.writestr(error_filename(ticket), error_message(ticket))
+                continue
+            archive.write(path, ticket_filename(ticket))
+            count += 1
+    return count
+
+
+def write_merged_pdf(bookings, output, window=None):
+    """Write the bookings' tickets to output as one PDF; return how many.
+
+    Rendering stays bounded as for the ZIP, but pypdf keeps the merged
+    document's pages until it is written out, so requests cap the
+    selection at MERGED_PDF_MAX_TICKETS; larger exports use the ZIP or the
+    export_tickets command.
+    """
+    writer = PdfWriter()
+    count = 0
+    for ticket, path in iter_ticket_files(bookings, window):
+        if path is None:
+            continue
+        writer.append(PdfReader(path))
+        count += 1
+    writer.write(output)
+    return count
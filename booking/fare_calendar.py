@@ -0,0 +1,45 @@
+from collections import namedtuple
+from datetime import timedelta
+from django.db.models import Count, Min
+from .constants import FARE_CALENDAR_DAYS
+from .models import FlightSearchIndex
+from .search_cache import cached_calendar
+
+FareDay = namedtuple('FareDay', ['date', 'lowest_price', 'flights'])
+
+
+def lowest_fares(departure_airport, arrival_airport, first_day, last_day, ticket_type_id, num_passengers):
+    """Return {date: (lowest price, number of flights)} of a route in one grouped query."""
+    rows = FlightSearchIndex.objects.filter(
+        departure_airport=departure_airport,
+        arrival_airport=arrival_airport,
+        departure_date__range=(first_day, last_day),
+        ticket_type=ticket_type_id,
+        available_seats__gte=num_passengers,
+    ).order_by().values('departure_date').annotate(
+        lowest_price=Min('price'), flights=Count('pk')
+    ).values_list('departure_date', 'lowest_price', 'flights')
+    return {day: (price, flights) for day, price, flights in rows}
+
+
+def fare_calendar(departure_airport, arrival_airport, day, ticket_type_id, num_passengers=1,
+                  days=FARE_CALENDAR_DAYS):
+    """Return a FareDay for every date from day - days to day + days.
+
+    Dates without a flight that has enough seats get a lowest_price of
+    None. The window is cached per route and expires with any change to
+    the route's search rows.
+    """
+    first_day, last_day = day - timedelta(days=days), day + timedelta(days=days)
+
+    def compute():
+        fares = lowest_fares(departure_airport, arrival_airport, first_day, last_day, ticket_type_id, num_passengers)
+        calendar = []
+        for offset in range(2 * days + 1):
+            date = first_day + timedelta(days=offset)
+            price, flights = fares.get(date, (None, 0))
+            calendar.append(FareDay(date, price, flights))
+        return calendar
+
+    return cached_calendar(
+        departure_airport, arrival_airport, first_day, last_day, ticket_type_id, num_passengers, compute)
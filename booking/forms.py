@@ -5,6 +5,7 @@ from django.core.validators import RegexValidator, MinLengthValidator
 from django.utils.translation import gettext_lazy as _
 from .constants import *
 from .models import *
+from .schedule_import import IMPORT_BATCH_SIZE
 
 class LoginForm(forms.Form):
     username = forms.CharField(
@@ -63,3 +64,7 @@ class UpdateAccountForm(forms.ModelForm):
     class Meta:
         model = Account
         fields = ['email', 'phone_number', 'first_name', 'last_name', 'gender', 'date_of_birth']
+
+class ScheduleImportForm(forms.Form):
+    file = forms.FileField(label=_('Schedule file (CSV)'))
+    batch_size = forms.IntegerField(label=_('Batch size'), min_value=1, initial=IMPORT_BATCH_SIZE)
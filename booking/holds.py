@@ -0,0 +1,108 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from .constants import SEAT_HOLD_TTL_MINUTES, SEAT_HOLD_SWEEP_BATCH_SIZE
+from .inventory import reserve_seats, release_seats
+from .models import Payment, SeatHold
+
+
+def _leg(booking):
+    return (booking.flight_ticket_type_id, int(booking.seat_number))
+
+
+def place_holds(bookings, ttl=None):
+    """Take seats for unpaid bookings until the hold expires.
+
+    Held seats are removed from available_seats straight away, so the
+    search path stops offering them without any extra join. Raises
+    InsufficientSeats when any leg cannot be covered, in which case no
+    leg is held.
+    """
+    if ttl is None:
+        ttl = timedelta(minutes=SEAT_HOLD_TTL_MINUTES)
+    expires_at = timezone.now() + ttl
+    with transaction.atomic():
+        reserve_seats([_leg(booking) for booking in bookings])
+        SeatHold.objects.bulk_create([
+            SeatHold(
+                booking=booking,
+                flight_ticket_type_id=booking.flight_ticket_type_id,
+                quantity=int(booking.seat_number),
+                expires_at=expires_at
+            )
+            for booking in bookings
+        ])
+
+
+def convert_holds(bookings):
+    """Turn the holds of bookings being paid into sold seats.
+
+    A hold is claimed by deleting it; whoever deletes the row owns its
+    seats, so the sweeper and the payment never both use them. Bookings
+    whose hold was already swept get their seats reserved again.
+    """
+    with transaction.atomic():
+        missing = []
+        for booking in bookings:
+            deleted, _ = SeatHold.objects.filter(booking_id=booking.pk).delete()
+            if not deleted:
+                missing.append(_leg(booking))
+        if missing:
+            reserve_seats(missing)
+
+
+def cancel_hold(booking):
+    """Drop the hold of an unpaid booking and give its seats back."""
+    with transaction.atomic():
+        hold = SeatHold.objects.filter(booking_id=booking.pk).values_list(
+            'flight_ticket_type_id', 'quantity').first()
+        if hold is None:
+            return False
+        if SeatHold.objects.filter(booking_id=booking.pk).delete()[0]:
+            release_seats([hold])
+    return True
+
+
+def release_booking_seats(booking):
+    """Give back the seats of a booking that is being cancelled.
+
+    An unpaid booking only has the seats of its hold, which may already
+    have been swept; a paid one has sold seats. Whether it was paid is
+    read from its payments, not from the hold being gone.
+    """
+    with transaction.atomic():
+        if cancel_hold(booking):
+            return
+        if Payment.objects.filter(booking_id=booking.pk).exists():
+            release_seats([_leg(booking)])
+
+
+def release_expired_holds(now=None, batch_size=SEAT_HOLD_SWEEP_BATCH_SIZE):
+    """Release every hold that expired before now, batch by batch.
+
+    Each batch costs one SELECT, one DELETE and one UPDATE per distinct
+    flight ticket type, however many holds it contains. Where the
+    database supports it the batch is locked with SKIP LOCKED, so
+    several sweepers can run side by side. Returns the number of holds
+    released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            queryset = SeatHold.objects.filter(expires_at__lte=now).order_by('expires_at')
+            if connection.features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            batch = list(queryset.values_list('hold_id', 'flight_ticket_type_id', 'quantity')[:batch_size])
+            if not batch:
+                break
+            SeatHold.objects.filter(pk__in=[hold_id for hold_id, _, _ in batch]).delete()
+            quantities = defaultdict(int)
+            for _, flight_ticket_type_id, quantity in batch:
+                quantities[flight_ticket_type_id] += quantity
+            release_seats(quantities.items())
+        released += len(batch)
+        if len(batch) < batch_size:
+            break
+    return released
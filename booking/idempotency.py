@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import re
+import uuid
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from .constants import IDEMPOTENCY_KEY_TTL_HOURS, IDEMPOTENCY_KEY_FIELD
+from .models import IdempotencyKey
+
+KEY_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+KEY_HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+IGNORED_FIELDS = {'csrfmiddlewaretoken', IDEMPOTENCY_KEY_FIELD}
+
+
+def new_key():
+    """Return a fresh key for a form that should only be submitted once."""
+    return uuid.uuid4().hex
+
+
+def request_key(request):
+    """Return the key sent with the request, from the form or the header."""
+    return request.POST.get(IDEMPOTENCY_KEY_FIELD) or request.headers.get(KEY_HEADER)
+
+
+def fingerprint(request):
+    """Hash the path and the posted fields, so a key cannot be reused for other data."""
+    digest = hashlib.sha256(request.path.encode())
+    for name in sorted(request.POST):
+        if name in IGNORED_FIELDS:
+            continue
+        for value in request.POST.getlist(name):
+            digest.update(b'\0' + name.encode() + b'=' + value.encode())
+    return digest.hexdigest()
+
+
+def claim(account, key, request_fingerprint, now=None):
+    """Claim key for this account; return (record, created).
+
+    The unique index on (account, key) decides which of two concurrent
+    submissions wins, so the check costs a single INSERT. An expired
+    record is dropped and claimed again.
+    """
+    now = now or timezone.now()
+    expires_at = now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    for _attempt in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    account=account, key=key, fingerprint=request_fingerprint, expires_at=expires_at
+                ), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(account=account, key=key).first()
+            if record is None:
+                continue
+            if record.expires_at > now:
+                return record, False
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+    raise IntegrityError("Could not claim the idempotency key.")
+
+
+def replay(record):
+    """Rebuild the response stored for a completed key."""
+    response = HttpResponse(bytes(record.content), status=record.status_code, content_type=record.content_type)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Run a POST view at most once per idempotency key.
+
+    The first submission of a key runs the view and keeps its response
+    when it succeeds; a resubmission with the same data gets that response
+    back without running the view, so seats and payments are not touched
+    twice. The same key with different data is refused, as is a
+    resubmission that arrives while the first one is still running.
+    Requests without a key, and anonymous ones, are passed straight
+    through.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request_key(request) if request.method == 'POST' else None
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if not re.match(KEY_PATTERN, key):
+            return HttpResponseBadRequest(_("The idempotency key is not valid."))
+        record, created = claim(request.user, key, fingerprint(request))
+        if not created:
+            if record.fingerprint != fingerprint(request):
+                return HttpResponse(_("This form was already submitted with other data."), status=422)
+            if not record.is_completed():
+                response = HttpResponse(_("This form is still being processed."), status=409)
+                response['Retry-After'] = '1'
+                return response
+            return replay(record)
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            record.delete()
+            raise
+        if response.streaming or not 200 <= response.status_code < 300:
+            # Only successful results are stored, other errors may be retried
+            record.delete()
+            return response
+        record.status_code = response.status_code
+        record.content_type = response.get('Content-Type', '')
+        record.content = response.content
+        record.save(update_fields=['status_code', 'content_type', 'content'])
+        return response
+    return wrapper
+
+
+def purge_expired_keys(now=None, batch_size=1000):
+    """Delete expired keys batch by batch; return how many were deleted."""
+    now = now or timezone.now()
+    purged = 0
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
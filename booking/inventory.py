@@ -0,0 +1,107 @@
+import logging
+import threading
+from collections import OrderedDict
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from .models import FlightTicketType, FlightSearchIndex
+from .search_cache import invalidate_routes
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {
+    'reserved_legs': 0,
+    'released_legs': 0,
+    'rejected_legs': 0,
+}
+
+
+class InsufficientSeats(Exception):
+    """Raised when a flight ticket type cannot cover the requested seats."""
+
+    def __init__(self, flight_ticket_type_id, quantity):
+        self.flight_ticket_type_id = flight_ticket_type_id
+        self.quantity = quantity
+        super().__init__(_("There are not enough seats left on this flight."))
+
+
+def _record(name, count=1):
+    with _stats_lock:
+        _stats[name] += count
+
+
+def contention_stats():
+    """Return a snapshot of the inventory counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_contention_stats():
+    """Reset the inventory counters of this process."""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _normalize(legs):
+    """Merge duplicate legs and order them by primary key.
+
+    Updating rows in a fixed order keeps concurrent multi-leg holds from
+    deadlocking on each other.
+    """
+    merged = OrderedDict()
+    for flight_ticket_type_id, quantity in sorted(legs, key=lambda leg: int(leg[0])):
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise ValueError("Seat quantity must be positive.")
+        merged[int(flight_ticket_type_id)] = merged.get(int(flight_ticket_type_id), 0) + quantity
+    return list(merged.items())
+
+
+def _adjust(flight_ticket_type_id, delta):
+    """Shift the seat count of one row and its search entry by delta."""
+    queryset = FlightTicketType.objects.filter(pk=flight_ticket_type_id)
+    if delta < 0:
+        queryset = queryset.filter(available_seats__gte=-delta)
+    if not queryset.update(available_seats=F('available_seats') + delta):
+        return False
+    FlightSearchIndex.objects.filter(pk=flight_ticket_type_id).update(
+        available_seats=F('available_seats') + delta)
+    return True
+
+
+def _invalidate(legs):
+    """Expire cached searches of the routes the legs fly on."""
+    invalidate_routes(FlightSearchIndex.routes(pk__in=[pk for pk, quantity in legs]))
+
+
+def reserve_seats(legs):
+    """Take seats on every leg, or on none of them.
+
+    legs is an iterable of (flight_ticket_type_id, quantity) pairs. Each
+    leg is a single conditional UPDATE, so no row is read before it is
+    written and no lock is held between requests. InsufficientSeats is
+    raised for the first leg that cannot be covered and every leg taken
+    before it is rolled back.
+    """
+    legs = _normalize(legs)
+    with transaction.atomic():
+        for flight_ticket_type_id, quantity in legs:
+            if not _adjust(flight_ticket_type_id, -quantity):
+                _record('rejected_legs')
+                logger.info("Seat reservation rejected for flight ticket type %s (%s seats).",
+                            flight_ticket_type_id, quantity)
+                raise InsufficientSeats(flight_ticket_type_id, quantity)
+        _invalidate(legs)
+    _record('reserved_legs', len(legs))
+
+
+def release_seats(legs):
+    """Give seats back on every leg."""
+    legs = _normalize(legs)
+    with transaction.atomic():
+        for flight_ticket_type_id, quantity in legs:
+            _adjust(flight_ticket_type_id, quantity)
+        _invalidate(legs)
+    _record('released_legs', len(legs))
@@ -0,0 +1,306 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+import django
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .constants import (
+    JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS, JOB_LOCK_TIMEOUT_SECONDS, JOB_POLL_SECONDS,
+    JOB_HEARTBEAT_SECONDS
+)
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(function=None, name=None, atomic=True):
+    """Register a function as a job that enqueue() can name.
+
+    The function gets the job's payload as keyword arguments, so
+    payloads must be JSON objects. An atomic task runs in one transaction
+    that a failure rolls back; tasks with side effects outside the
+    database, like sending mail, can opt out and commit as they go.
+    """
+    def register(function):
+        _tasks[name or function.__name__] = (function, atomic)
+        return function
+    return register(function) if function is not None else register
+
+
+def get_task(name):
+    """Return (function, atomic) of a registered task."""
+    _load_tasks()
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(f"No task is registered as {name!r}.")
+
+
+def _load_tasks():
+    from . import tasks  # noqa: F401
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """Queue a job and return it.
+
+    The row is written in the caller's transaction, so a job queued by a
+    view that later rolls back never runs, and one queued by a committed
+    view is never lost.
+    """
+    get_task(name)
+    return Job.objects.create(
+        name=name, payload=payload or {}, max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def enqueue_once(name, payload=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """Queue a job unless the same one is already waiting to run, and return it.
+
+    Calls within the delay share one job, so work such as mail can be
+    sent in batches.
+    """
+    payload = payload or {}
+    pending = Job.objects.filter(name=name, status='Pending').order_by('job_id')
+    for job in pending:
+        if job.payload == payload:
+            return job
+    return enqueue(name, payload, delay, max_attempts)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim(worker, limit):
+    """Mark up to limit due jobs as running for worker and return them.
+
+    Each job is taken with a conditional update, so two workers polling
+    at the same time never run the same job.
+    """
+    now = timezone.now()
+    candidates = list(Job.objects.filter(status='Pending', run_at__lte=now)
+                      .order_by('run_at', 'job_id').values_list('job_id', flat=True)[:limit])
+    claimed = []
+    for job_id in candidates:
+        if Job.objects.filter(job_id=job_id, status='Pending').update(
+                status='Running', locked_by=worker, locked_at=now):
+            claimed.append(job_id)
+    return list(Job.objects.filter(job_id__in=claimed).order_by('run_at', 'job_id'))
+
+
+def retry_delay(attempts):
+    """Seconds to wait before another attempt: exponential, capped, with 10 % jitter."""
+    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(1, 1.1)
+
+
+def run_job(job):
+    """Run one claimed job and record how it went. Returns the job.
+
+    The outcome is only saved while job.locked_by still holds the job; if
+    it was given to another worker in the meantime, that worker's run is
+    the one that counts.
+    """
+    job.attempts += 1
+    try:
+        function, atomic = get_task(job.name)
+        if atomic:
+            with transaction.atomic():
+                function(**job.payload)
+        else:
+            function(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            logger.exception("Job %s (%s) failed for good.", job.job_id, job.name)
+            job.status, job.finished_at = 'Failed', now
+        else:
+            logger.warning("Job %s (%s) failed, attempt %s.", job.job_id, job.name, job.attempts)
+            job.status, job.run_at = 'Pending', now + timedelta(seconds=retry_delay(job.attempts))
+    else:
+        job.status, job.finished_at, job.last_error = 'Done', timezone.now(), ''
+    owner = job.locked_by
+    job.locked_by, job.locked_at = '', None
+    saved = Job.objects.filter(job_id=job.job_id, status='Running', locked_by=owner).update(
+        status=job.status, attempts=job.attempts, run_at=job.run_at, last_error=job.last_error,
+        finished_at=job.finished_at, locked_by='', locked_at=None
+    )
+    if not saved:
+        logger.warning("Job %s (%s) was no longer held by %s; its outcome is not saved.", job.job_id, job.name, owner)
+    return job
+
+
+def execute(job_id):
+    """Run a claimed job by id; the entry point of pool workers."""
+    close_old_connections()
+    try:
+        return run_job(Job.objects.get(job_id=job_id)).status
+    finally:
+        close_old_connections()
+
+
+def lose(jobs, error):
+    """Give back running jobs whose worker went away, counting it as an attempt.
+
+    jobs is a queryset of jobs. A job that crashes its worker every time
+    is marked failed once it reaches max_attempts instead of being
+    retried forever. Returns how many jobs were given back or failed.
+    """
+    now = timezone.now()
+    jobs = jobs.filter(status='Running')
+    failed = jobs.filter(attempts__gte=F('max_attempts') - 1).update(
+        status='Failed', attempts=F('attempts') + 1, last_error=error, finished_at=now, locked_by='', locked_at=None)
+    retried = jobs.update(
+        status='Pending', attempts=F('attempts') + 1, last_error=error, locked_by='', locked_at=None)
+    if failed:
+        logger.error("%s lost jobs failed for good: %s", failed, error)
+    return failed + retried
+
+
+def requeue_stale(timeout=JOB_LOCK_TIMEOUT_SECONDS):
+    """Put back jobs whose worker stopped before finishing them. Returns how many."""
+    return lose(
+        Job.objects.filter(locked_at__lt=timezone.now() - timedelta(seconds=timeout)),
+        f"The job's lock was not refreshed for more than {timeout} seconds."
+    )
+
+
+def release(job_ids, worker):
+    """Hand claimed jobs that were never started back to the queue."""
+    return Job.objects.filter(job_id__in=job_ids, status='Running', locked_by=worker).update(
+        status='Pending', locked_by='', locked_at=None)
+
+
+def heartbeat(job_ids, worker):
+    """Tell other workers that worker is still running these jobs."""
+    return Job.objects.filter(job_id__in=job_ids, status='Running', locked_by=worker).update(
+        locked_at=timezone.now())
+
+
+def run_pending(limit=None, worker=None):
+    """Run due jobs one after another in this thread until none is left or limit is reached."""
+    worker = worker or worker_name()
+    done = 0
+    while limit is None or done < limit:
+        jobs = claim(worker, 1)
+        if not jobs:
+            break
+        run_job(jobs[0])
+        done += 1
+    return done
+
+
+def purge_finished(older_than):
+    """Delete done jobs finished before older_than. Returns how many."""
+    deleted, _rows = Job.objects.filter(status='Done', finished_at__lt=older_than).delete()
+    return deleted
+
+
+class Worker:
+    """Polls the job table and runs jobs on a pool of threads or processes.
+
+    Claiming happens in the polling thread; the pool only runs jobs, at
+    most concurrency at a time. Processes suit CPU-bound jobs, threads
+    the ones that mostly wait on the network or the database. The
+    polling thread also refreshes the lock of its running jobs and puts
+    back the stale jobs of other workers every heartbeat_seconds, so long
+    jobs are not handed to another worker, and it replaces a process pool
+    broken by a crashed child.
+    """
+
+    def __init__(self, concurrency=4, processes=False, poll_seconds=JOB_POLL_SECONDS,
+                 heartbeat_seconds=JOB_HEARTBEAT_SECONDS, log=None):
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.log = log or (lambda message: None)
+        self.name = worker_name()
+        self.stopping = threading.Event()
+
+    def _pool(self):
+        if self.processes:
+            # A child process must not share the database connections of its parent
+            connections.close_all()
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=django.setup)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+
+    def run(self, once=False):
+        """Run jobs until stop() is called, or until the queue is empty if once is set.
+
+        Returns the number of jobs that were started.
+        """
+        running = {}
+        total = 0
+        beat_at = time.monotonic()
+        pool = self._pool()
+        try:
+            while not self.stopping.is_set():
+                broken = self._reap(running)
+                if broken:
+                    pool = self._replace(pool, running)
+                if time.monotonic() >= beat_at:
+                    heartbeat(list(running.values()), self.name)
+                    requeue_stale()
+                    beat_at = time.monotonic() + self.heartbeat_seconds
+                jobs = claim(self.name, self.concurrency - len(running)) if len(running) < self.concurrency else []
+                for index, job in enumerate(jobs):
+                    try:
+                        future = pool.submit(execute, job.job_id)
+                    except BrokenProcessPool:
+                        release([unsent.job_id for unsent in jobs[index:]], self.name)
+                        jobs = jobs[:index]
+                        pool = self._replace(pool, running)
+                        break
+                    running[future] = job.job_id
+                    self.log(f"Started job {job.job_id} ({job.name}).")
+                total += len(jobs)
+                if jobs:
+                    continue
+                if once and not running:
+                    break
+                time.sleep(self.poll_seconds)
+        finally:
+            pool.shutdown(wait=True)
+            self._reap(running)
+        return total
+
+    def _reap(self, running):
+        """Forget finished jobs; return True if one ended with a broken pool."""
+        broken = False
+        for future in [future for future in running if future.done()]:
+            job_id = running.pop(future)
+            error = future.exception()
+            if error is None:
+                continue
+            broken = broken or isinstance(error, BrokenProcessPool)
+            # Failures outside the task (a dead child, a lost database connection) put the job back in the queue
+            logger.error("The worker running job %s crashed: %r", job_id, error)
+            lose(Job.objects.filter(job_id=job_id, locked_by=self.name), f"The worker crashed: {error!r}")
+        return broken
+
+    def _replace(self, pool, running):
+        """Shut a broken pool down and return a new one."""
+        pool.shutdown(wait=True)
+        self._reap(running)
+        self.log("Restarted the worker pool.")
+        return self._pool()
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,51 @@
+from django.utils.dateparse import parse_date
+from .constants import BOOKING_STATUS, BOOKING_LIST_PAGE_SIZE
+from .dates import local_day_range
+from .models import Booking
+from .pagination import keyset_paginate, filter_query
+
+BOOKING_LIST_ORDERING = ('-booking_date', '-booking_id')
+
+
+def booking_queryset(**filters):
+    """Bookings joined with everything the listing templates show."""
+    return Booking.objects.filter(**filters).select_related('account', 'flight_ticket_type__flight')
+
+
+def filter_bookings(queryset, params):
+    """Apply the status and booking date filters of a listing request.
+
+    Dates are matched as half-open ranges on booking_date, which the
+    (status, booking_date) and (account, booking_date) indexes can serve.
+    """
+    status = params.get('status')
+    if status in dict(BOOKING_STATUS):
+        queryset = queryset.filter(status=status)
+    try:
+        for name, bound, lookup in (('date_from', 0, 'gte'), ('date_to', 1, 'lt')):
+            value = params.get(name)
+            if value:
+                day = parse_date(value)
+                if day is None:
+                    return queryset.none()
+                queryset = queryset.filter(**{f'booking_date__{lookup}': local_day_range(day)[bound]})
+    except (ValueError, OverflowError):
+        return queryset.none()
+    return queryset
+
+
+def booking_listing(queryset, params, per_page=BOOKING_LIST_PAGE_SIZE):
+    """Return the template context of one page of a booking listing."""
+    page = keyset_paginate(
+        filter_bookings(queryset, params), BOOKING_LIST_ORDERING, per_page,
+        after=params.get('after'), before=params.get('before')
+    )
+    return {
+        'bookings': page,
+        'page': page,
+        'filter_query': filter_query(params),
+        'status_choices': BOOKING_STATUS,
+        'status': params.get('status', ''),
+        'date_from': params.get('date_from', ''),
+        'date_to': params.get('date_to', ''),
+    }
@@ -0,0 +1,96 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlencode, urlsplit
+from django.urls import reverse
+from .benchmark import percentile
+from .datagen import airport_code
+from .models import Flight, FlightSearchIndex
+
+
+def load_paths(count, seed=0):
+    """Pick count GET paths over the search and flight pages of the current data.
+
+    Searches go to the benchmark route, between the generator's two
+    biggest hubs, on the days it has flights.
+    """
+    rng = random.Random(seed)
+    origin, destination = airport_code(0), airport_code(1)
+    days = sorted(set(FlightSearchIndex.objects.filter(
+        departure_airport=origin, arrival_airport=destination).values_list('departure_date', flat=True)))
+    flight_ids = list(Flight.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+    if not days or not flight_ids:
+        raise ValueError("There are no flights to load test; run generate_data first.")
+    paths = []
+    for _number in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            paths.append(reverse('index') + '?' + urlencode({
+                'tripType': 'oneway',
+                'from': origin,
+                'to': destination,
+                'departureDate': rng.choice(days).strftime('%Y-%m-%d'),
+                'numPassengers': 1,
+                'chairType': 'Economy',
+            }))
+        elif kind < 0.8:
+            paths.append(reverse('flight_detail', kwargs={'flight_id': rng.choice(flight_ids)}))
+        else:
+            paths.append(reverse('flight'))
+    return paths
+
+
+async def fetch(host, port, path, timeout):
+    """GET path over a fresh connection and return the status code."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(data.split(b' ', 2)[1])
+
+
+async def run_load(url, paths, concurrency, timeout=30):
+    """Send every path to the server at url from concurrency clients at once.
+
+    Returns requests, errors, throughput, p50/p99 latency in ms and the
+    wall time, for comparing how many concurrent connections one worker
+    keeps up with.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    latencies = []
+    errors = []
+
+    async def client():
+        while not queue.empty():
+            path = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                status = await fetch(host, port, path, timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError) as exc:
+                errors.append(f"{path}: {exc!r}")
+                continue
+            if status >= 400:
+                errors.append(f"{path}: {status}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _client in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 2),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'first_errors': errors[:5],
+    }
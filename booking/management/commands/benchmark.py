@@ -0,0 +1,64 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from booking.benchmark import FUNNEL, seed, run_funnel, environment, compare, load_baseline
+from booking.datagen import SCALES
+from booking.models import Flight
+
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a separate benchmark database and time the search-to-ticket funnel "
+        "(index, review, payment, process, print ticket)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--iterations', type=int, default=200, help="Funnels to run after the warm-up.")
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Keep the benchmark database and reuse its data on the next run.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE,
+                            help="Fail if the results regress against this baseline file.")
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help="Allowed p90 latency growth against the baseline (0.5 = 50%%).")
+
+    def handle(self, *args, **options):
+        scale = SCALES[options['scale']]
+        setup_test_environment()
+        # Work on a separate database and leave the real data alone
+        old_name = connection.creation.create_test_db(
+            verbosity=options['verbosity'], autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Flight.objects.exists():
+                self.stdout.write(f"Seeding the {options['scale']} data set...")
+                seed(scale, seed=options['seed'], log=lambda message: self.stdout.write(f"  {message}"))
+            run_funnel(options['warmup'], seed=options['seed'] + 1)
+            report = run_funnel(options['iterations'], seed=options['seed']).report()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=options['verbosity'], keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write(f"{'view':<14}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for name in FUNNEL:
+            row = report[name]
+            self.stdout.write(
+                f"{name:<14}{row['throughput']:>10}{row['p50_ms']:>10}{row['p90_ms']:>10}{row['p99_ms']:>10}{row['queries']:>10}")
+        result = {'environment': environment(options['scale']), 'views': report}
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, indent=2)
+                output.write('\n')
+        if options['baseline']:
+            baseline = load_baseline(options['baseline'])
+            if baseline['environment'] != result['environment']:
+                self.stderr.write(f"Baseline was measured on {baseline['environment']}, latencies may not compare.")
+            regressions = compare(report, baseline['views'], options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
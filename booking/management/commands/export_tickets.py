@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from booking.exports import write_ticket_zip, write_merged_pdf
+from booking.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Export the PDF tickets of many bookings as a ZIP archive or one merged PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write.")
+        parser.add_argument('--format', choices=['zip', 'pdf'], default='zip')
+        parser.add_argument('--booking', type=int, action='append', dest='bookings',
+                            help="Booking id to export; may be repeated.")
+        parser.add_argument('--flight', type=int, help="Export every booking on this flight.")
+        parser.add_argument('--status', default='Confirmed', help="Only export bookings with this status.")
+        parser.add_argument('--window', type=int, help="Maximum number of tickets rendering at once.")
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.all()
+        if options['bookings']:
+            bookings = bookings.filter(booking_id__in=options['bookings'])
+        if options['flight']:
+            bookings = bookings.filter(flight_ticket_type__flight_id=options['flight'])
+        if options['status']:
+            bookings = bookings.filter(status=options['status'])
+        if not (options['bookings'] or options['flight']):
+            raise CommandError("Pass --booking or --flight to choose the bookings to export.")
+        write = write_merged_pdf if options['format'] == 'pdf' else write_ticket_zip
+        with open(options['output'], 'wb') as output:
+            count = write(bookings, output, window=options['window'])
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} tickets to {options['output']}."))
@@ -0,0 +1,50 @@
+from datetime import datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from booking.datagen import SCALES, CHUNK_SIZE, generate
+from booking.models import Airport
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate airports, flights, ticket types, inventory, accounts and bookings "
+        "for large-scale testing. The same --seed and --start always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                            help="Preset sizes; the options below override them.")
+        parser.add_argument('--airports', type=int)
+        parser.add_argument('--days', type=int, help="Days of schedule to generate.")
+        parser.add_argument('--flights-per-day', type=int, help="Average number of flights on a day.")
+        parser.add_argument('--accounts', type=int)
+        parser.add_argument('--bookings', type=int)
+        parser.add_argument('--start', help="First day of the schedule, YYYY-MM-DD. Defaults to tomorrow, so pass it "
+                                            "to reproduce a data set on another day.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--no-index', action='store_true',
+                            help="Do not rebuild the flight search index afterwards.")
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if sizes['airports'] < 2 or sizes['airports'] > 26 ** 3:
+            raise CommandError(f"--airports must be between 2 and {26 ** 3}.")
+        start = None
+        if options['start']:
+            day = parse_date(options['start'])
+            if day is None:
+                raise CommandError("--start must be a date in YYYY-MM-DD format.")
+            start = timezone.make_aware(datetime.combine(day, time()), timezone.utc)
+        if Airport.objects.exists():
+            raise CommandError("The database already has airports; generate data into an empty schedule.")
+        self.stdout.write(", ".join(f"{value} {name.replace('_', ' ')}" for name, value in sizes.items()))
+        generate(
+            **sizes, seed=options['seed'], start=start, chunk_size=options['chunk_size'],
+            log=self.stdout.write, index=not options['no_index']
+        )
+        self.stdout.write(self.style.SUCCESS("Done."))
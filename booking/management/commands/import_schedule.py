@@ -0,0 +1,27 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from booking.schedule_import import IMPORT_BATCH_SIZE, ScheduleRowError, import_schedule
+
+
+class Command(BaseCommand):
+    help = "Import flights and fares from a CSV schedule file, updating the ones that already exist."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import, or - to read standard input.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        try:
+            if options['path'] == '-':
+                report = import_schedule(sys.stdin, batch_size=options['batch_size'], log=log)
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                    report = import_schedule(stream, batch_size=options['batch_size'], log=log)
+        except (OSError, ScheduleRowError) as error:
+            raise CommandError(error)
+        for error in report.errors:
+            self.stderr.write(error)
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"... and {report.error_count - len(report.errors)} more rejected rows.")
+        self.stdout.write(self.style.SUCCESS(str(report)))
@@ -0,0 +1,40 @@
+import asyncio
+import json
+from django.core.management.base import BaseCommand, CommandError
+from booking.load_test import load_paths, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent requests for the search and flight pages to a running server, "
+        "e.g. uvicorn ticketbooking.asgi:application --workers 1, and report throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100],
+                            help="Concurrent connections; several values run one after another.")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per concurrency level.")
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            paths = load_paths(options['requests'], seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        results = []
+        self.stdout.write(f"{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for concurrency in options['concurrency']:
+            result = asyncio.run(run_load(options['url'], paths, concurrency, options['timeout']))
+            results.append(result)
+            self.stdout.write(
+                f"{concurrency:>8}{result['throughput']:>10}{result['p50_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['errors']:>8}")
+            for error in result['first_errors']:
+                self.stderr.write(f"  {error}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'url': options['url'], 'results': results}, output, indent=2)
+                output.write('\n')
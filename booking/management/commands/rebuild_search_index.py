@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from booking.models import FlightSearchIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the flight search index from FlightTicketType rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = FlightSearchIndex.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} flight ticket types."))
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from booking.constants import SEAT_HOLD_SWEEP_BATCH_SIZE
+from booking.holds import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Give the seats of expired holds back to the inventory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SEAT_HOLD_SWEEP_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep sweeping every INTERVAL seconds instead of running once."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_holds(batch_size=options['batch_size'])
+            self.stdout.write(f"Released {released} expired seat holds.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from booking.constants import JOB_POLL_SECONDS
+from booking.jobs import Worker, purge_finished
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs, such as rendering the tickets of paid bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Jobs to run at the same time.")
+        parser.add_argument('--processes', action='store_true',
+                            help="Run jobs in worker processes instead of threads.")
+        parser.add_argument('--poll', type=float, default=JOB_POLL_SECONDS,
+                            help="Seconds to wait before looking again when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Stop when no job is due instead of polling.")
+        parser.add_argument('--purge-days', type=int, default=7,
+                            help="Delete jobs that finished more than this many days ago on start.")
+
+    def handle(self, *args, **options):
+        purged = purge_finished(timezone.now() - timedelta(days=options['purge_days']))
+        if purged:
+            self.stdout.write(f"Deleted {purged} finished jobs.")
+        worker = Worker(
+            concurrency=options['concurrency'], processes=options['processes'], poll_seconds=options['poll'],
+            log=self.stdout.write if options['verbosity'] > 1 else None
+        )
+        try:
+            total = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+            return
+        self.stdout.write(f"Ran {total} jobs.")
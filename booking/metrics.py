@@ -0,0 +1,210 @@
+import contextvars
+import secrets
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+VIEW_HISTOGRAMS = (
+    ('booking_view_latency_seconds', 'Total time spent handling a request.', LATENCY_BUCKETS),
+    ('booking_view_sql_seconds', 'Time spent in SQL while handling a request.', LATENCY_BUCKETS),
+    ('booking_view_template_seconds', 'Time spent rendering templates while handling a request.', LATENCY_BUCKETS),
+    ('booking_view_queries', 'Number of SQL queries issued while handling a request.', QUERY_BUCKETS),
+)
+
+_current = contextvars.ContextVar('booking_metrics_sample', default=None)
+
+
+def sample_rate():
+    """Share of requests the middleware measures."""
+    return float(getattr(settings, 'METRICS_SAMPLE_RATE', 1.0))
+
+
+def is_authorized(request):
+    """Check the bearer token of a scrape when METRICS_TOKEN is set.
+
+    Without a token the metrics are only shown with DEBUG on or to staff.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return settings.DEBUG or request.user.is_staff
+    return secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def cumulative(self):
+        """Yield (upper bound, count) pairs, ending with +Inf."""
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+
+class Registry:
+    """In-process store of per-view histograms.
+
+    Every worker process keeps its own registry; Prometheus sums the
+    series of all the processes it scrapes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, name, view, value):
+        buckets = next(buckets for metric, help_text, buckets in VIEW_HISTOGRAMS if metric == name)
+        with self._lock:
+            histogram = self._histograms.get((name, view))
+            if histogram is None:
+                histogram = self._histograms[(name, view)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record(self, sample):
+        for name, value in sample.values().items():
+            self.observe(name, sample.view, value)
+
+    def snapshot(self):
+        """Return a copy of the histograms keyed by (metric, view)."""
+        with self._lock:
+            copies = {}
+            for key, histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.counts = list(histogram.counts)
+                copy.total = histogram.total
+                copies[key] = copy
+            return copies
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+class Sample:
+    """Measurements of one sampled request."""
+
+    def __init__(self):
+        self.view = 'unresolved'
+        self.started = perf_counter()
+        self.latency = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their time."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += perf_counter() - start
+            self.queries += 1
+
+    def finish(self):
+        self.latency = perf_counter() - self.started
+
+    def values(self):
+        return {
+            'booking_view_latency_seconds': self.latency,
+            'booking_view_sql_seconds': self.sql_seconds,
+            'booking_view_template_seconds': self.template_seconds,
+            'booking_view_queries': self.queries,
+        }
+
+
+def start_sample():
+    """Begin measuring the current request and return its Sample."""
+    sample = Sample()
+    return sample, _current.set(sample)
+
+
+def end_sample(token):
+    _current.reset(token)
+
+
+class TimedTemplate:
+    """Template wrapper adding its render time to the current sample."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        sample = _current.get()
+        if sample is None:
+            return self.template.render(context, request)
+        start = perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            sample.template_seconds += perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that reports render time to the metrics middleware.
+
+    Templates pulled in with {% include %} or {% extends %} are rendered
+    inside their parent, so each page is timed once.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(counters=None, gauges=None):
+    """Render the registry in the Prometheus text exposition format.
+
+    counters and gauges are extra {name: (help, value)} series without
+    labels, such as the seat inventory counters.
+    """
+    histograms = registry.snapshot()
+    lines = []
+    for name, help_text, buckets in VIEW_HISTOGRAMS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, view), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            count = 0
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{{view="{_label(view)}",le="{_number(bound)}"}} {count}')
+            lines.append(f'{name}_sum{{view="{_label(view)}"}} {_number(histogram.total)}')
+            lines.append(f'{name}_count{{view="{_label(view)}"}} {count}')
+    for kind, series in (('counter', counters or {}), ('gauge', gauges or {})):
+        for name, (help_text, value) in sorted(series.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {_number(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,69 @@
+import random
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from .metrics import registry, sample_rate, start_sample, end_sample
+
+
+class MetricsMiddleware:
+    """Record query count, SQL time, template time and latency per view.
+
+    Only a METRICS_SAMPLE_RATE share of requests is measured; the rest
+    pass through with a single random() call, so the middleware can stay
+    enabled under load. It runs natively under both WSGI and ASGI, so
+    async views are not pushed back onto a thread by it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        sample, token = start_sample()
+        try:
+            with ExitStack() as stack:
+                self._watch(stack, sample)
+                response = self.get_response(request)
+        finally:
+            end_sample(token)
+        self._record(request, sample)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        sample, token = start_sample()
+        stack = ExitStack()
+        try:
+            # Async queries run on the request's sync thread, so install the wrapper there
+            await sync_to_async(self._watch)(stack, sample)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            end_sample(token)
+        self._record(request, sample)
+        return response
+
+    def _sampled(self):
+        rate = sample_rate()
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def _watch(self, stack, sample):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(sample))
+
+    def _record(self, request, sample):
+        sample.finish()
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            sample.view = match.view_name or match._func_path
+        registry.record(sample)
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.8 on 2026-10-18 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_search_index(apps, schema_editor):
+    FlightTicketType = apps.get_model('booking', 'FlightTicketType')
+    FlightSearchIndex = apps.get_model('booking', 'FlightSearchIndex')
+    rows = []
+    for ftt in FlightTicketType.objects.select_related('flight').iterator(chunk_size=1000):
+        flight = ftt.flight
+        rows.append(FlightSearchIndex(
+            flight_ticket_type_id=ftt.pk,
+            flight_id=flight.pk,
+            departure_airport_id=flight.departure_airport_id,
+            arrival_airport_id=flight.arrival_airport_id,
+            departure_date=timezone.localdate(flight.departure_time),
+            departure_time=flight.departure_time,
+            arrival_time=flight.arrival_time,
+            ticket_type_id=ftt.ticket_type_id,
+            price=ftt.price,
+            available_seats=ftt.available_seats,
+        ))
+        if len(rows) >= 1000:
+            FlightSearchIndex.objects.bulk_create(rows)
+            rows = []
+    FlightSearchIndex.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0014_alter_account_gender'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightSearchIndex',
+            fields=[
+                ('flight_ticket_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='booking.flighttickettype')),
+                ('departure_date', models.DateField()),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('available_seats', models.IntegerField()),
+                ('arrival_airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='booking.airport')),
+                ('departure_airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='booking.airport')),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='booking.flight')),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='booking.tickettype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['departure_airport', 'arrival_airport', 'departure_date', 'ticket_type', 'price'], name='search_route_date_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.8 on 2026-10-18 18:58
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+logger = logging.getLogger(__name__)
+
+
+def merge_duplicate_ticket_types(apps, schema_editor):
+    """Fold FlightTicketType rows repeating a (flight, ticket type) into the oldest one.
+
+    Bookings and seat holds of the duplicates are moved to the kept row.
+    Each row's available_seats is already net of its own bookings and
+    holds, so the kept row gets the sum of them all. It keeps its own
+    price; other prices are logged. The duplicates and their search
+    index rows are then deleted so the unique constraint can be added.
+    """
+    FlightTicketType = apps.get_model('booking', 'FlightTicketType')
+    FlightSearchIndex = apps.get_model('booking', 'FlightSearchIndex')
+    Booking = apps.get_model('booking', 'Booking')
+    SeatHold = apps.get_model('booking', 'SeatHold')
+    duplicates = FlightTicketType.objects.values('flight', 'ticket_type').annotate(
+        rows=Count('pk'), keep=Min('pk'), seats=Sum('available_seats')).filter(rows__gt=1)
+    for group in duplicates.iterator():
+        kept = FlightTicketType.objects.get(pk=group['keep'])
+        others = FlightTicketType.objects.filter(
+            flight=group['flight'], ticket_type=group['ticket_type']).exclude(pk=kept.pk)
+        logger.warning(
+            "Merging FlightTicketType rows %s into %s (flight %s, ticket type %s): "
+            "prices %s dropped for %s, available seats %s become %s.",
+            list(others.values_list('pk', flat=True)), kept.pk, group['flight'], group['ticket_type'],
+            list(others.values_list('price', flat=True)), kept.price, kept.available_seats, group['seats'])
+        Booking.objects.filter(flight_ticket_type__in=others).update(flight_ticket_type=kept.pk)
+        SeatHold.objects.filter(flight_ticket_type__in=others).update(flight_ticket_type=kept.pk)
+        others.delete()
+        FlightTicketType.objects.filter(pk=kept.pk).update(available_seats=group['seats'])
+        FlightSearchIndex.objects.filter(flight_ticket_type=kept.pk).update(available_seats=group['seats'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0016_seathold'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='flightsearchindex',
+            name='search_route_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'booking_date'], name='booking_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['account', 'booking_date'], name='booking_account_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_airport', 'arrival_airport', 'departure_time'], name='flight_route_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightsearchindex',
+            index=models.Index(fields=['departure_airport', 'arrival_airport', 'departure_date', 'ticket_type', 'price', 'departure_time'], name='search_route_date_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_ticket_types, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='flighttickettype',
+            constraint=models.UniqueConstraint(fields=('flight', 'ticket_type'), name='unique_flight_ticket_type'),
+        ),
+    ]
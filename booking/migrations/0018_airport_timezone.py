@@ -0,0 +1,19 @@
+# Generated by Django 5.0.8 on 2026-10-18 19:01
+
+import booking.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0017_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airport',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64, validators=[booking.models.validate_timezone]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0019_flight_time_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
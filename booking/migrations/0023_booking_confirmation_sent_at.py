@@ -0,0 +1,26 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:25
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_confirmations(apps, schema_editor):
+    # Bookings confirmed before confirmation emails existed should not all be mailed at once
+    Booking = apps.get_model('booking', 'Booking')
+    Booking.objects.filter(status='Confirmed').update(confirmation_sent_at=F('booking_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0022_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='confirmation_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_confirmations, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,14 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from .constants import (
-    MAX_LENGTH_NAME, GENDER_CHOICES, MAX_LENGTH_CHOICES, BOOKING_STATUS,
+    MAX_LENGTH_NAME, GENDER_CHOICES, MAX_LENGTH_CHOICES, BOOKING_STATUS, JOB_STATUS, JOB_MAX_ATTEMPTS,
     STATUS_CHOICES, ROLE_CHOICES, CARD_TYPE_CHOICES, PAYMENT_METHOD_CHOICES, 
     REGEX_PATTERN, REGEX_PATTERN_NAME, REGEX_PATTERN_NUMBER, REGEX_PATTERN_EMAIL
 )
 from django.utils import timezone
 from django.core.validators import RegexValidator, MinLengthValidator
+from django.core.exceptions import ValidationError
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from datetime import date
 from django.contrib.auth.models import AbstractUser
 from django.db.models import Min, Q, F
@@ -54,19 +56,27 @@ class Account(AbstractUser):
     def __str__(self):
         return f"{self.email} ({self.get_role_display()})"
 
+def validate_timezone(value):
+    """Check that value names an IANA time zone."""
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(_("%(value)s is not a valid time zone."), params={'value': value})
+
 class Airport(models.Model):
     airport_code = models.CharField(max_length=10, primary_key=True)
     name = models.CharField(max_length=MAX_LENGTH_NAME)
     city = models.CharField(max_length=MAX_LENGTH_NAME)
     country = models.CharField(max_length=MAX_LENGTH_NAME)
+    timezone = models.CharField(max_length=64, default='UTC', validators=[validate_timezone])
 
     def __str__(self):
         return f"{self.name} ({self.airport_code})"
     
     def get_airports():
-        """Retrieve all airports from the database."""
-        airports = Airport.objects.all().values("airport_code", "name", "city", "country")
-        return list(airports)
+        """Retrieve all airports from the reference-data cache."""
+        from .reference import get_airports
+        return get_airports()
 
 class Flight(models.Model):
     flight_id = models.AutoField(primary_key=True)
@@ -77,6 +87,12 @@ class Flight(models.Model):
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['departure_airport', 'arrival_airport', 'departure_time'], name='flight_route_time_idx'),
+            models.Index(fields=['departure_time', 'flight_id'], name='flight_time_idx'),
+        ]
+
     def get_duration(self):
         """Calculate the flight duration."""
         return self.arrival_time - self.departure_time
@@ -106,27 +122,147 @@ class FlightTicketType(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     available_seats = models.IntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['flight', 'ticket_type'], name='unique_flight_ticket_type'),
+        ]
+
     def is_seat_available(self, quantity):
         """Check if there are any available seats."""
         return self.available_seats >= quantity
 
     def book_seat(self, quantity=1):
         """Book seats if available."""
-        if self.is_seat_available(quantity):
-            self.available_seats -= quantity
-            self.save()
-            return True
-        return False
+        from .inventory import reserve_seats, InsufficientSeats
+        try:
+            reserve_seats([(self.pk, quantity)])
+        except InsufficientSeats:
+            return False
+        finally:
+            self.refresh_from_db(fields=['available_seats'])
+        return True
 
     def release_seat(self, quantity=1):
         """Release booked seats."""
-        self.available_seats += quantity
-        self.save()
+        from .inventory import release_seats
+        release_seats([(self.pk, quantity)])
+        self.refresh_from_db(fields=['available_seats'])
 
     def __str__(self):
         return (f"Flight {self.flight.flight_number} - {self.ticket_type.name} "
                 f"(Price: {self.price}, Available Seats: {self.available_seats})")
 
+class FlightSearchIndex(models.Model):
+    """Denormalized search row, one per flight ticket type."""
+    flight_ticket_type = models.OneToOneField(
+        FlightTicketType, on_delete=models.CASCADE, primary_key=True, related_name='search_entry')
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='search_entries')
+    departure_airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    arrival_airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    departure_date = models.DateField()
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    ticket_type = models.ForeignKey(TicketType, on_delete=models.CASCADE, related_name='+')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    available_seats = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['departure_airport', 'arrival_airport', 'departure_date', 'ticket_type', 'price', 'departure_time'],
+                name='search_route_date_idx'
+            ),
+        ]
+
+    @staticmethod
+    def local_departure_date(flight):
+        """Return the calendar date a flight is searched under, in its departure airport's time zone."""
+        from .dates import local_date
+        return local_date(flight.departure_time, flight.departure_airport.timezone)
+
+    @staticmethod
+    def row_values(flight, flight_ticket_type):
+        """Build the denormalized column values of a search row."""
+        return {
+            'flight_id': flight.flight_id,
+            'departure_airport_id': flight.departure_airport_id,
+            'arrival_airport_id': flight.arrival_airport_id,
+            'departure_date': FlightSearchIndex.local_departure_date(flight),
+            'departure_time': flight.departure_time,
+            'arrival_time': flight.arrival_time,
+            'ticket_type_id': flight_ticket_type.ticket_type_id,
+            'price': flight_ticket_type.price,
+            'available_seats': flight_ticket_type.available_seats,
+        }
+
+    @classmethod
+    def routes(cls, **filters):
+        """Return the distinct (departure, arrival, date) triples of matching rows."""
+        return list(cls.objects.filter(**filters).values_list(
+            'departure_airport_id', 'arrival_airport_id', 'departure_date').distinct())
+
+    def route(self):
+        """Return the (departure, arrival, date) triple this row is searched by."""
+        return (self.departure_airport_id, self.arrival_airport_id, self.departure_date)
+
+    @classmethod
+    def refresh(cls, flight_ticket_type):
+        """Create or update the search row of a flight ticket type."""
+        entry, created = cls.objects.update_or_create(
+            flight_ticket_type_id=flight_ticket_type.pk,
+            defaults=cls.row_values(flight_ticket_type.flight, flight_ticket_type)
+        )
+        return entry
+
+    @classmethod
+    def refresh_flight(cls, flight):
+        """Refresh the search rows of every ticket type of a flight."""
+        entries = []
+        for flight_ticket_type in FlightTicketType.objects.filter(flight=flight):
+            flight_ticket_type.flight = flight
+            entries.append(cls.refresh(flight_ticket_type))
+        return entries
+
+    @classmethod
+    def redate_airport(cls, airport, batch_size=1000):
+        """Recompute the local departure dates of flights leaving an airport."""
+        from .dates import local_date
+        batch = []
+        entries = cls.objects.filter(departure_airport=airport).only('pk', 'departure_time', 'departure_date')
+        for entry in entries.iterator(chunk_size=batch_size):
+            entry.departure_date = local_date(entry.departure_time, airport.timezone)
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                cls.objects.bulk_update(batch, ['departure_date'])
+                batch = []
+        if batch:
+            cls.objects.bulk_update(batch, ['departure_date'])
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Recreate the whole search index from FlightTicketType rows."""
+        cls.objects.all().delete()
+        batch = []
+        total = 0
+        queryset = FlightTicketType.objects.select_related('flight__departure_airport').order_by('pk')
+        for flight_ticket_type in queryset.iterator(chunk_size=batch_size):
+            batch.append(cls(
+                flight_ticket_type_id=flight_ticket_type.pk,
+                **cls.row_values(flight_ticket_type.flight, flight_ticket_type)
+            ))
+            if len(batch) >= batch_size:
+                cls.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cls.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def __str__(self):
+        return (f"{self.departure_airport_id} - {self.arrival_airport_id} on {self.departure_date} "
+                f"(Flight {self.flight_id}, Price: {self.price}, Available Seats: {self.available_seats})")
+
 class Card(models.Model):
     card_id = models.AutoField(primary_key=True)
     user = models.ForeignKey('Account', on_delete=models.CASCADE)
@@ -174,6 +310,13 @@ class Booking(models.Model):
     cancellation_approved = models.BooleanField(default=False)
     status = models.CharField(max_length=20, choices=BOOKING_STATUS, default='PendingCancellation')
     passengers = models.ManyToManyField(Passenger, related_name='flight_tickets')
+    confirmation_sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'booking_date'], name='booking_status_date_idx'),
+            models.Index(fields=['account', 'booking_date'], name='booking_account_date_idx'),
+        ]
 
     def is_confirmed(self):
         """Check if the booking is confirmed."""
@@ -207,8 +350,9 @@ class Booking(models.Model):
         """Admin approves the cancellation request."""
         pending_cancellation_status = dict(BOOKING_STATUS)['PendingCancellation']
         if self.status == pending_cancellation_status:
-            self.flight_ticket_type.release_seat(int(self.seat_number))
-            
+            from .holds import release_booking_seats
+            release_booking_seats(self)
+
             self.status = 'Cancelled'
             self.save()
             return True, _("Booking cancelled successfully.")
@@ -216,6 +360,23 @@ class Booking(models.Model):
             return False, _("Cancellation cannot be approved. Current status is not PendingCancellation.")
 
 
+class SeatHold(models.Model):
+    """Seats taken for an unpaid booking until expires_at."""
+    hold_id = models.AutoField(primary_key=True)
+    booking = models.OneToOneField('Booking', on_delete=models.CASCADE, related_name='seat_hold')
+    flight_ticket_type = models.ForeignKey('FlightTicketType', on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def is_expired(self):
+        """Check if the hold has run out."""
+        return timezone.now() >= self.expires_at
+
+    def __str__(self):
+        return f"Hold {self.hold_id} - Booking {self.booking_id} - {self.quantity} seats until {self.expires_at}"
+
+
 class Payment(models.Model):
     payment_id = models.AutoField(primary_key=True)
     booking = models.ForeignKey('Booking', on_delete=models.CASCADE)
@@ -223,7 +384,7 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(auto_now_add=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
-    transaction_id = models.CharField(max_length=MAX_LENGTH_NAME)
+    transaction_id = models.CharField(max_length=MAX_LENGTH_NAME, db_index=True)
 
     def formatted_amount(self):
         """Return the payment amount formatted as a string."""
@@ -233,6 +394,57 @@ class Payment(models.Model):
         return (f"Payment {self.payment_id} - {self.booking} - "
                 f"{self.formatted_amount()} - {self.get_payment_method_display()}")
 
+class IdempotencyKey(models.Model):
+    """A form submission claimed by an account, and the response it got."""
+    key_id = models.AutoField(primary_key=True)
+    account = models.ForeignKey('Account', on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=MAX_LENGTH_NAME, blank=True)
+    content = models.BinaryField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'key'], name='unique_account_idempotency_key'),
+        ]
+
+    def is_expired(self):
+        """Check if the key can be claimed again."""
+        return timezone.now() >= self.expires_at
+
+    def is_completed(self):
+        """Check if the response of the first submission has been stored."""
+        return self.status_code is not None
+
+    def __str__(self):
+        return f"Key {self.key} - {self.account} - until {self.expires_at}"
+
+class Job(models.Model):
+    """A unit of background work, run by the runworker command."""
+    job_id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=MAX_LENGTH_NAME)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=JOB_MAX_ATTEMPTS)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=MAX_LENGTH_NAME, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.job_id} - {self.name} - {self.status}"
+
 class Voucher(models.Model):
     voucher_id = models.AutoField(primary_key=True)
     code = models.CharField(max_length=MAX_LENGTH_NAME)
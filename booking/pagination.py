@@ -0,0 +1,147 @@
+import base64
+import binascii
+import datetime
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """JSON encoder that keeps datetimes to the microsecond.
+
+    DjangoJSONEncoder rounds them to milliseconds, which would make a
+    cursor skip rows created within the same millisecond.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _parse_ordering(ordering):
+    """Split order_by strings into (field, descending) pairs."""
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def encode_cursor(obj, ordering):
+    """Return an opaque cursor holding the sort key of obj."""
+    values = [getattr(obj, name) for name, descending in _parse_ordering(ordering)]
+    raw = json.dumps(values, cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(model, cursor, ordering):
+    """Return the sort key stored in a cursor, or None if it cannot be read."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    fields = _parse_ordering(ordering)
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        return [model._meta.get_field(name).to_python(value) for (name, descending), value in zip(fields, values)]
+    except ValidationError:
+        return None
+
+
+def _seek(ordering, values, forward=True):
+    """Build the condition selecting rows strictly after (or before) a sort key.
+
+    For (a, b) this is a > x OR (a = x AND b > y), which the database can
+    answer with a range scan on an index over the ordering columns.
+    """
+    condition = Q(pk__in=[])
+    equal = {}
+    for (name, descending), value in zip(_parse_ordering(ordering), values):
+        lookup = 'gt' if descending != forward else 'lt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def _reverse(ordering):
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+def _page_query(queryset, ordering, per_page, after, before):
+    """Return (queryset of at most per_page + 1 rows, after key, before key) for a page."""
+    model = queryset.model
+    after_key = decode_cursor(model, after, ordering) if after else None
+    before_key = decode_cursor(model, before, ordering) if before else None
+    if before_key is not None:
+        return (queryset.filter(_seek(ordering, before_key, forward=False))
+                .order_by(*_reverse(ordering))[:per_page + 1]), after_key, before_key
+    if after_key is not None:
+        queryset = queryset.filter(_seek(ordering, after_key))
+    return queryset.order_by(*ordering)[:per_page + 1], after_key, before_key
+
+
+def _page(rows, ordering, per_page, after_key, before_key):
+    if before_key is not None:
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after_key is not None
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], ordering) if has_next and rows else None,
+        previous_cursor=encode_cursor(rows[0], ordering) if has_previous and rows else None,
+    )
+
+
+def keyset_paginate(queryset, ordering, per_page, after=None, before=None):
+    """Return one KeysetPage of queryset.
+
+    ordering must end with a unique column so every row has a distinct
+    key. The page is read with a single query whatever page it is, unlike
+    OFFSET which scans every row it skips.
+    """
+    query, after_key, before_key = _page_query(queryset, ordering, per_page, after, before)
+    return _page(list(query), ordering, per_page, after_key, before_key)
+
+
+async def akeyset_paginate(queryset, ordering, per_page, after=None, before=None):
+    """keyset_paginate() for async views, reading the page with the async ORM."""
+    query, after_key, before_key = _page_query(queryset, ordering, per_page, after, before)
+    return _page([row async for row in query], ordering, per_page, after_key, before_key)
+
+
+def filter_query(params):
+    """Return the querystring of params without the pagination cursors."""
+    params = params.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    return params.urlencode()
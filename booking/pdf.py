@@ -0,0 +1,17 @@
+from io import BytesIO
+from xhtml2pdf import pisa
+
+# Kept free of Django imports so pool workers can load it without settings.
+
+
+class PDFRenderError(Exception):
+    """Raised when pisa cannot turn a ticket's HTML into a PDF."""
+
+
+def html_to_pdf(html, encoding):
+    """Convert an HTML document to PDF bytes."""
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode(encoding)), result)
+    if pdf.err:
+        raise PDFRenderError(f"pisa reported {pdf.err} error(s).")
+    return result.getvalue()
@@ -0,0 +1,104 @@
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from .models import Airport, TicketType
+
+VERSION_KEY = 'reference:version'
+
+_lock = threading.Lock()
+_data = {'version': None}
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _load():
+    """Return this process's copy of the reference data, reloading it when stale.
+
+    The tables are only read again after invalidate() moved the shared
+    version, so a warm process serves every page without a query.
+    """
+    global _data
+    version = _current_version()
+    data = _data
+    if data['version'] == version:
+        return data
+    with _lock:
+        if _data['version'] == version:
+            return _data
+        airports = list(Airport.objects.order_by('airport_code').values("airport_code", "name", "city", "country", "timezone"))
+        ticket_types = list(TicketType.objects.order_by('ticket_type_id').values("ticket_type_id", "name"))
+        _data = {
+            'airports': airports,
+            'ticket_types': ticket_types,
+            'cities': sorted({airport['city'] for airport in airports}),
+            'timezones': {airport['airport_code']: airport['timezone'] for airport in airports},
+            'ticket_type_ids': {ticket_type['name']: ticket_type['ticket_type_id'] for ticket_type in ticket_types},
+            'version': version,
+        }
+        return _data
+
+
+async def aload():
+    """Return the reference data from an async view.
+
+    A warm copy only costs a cache read; reloading the tables runs in a
+    thread, as the synchronous _load() does.
+    """
+    version = await cache.aget(VERSION_KEY)
+    data = _data
+    if version is not None and data['version'] == version:
+        return data
+    return await sync_to_async(_load)()
+
+
+def get_airports():
+    """Retrieve all airports."""
+    return _load()['airports']
+
+
+def get_ticket_types():
+    """Retrieve all ticket types."""
+    return _load()['ticket_types']
+
+
+def get_ticket_type_id(name):
+    """Return the id of the ticket type with this name, or None."""
+    return _load()['ticket_type_ids'].get(name)
+
+
+def get_airport_timezone(airport_code):
+    """Return the time zone name of an airport, or None."""
+    return _load()['timezones'].get(airport_code)
+
+
+def get_airport_timezones():
+    """Return the time zone name of every airport, by airport code."""
+    return _load()['timezones']
+
+
+def _bump():
+    global _data
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    with _lock:
+        _data = {'version': None}
+
+
+def invalidate():
+    """Make every process reload the reference data on its next read.
+
+    As with the search cache, the version moves now and again on commit
+    so a reload racing the transaction cannot pin the old rows.
+    """
+    _bump()
+    transaction.on_commit(_bump)
@@ -0,0 +1,65 @@
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+from .constants import ROUND_TRIP_MIN_GAP_MINUTES
+
+RoundTripPair = namedtuple('RoundTripPair', ['outbound', 'inbound', 'total_price', 'duration'])
+
+MIN_GAP = timedelta(minutes=ROUND_TRIP_MIN_GAP_MINUTES)
+
+
+def rank_key(flight):
+    """How a single flight ranks: cheapest first, then shortest."""
+    return (flight.price, flight.arrival_time - flight.departure_time)
+
+
+def is_valid_pair(outbound, inbound, min_gap=MIN_GAP):
+    """Check that the return flight leaves at least min_gap after the outbound one lands."""
+    return inbound.departure_time - outbound.arrival_time >= min_gap
+
+
+class _Sequence:
+    """Reads an iterable only as far as it has been indexed."""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.items = []
+
+    def get(self, index):
+        while len(self.items) <= index:
+            item = next(self.iterator, None)
+            if item is None:
+                return None
+            self.items.append(item)
+        return self.items[index]
+
+
+def ranked_pairs(outbound, inbound, min_gap=MIN_GAP):
+    """Yield valid (outbound, inbound) RoundTripPairs by total price, then total duration.
+
+    Both inputs must already be ordered by rank_key. Pairs are merged
+    with a heap from the two sorted sequences, so the cheapest pair comes
+    out first and the inputs are only read as deep as the pairs that are
+    actually taken. Pairs closer than min_gap are skipped.
+    """
+    outbound, inbound = _Sequence(outbound), _Sequence(inbound)
+    heap = []
+
+    def push(i, j):
+        first, second = outbound.get(i), inbound.get(j)
+        if first is not None and second is not None:
+            first_price, first_duration = rank_key(first)
+            second_price, second_duration = rank_key(second)
+            heapq.heappush(heap, (first_price + second_price, first_duration + second_duration, i, j))
+
+    push(0, 0)
+    while heap:
+        total_price, duration, i, j = heapq.heappop(heap)
+        # Every (i, j) pair is pushed onto the heap exactly once
+        push(i, j + 1)
+        if j == 0:
+            push(i + 1, 0)
+        first, second = outbound.get(i), inbound.get(j)
+        if is_valid_pair(first, second, min_gap):
+            yield RoundTripPair(first, second, total_price, duration)
+
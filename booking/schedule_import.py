@@ -0,0 +1,307 @@
+import csv
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+from .dates import get_zone, local_date
+from .models import Airport, Flight, FlightSearchIndex, FlightTicketType, TicketType
+from .search_cache import invalidate_routes
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED_COLUMNS = [
+    'flight_number', 'departure_airport', 'arrival_airport', 'departure_time', 'arrival_time',
+    'ticket_type', 'price', 'available_seats',
+]
+
+ScheduleRow = namedtuple('ScheduleRow', [
+    'line', 'airline', 'flight_number', 'departure_airport', 'arrival_airport',
+    'departure_time', 'arrival_time', 'ticket_type', 'price', 'available_seats',
+])
+
+
+class ScheduleRowError(ValueError):
+    """A line of a schedule file that cannot be imported."""
+
+    def __init__(self, line, message):
+        self.line = line
+        super().__init__(f"Line {line}: {message}")
+
+
+class ImportReport:
+    """What an import did, and how fast."""
+
+    def __init__(self):
+        self.rows = 0
+        self.flights_created = 0
+        self.flights_updated = 0
+        self.fares_created = 0
+        self.fares_updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, error):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(str(error))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} rows in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s): "
+                f"{self.flights_created} flights created, {self.flights_updated} updated, "
+                f"{self.fares_created} fares created, {self.fares_updated} updated, "
+                f"{self.error_count} rows rejected")
+
+
+def read_rows(stream):
+    """Yield (line number, row dict) from a CSV text stream, one line at a time."""
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ScheduleRowError(1, f"missing columns {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, {key: (value or '').strip() for key, value in row.items() if key}
+
+
+def _local(value, zone, line, column):
+    """Read a datetime column; naive values are local times at the airport."""
+    moment = parse_datetime(value) if value else None
+    if moment is None:
+        raise ScheduleRowError(line, f"{column} is not a date and time")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, zone)
+    return moment
+
+
+def _days_of_operation(value, line):
+    """Read an SSIM days-of-operation field like '1234567' or '1 3 5 7' (Monday is 1)."""
+    days = {int(char) - 1 for char in value if char.isdigit()} if value else set(range(7))
+    if not days or any(day > 6 for day in days):
+        raise ScheduleRowError(line, "days must list weekdays 1 to 7")
+    return days
+
+
+def parse_rows(rows, airports, ticket_types):
+    """Turn raw rows into ScheduleRows, expanding SSIM-style periods into dated flights.
+
+    A row with period_start and period_end describes a flight operating
+    on the listed days of every week in that period, with departure_time
+    and arrival_time as local HH:MM at each airport and arrival_day_offset
+    for overnight arrivals. Other rows carry full departure and arrival
+    datetimes. Yields ScheduleRowError for lines that cannot be used.
+    """
+    for line, row in rows:
+        try:
+            departure_airport = airports.get(row['departure_airport'].upper())
+            arrival_airport = airports.get(row['arrival_airport'].upper())
+            if departure_airport is None or arrival_airport is None:
+                raise ScheduleRowError(line, "unknown airport")
+            if departure_airport == arrival_airport:
+                raise ScheduleRowError(line, "departure and arrival airports are the same")
+            ticket_type = ticket_types.get(row['ticket_type'])
+            if ticket_type is None:
+                raise ScheduleRowError(line, f"unknown ticket type {row['ticket_type']!r}")
+            if not row['flight_number']:
+                raise ScheduleRowError(line, "flight_number is empty")
+            try:
+                price = Decimal(row['price'])
+                seats = int(row['available_seats'])
+            except (InvalidOperation, ValueError):
+                raise ScheduleRowError(line, "price and available_seats must be numbers")
+            if price < 0 or seats < 0:
+                raise ScheduleRowError(line, "price and available_seats cannot be negative")
+            departure_zone = get_zone(departure_airport.timezone)
+            arrival_zone = get_zone(arrival_airport.timezone)
+            common = dict(
+                line=line, airline=row.get('airline', ''), flight_number=row['flight_number'],
+                departure_airport=departure_airport, arrival_airport=arrival_airport,
+                ticket_type=ticket_type, price=price, available_seats=seats,
+            )
+            if row.get('period_start'):
+                first, last = parse_date(row['period_start']), parse_date(row.get('period_end', ''))
+                departs, arrives = parse_time(row['departure_time']), parse_time(row['arrival_time'])
+                if first is None or last is None or last < first:
+                    raise ScheduleRowError(line, "period_start and period_end must be an ordered pair of dates")
+                if departs is None or arrives is None:
+                    raise ScheduleRowError(line, "departure_time and arrival_time must be HH:MM")
+                weekdays = _days_of_operation(row.get('days', ''), line)
+                offset = int(row.get('arrival_day_offset') or 0)
+                day = first
+                while day <= last:
+                    if day.weekday() in weekdays:
+                        departure = datetime.combine(day, departs, tzinfo=departure_zone)
+                        arrival = datetime.combine(day + timedelta(days=offset), arrives, tzinfo=arrival_zone)
+                        yield _checked(ScheduleRow(departure_time=departure, arrival_time=arrival, **common))
+                    day += timedelta(days=1)
+            else:
+                yield _checked(ScheduleRow(
+                    departure_time=_local(row['departure_time'], departure_zone, line, 'departure_time'),
+                    arrival_time=_local(row['arrival_time'], arrival_zone, line, 'arrival_time'),
+                    **common
+                ))
+        except ScheduleRowError as error:
+            yield error
+        except ValueError as error:
+            yield ScheduleRowError(line, str(error))
+
+
+def _checked(row):
+    if row.arrival_time <= row.departure_time:
+        return ScheduleRowError(row.line, "arrival must be after departure")
+    return row
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def flight_key(flight_number, departure_airport_id, departure_time, tz_name):
+    """A flight is identified by its number, origin and local departure date."""
+    return (flight_number, departure_airport_id, local_date(departure_time, tz_name))
+
+
+class ScheduleImporter:
+    """Upserts flights and their fares from parsed schedule rows, batch by batch.
+
+    Airports and ticket types are looked up in maps loaded once. Each
+    batch is one transaction: existing flights and fares are read with
+    two queries, new ones are bulk inserted and changed ones bulk
+    updated, then the search rows of the flights that changed are
+    rewritten and the cached searches of their routes are expired. Seats of fares that
+    already exist are left alone, because they already reflect sales.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, log=None):
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.airports = {airport.airport_code.upper(): airport for airport in Airport.objects.all()}
+        self.ticket_types = {ticket_type.name: ticket_type for ticket_type in TicketType.objects.all()}
+
+    def run(self, stream):
+        report = ImportReport()
+        parsed = parse_rows(read_rows(stream), self.airports, self.ticket_types)
+        for batch in batched(parsed, self.batch_size):
+            rows = []
+            for item in batch:
+                if isinstance(item, ScheduleRowError):
+                    report.add_error(item)
+                else:
+                    rows.append(item)
+            report.rows += len(batch)
+            if rows:
+                self.write(rows, report)
+            self.log(f"{report.rows} rows, {report.rows / (time.perf_counter() - report.started):.0f} rows/s")
+        return report.finish()
+
+    def _existing_flights(self, rows):
+        departures = [row.departure_time for row in rows]
+        flights = Flight.objects.filter(
+            flight_number__in={row.flight_number for row in rows},
+            departure_airport__in={row.departure_airport.pk for row in rows},
+            departure_time__gte=min(departures) - timedelta(days=1),
+            departure_time__lt=max(departures) + timedelta(days=1),
+        )
+        found = {}
+        for flight in flights:
+            flight.departure_airport = self.airports[flight.departure_airport_id.upper()]
+            found[flight_key(flight.flight_number, flight.departure_airport_id, flight.departure_time,
+                             flight.departure_airport.timezone)] = flight
+        return found
+
+    def write(self, rows, report):
+        with transaction.atomic():
+            flights = self._existing_flights(rows)
+            created, changed = {}, {}
+            for row in rows:
+                key = flight_key(row.flight_number, row.departure_airport.pk, row.departure_time,
+                                 row.departure_airport.timezone)
+                flight = flights.get(key) or created.get(key)
+                if flight is None:
+                    created[key] = Flight(
+                        flight_number=row.flight_number, airline=row.airline,
+                        departure_airport=row.departure_airport, arrival_airport=row.arrival_airport,
+                        departure_time=row.departure_time, arrival_time=row.arrival_time,
+                    )
+                elif flight.pk and (flight.airline, flight.arrival_airport_id, flight.departure_time, flight.arrival_time) != (
+                        row.airline, row.arrival_airport.pk, row.departure_time, row.arrival_time):
+                    flight.airline = row.airline
+                    flight.arrival_airport = row.arrival_airport
+                    flight.departure_time = row.departure_time
+                    flight.arrival_time = row.arrival_time
+                    changed[key] = flight
+            if created:
+                Flight.objects.bulk_create(created.values())
+                if any(flight.pk is None for flight in created.values()):
+                    # MySQL returns no ids from a bulk insert, so read the new flights back
+                    flights.update(self._existing_flights(rows))
+                else:
+                    flights.update(created)
+            if changed:
+                Flight.objects.bulk_update(changed.values(), ['airline', 'arrival_airport', 'departure_time', 'arrival_time'])
+            report.flights_created += len(created)
+            report.flights_updated += len(changed)
+
+            fares = {}
+            for row in rows:
+                flight = flights[flight_key(row.flight_number, row.departure_airport.pk, row.departure_time,
+                                            row.departure_airport.timezone)]
+                fares[(flight.pk, row.ticket_type.pk)] = (flight, row)
+            existing = {
+                (fare.flight_id, fare.ticket_type_id): fare
+                for fare in FlightTicketType.objects.filter(flight__in={flight.pk for flight, _row in fares.values()})
+            }
+            new_fares, changed_fares = [], []
+            for key, (flight, row) in fares.items():
+                fare = existing.get(key)
+                if fare is None:
+                    new_fares.append(FlightTicketType(
+                        flight=flight, ticket_type=row.ticket_type, price=row.price, available_seats=row.available_seats))
+                elif fare.price != row.price:
+                    fare.price = row.price
+                    changed_fares.append(fare)
+            if new_fares:
+                FlightTicketType.objects.bulk_create(new_fares)
+            if changed_fares:
+                FlightTicketType.objects.bulk_update(changed_fares, ['price'])
+            report.fares_created += len(new_fares)
+            report.fares_updated += len(changed_fares)
+            touched = {flight.pk for flight in list(created.values()) + list(changed.values())}
+            touched.update(fare.flight_id for fare in new_fares + changed_fares)
+            if touched:
+                self.reindex({flight.pk: flight for flight, _row in fares.values() if flight.pk in touched})
+
+    def reindex(self, flights):
+        """Rewrite the search rows of flights and expire the searches they appear in."""
+        routes = FlightSearchIndex.routes(flight__in=list(flights))
+        FlightSearchIndex.objects.filter(flight__in=list(flights)).delete()
+        entries = []
+        for fare in FlightTicketType.objects.filter(flight__in=list(flights)):
+            entries.append(FlightSearchIndex(
+                flight_ticket_type_id=fare.pk, **FlightSearchIndex.row_values(flights[fare.flight_id], fare)))
+        FlightSearchIndex.objects.bulk_create(entries)
+        routes.extend(entry.route() for entry in entries)
+        invalidate_routes(routes)
+
+
+def import_schedule(stream, batch_size=IMPORT_BATCH_SIZE, log=None):
+    """Import a CSV schedule from a text stream; return an ImportReport."""
+    return ScheduleImporter(batch_size=batch_size, log=log).run(stream)
@@ -0,0 +1,49 @@
+import hashlib
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils.http import quote_etag
+from .constants import SEARCH_API_CHUNK_SIZE, NDJSON_CONTENT_TYPE
+
+API_VERSION = 1
+
+# Columns sent to the client; prices stay numbers for the client to format
+FIELDS = ('flight_id', 'departure_airport_id', 'arrival_airport_id', 'departure_time', 'arrival_time',
+          'price', 'available_seats')
+ALIASES = {'flight_number': F('flight__flight_number'), 'airline': F('flight__airline')}
+
+
+def wants_ndjson(request):
+    """Whether the client asked for one JSON object per line instead of one document."""
+    return request.GET.get('format') == 'ndjson' or NDJSON_CONTENT_TYPE in request.headers.get('Accept', '')
+
+
+def rows(queryset):
+    """Restrict a search index queryset to the API columns."""
+    return queryset.values(*FIELDS, **ALIASES)
+
+
+def search_etag(results, params, ndjson):
+    """Return an ETag for a search, from its parameters and the rows it returns.
+
+    results is a list of (direction, rows). The tag is a hash of the
+    rows themselves rather than of the search cache's route versions,
+    which only move in the process that changed the route unless the
+    cache is shared, so it is right whatever cache backend is used.
+    """
+    digest = hashlib.sha1(f"v{API_VERSION}|{'ndjson' if ndjson else 'json'}".encode())
+    for key in sorted(params):
+        digest.update(f"|{key}={params[key]}".encode())
+    for direction, direction_rows in results:
+        digest.update(f"|{direction}".encode())
+        for row in direction_rows:
+            digest.update(json.dumps(row, cls=DjangoJSONEncoder, sort_keys=True).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def ndjson_lines(querysets):
+    """Yield one JSON line per row of each (direction, queryset), read in chunks."""
+    for direction, queryset in querysets:
+        for row in queryset.iterator(chunk_size=SEARCH_API_CHUNK_SIZE):
+            row['direction'] = direction
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
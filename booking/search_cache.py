@@ -0,0 +1,154 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+SEARCH_CACHE_ALIAS = getattr(settings, 'SEARCH_CACHE_ALIAS', 'search')
+SEARCH_VERSION_CACHE_ALIAS = getattr(settings, 'SEARCH_VERSION_CACHE_ALIAS', 'default')
+SEARCH_CACHE_FRESH_SECONDS = getattr(settings, 'SEARCH_CACHE_FRESH_SECONDS', 60)
+SEARCH_CACHE_STALE_SECONDS = getattr(settings, 'SEARCH_CACHE_STALE_SECONDS', 300)
+SEARCH_CACHE_LOCK_SECONDS = 10
+
+
+def _cache():
+    return caches[SEARCH_CACHE_ALIAS]
+
+
+def _versions():
+    """The cache holding route versions.
+
+    It must be shared by every process so an invalidation reaches them
+    all, while the results themselves may stay in a per-process cache.
+    """
+    return caches[SEARCH_VERSION_CACHE_ALIAS]
+
+
+def _version_key(departure_airport, arrival_airport, departure_date):
+    return f"search:version:{departure_airport}:{arrival_airport}:{departure_date}"
+
+
+def _current_version(key):
+    cache = _versions()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def route_version(departure_airport, arrival_airport, departure_date):
+    """Return the current version of a (route, date) in the search cache.
+
+    A fresh version starts from the clock rather than from 1, so an
+    evicted counter can never come back to a version that old entries
+    were stored under.
+    """
+    return _current_version(_version_key(departure_airport, arrival_airport, departure_date))
+
+
+async def aroute_version(departure_airport, arrival_airport, departure_date):
+    """route_version() for async views."""
+    cache = _versions()
+    key = _version_key(departure_airport, arrival_airport, departure_date)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def route_calendar_version(departure_airport, arrival_airport):
+    """Return the version of a route over all its dates, bumped with any of them."""
+    return _current_version(_version_key(departure_airport, arrival_airport, '*'))
+
+
+def _bump(routes):
+    cache = _versions()
+    keys = set()
+    for departure_airport, arrival_airport, departure_date in routes:
+        keys.add(_version_key(departure_airport, arrival_airport, departure_date))
+        keys.add(_version_key(departure_airport, arrival_airport, '*'))
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_routes(routes):
+    """Expire cached searches of (departure, arrival, date) triples.
+
+    The version is bumped right away and once more when the surrounding
+    transaction commits, because a search running in between could
+    cache the old seats under the first new version.
+    """
+    routes = [(str(a), str(b), str(d)) for a, b, d in routes]
+    if routes:
+        _bump(routes)
+        transaction.on_commit(lambda: _bump(routes))
+
+
+def _search_keys(departure_airport, arrival_airport, departure_date, ticket_type_name, num_passengers):
+    """Return the entry key and refresh-lock key of a search."""
+    digest = hashlib.sha1(
+        f"{departure_airport}|{arrival_airport}|{departure_date}|{ticket_type_name}|{num_passengers}".encode()
+    ).hexdigest()
+    return f"search:result:{digest}", f"search:lock:{digest}"
+
+
+async def acached_search(departure_airport, arrival_airport, departure_date, ticket_type_name, num_passengers,
+                         compute):
+    """Return await compute() for a search, served from the search cache.
+
+    Entries are fresh for SEARCH_CACHE_FRESH_SECONDS and while their
+    route version is current. After that they stay usable for
+    SEARCH_CACHE_STALE_SECONDS: one request takes a short lock and
+    recomputes while concurrent requests for the same search keep getting
+    the stale result, so a burst of traffic on a route that is selling
+    does not all land on the database at once. Airport codes must be the
+    upper-case codes stored in the database, since those are the ones
+    invalidate_routes() bumps.
+    """
+    cache = _cache()
+    key, lock_key = _search_keys(
+        departure_airport, arrival_airport, departure_date, ticket_type_name, num_passengers)
+    version = await aroute_version(departure_airport, arrival_airport, departure_date)
+    entry = await cache.aget(key)
+    if entry is not None:
+        entry_version, fresh_until, value = entry
+        if entry_version == version and time.time() < fresh_until:
+            return value
+        if not await cache.aadd(lock_key, 1, timeout=SEARCH_CACHE_LOCK_SECONDS):
+            return value
+    try:
+        value = await compute()
+        await cache.aset(
+            key, (version, time.time() + SEARCH_CACHE_FRESH_SECONDS, value),
+            timeout=SEARCH_CACHE_FRESH_SECONDS + SEARCH_CACHE_STALE_SECONDS
+        )
+    finally:
+        if entry is not None:
+            await cache.adelete(lock_key)
+    return value
+
+
+def cached_calendar(departure_airport, arrival_airport, first_day, last_day, ticket_type_id, num_passengers,
+                    compute):
+    """Return compute() for a fare calendar window, cached until the route changes.
+
+    The entry is stored under the route-wide version, so a seat or
+    price change on any date of the route expires every window of it.
+    """
+    cache = _cache()
+    digest = hashlib.sha1(
+        f"{departure_airport}|{arrival_airport}|{first_day}|{last_day}|{ticket_type_id}|{num_passengers}".encode()
+    ).hexdigest()
+    key = f"search:calendar:{digest}"
+    version = route_calendar_version(departure_airport, arrival_airport)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    value = compute()
+    cache.set(key, (version, value), timeout=SEARCH_CACHE_FRESH_SECONDS + SEARCH_CACHE_STALE_SECONDS)
+    return value
@@ -0,0 +1,102 @@
+import re
+import secrets
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from .constants import REGEX_PATTERN
+from .holds import convert_holds
+from .models import Booking, Card, Payment
+
+MAX_REFERENCE_LENGTH = 32
+
+
+class SettlementError(Exception):
+    """Raised when a booking can no longer be paid by this account."""
+
+    def __init__(self, booking_id):
+        self.booking_id = booking_id
+        super().__init__(_("This ticket is not valid."))
+
+
+def new_reference():
+    """Return a fresh payment reference for the payment form."""
+    return secrets.token_hex(3).upper()
+
+
+def clean_reference(value):
+    """Return a posted payment reference, or a new one if it is missing or malformed."""
+    if value and len(value) <= MAX_REFERENCE_LENGTH and re.match(REGEX_PATTERN, value):
+        return value
+    return new_reference()
+
+
+def transaction_ids(reference, count):
+    """Return the transaction id of every leg paid under one reference."""
+    return [f"{reference}-{leg}" for leg in range(1, count + 1)]
+
+
+def settle(user, booking_ids, card_number, card_type, cardholder_name, expiry_date, amount, reference):
+    """Confirm bookings, take their seats and record one payment per booking.
+
+    Everything happens in one transaction with the bookings locked, so
+    two submissions of the same payment cannot both confirm them. A retry
+    carrying a reference that was already settled returns the stored
+    payments without touching the inventory again. Apart from seat holds,
+    which cost one statement per leg, the number of queries does not grow
+    with the number of bookings.
+
+    Returns (bookings, payments) in the order of booking_ids, each booking
+    once even if its id is repeated.
+    """
+    booking_ids = list(dict.fromkeys(int(booking_id) for booking_id in booking_ids))
+    ids = transaction_ids(reference, len(booking_ids))
+    with transaction.atomic():
+        locked = {
+            booking.pk: booking
+            for booking in Booking.objects.select_for_update().filter(pk__in=booking_ids).order_by('pk')
+        }
+        existing = {
+            payment.booking_id: payment
+            for payment in Payment.objects.filter(booking_id__in=booking_ids)
+        }
+        bookings = [locked.get(booking_id) for booking_id in booking_ids]
+        for booking_id, booking in zip(booking_ids, bookings):
+            if booking is None or booking.account_id != user.pk:
+                raise SettlementError(booking_id)
+        if all(
+            booking_id in existing and existing[booking_id].transaction_id == transaction_id
+            for booking_id, transaction_id in zip(booking_ids, ids)
+        ):
+            # This payment was already settled, return the earlier result
+            return bookings, [existing[booking_id] for booking_id in booking_ids]
+        for booking in bookings:
+            if booking.status != 'PendingCancellation':
+                raise SettlementError(booking.pk)
+
+        convert_holds(bookings)
+
+        card = Card.objects.filter(user=user).order_by('pk').first() or Card(user=user)
+        card.card_number = card_number
+        card.card_type = card_type
+        card.cardholder_name = cardholder_name
+        card.expiry_date = expiry_date
+        card.save()
+
+        now = timezone.now()
+        Booking.objects.filter(pk__in=booking_ids).update(status='Confirmed', booking_date=now)
+        payments = []
+        for booking, transaction_id in zip(bookings, ids):
+            booking.status = 'Confirmed'
+            booking.booking_date = now
+            payment = existing.get(booking.pk) or Payment(booking=booking)
+            payment.card = card
+            payment.amount = amount
+            payment.payment_method = 'Credit Card'
+            payment.transaction_id = transaction_id
+            payments.append(payment)
+        created = [payment for payment in payments if payment.pk is None]
+        updated = [payment for payment in payments if payment.pk is not None]
+        Payment.objects.bulk_create(created)
+        if updated:
+            Payment.objects.bulk_update(updated, ['card', 'amount', 'payment_method', 'transaction_id'])
+    return bookings, payments
@@ -0,0 +1,70 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Airport, TicketType, Flight, FlightTicketType, FlightSearchIndex
+from .search_cache import invalidate_routes
+from . import reference
+
+
+@receiver(post_save, sender=FlightTicketType)
+def refresh_search_entry(sender, instance, raw=False, **kwargs):
+    """Keep the search row of a flight ticket type up to date."""
+    if raw:
+        return
+    routes = FlightSearchIndex.routes(pk=instance.pk)
+    routes.append(FlightSearchIndex.refresh(instance).route())
+    invalidate_routes(routes)
+
+
+@receiver(post_delete, sender=FlightTicketType)
+def forget_search_entry(sender, instance, **kwargs):
+    """Expire cached searches that still list a deleted flight ticket type."""
+    try:
+        flight = instance.flight
+    except Flight.DoesNotExist:
+        return
+    invalidate_routes([(
+        flight.departure_airport_id,
+        flight.arrival_airport_id,
+        FlightSearchIndex.local_departure_date(flight)
+    )])
+
+
+@receiver(post_save, sender=Flight)
+def refresh_flight_search_entries(sender, instance, created=False, raw=False, **kwargs):
+    """Move the search rows of a flight when its route or schedule changes."""
+    if raw or created:
+        return
+    routes = FlightSearchIndex.routes(flight=instance)
+    routes.extend(entry.route() for entry in FlightSearchIndex.refresh_flight(instance))
+    invalidate_routes(routes)
+
+
+@receiver(pre_save, sender=Airport)
+def remember_airport_timezone(sender, instance, raw=False, **kwargs):
+    """Note the stored time zone of an airport before it is overwritten."""
+    if raw:
+        return
+    instance._previous_timezone = Airport.objects.filter(pk=instance.pk).values_list('timezone', flat=True).first()
+
+
+@receiver(post_save, sender=Airport)
+def redate_airport_departures(sender, instance, created=False, raw=False, **kwargs):
+    """Move departures to their new local dates when an airport changes time zone."""
+    previous = getattr(instance, '_previous_timezone', None)
+    if raw or created or previous is None or previous == instance.timezone:
+        return
+    routes = FlightSearchIndex.routes(departure_airport=instance)
+    FlightSearchIndex.redate_airport(instance)
+    routes.extend(FlightSearchIndex.routes(departure_airport=instance))
+    invalidate_routes(routes)
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=TicketType)
+@receiver(post_delete, sender=TicketType)
+def invalidate_reference_data(sender, raw=False, **kwargs):
+    """Reload airports and ticket types after any change to them."""
+    if raw:
+        return
+    reference.invalidate()
@@ -0,0 +1,16 @@
+from .emails import send_confirmations
+from .jobs import task
+from .tickets import render_ticket, ticket_context, ticket_queryset
+
+
+@task
+def render_tickets(booking_ids):
+    """Render the PDFs of freshly paid bookings, so print_ticket finds them cached."""
+    for ticket in ticket_queryset().filter(booking_id__in=booking_ids):
+        render_ticket(ticket_context(ticket))
+
+
+@task(name='send_confirmations', atomic=False)
+def send_confirmations_task():
+    """Email the tickets of every booking confirmed since the last run."""
+    send_confirmations()
@@ -0,0 +1,12 @@
+from django import template
+from booking.constants import PRICE_FORMAT
+
+register = template.Library()
+
+
+@register.filter
+def price(value):
+    """Format a price the way the booking pages show it, e.g. 1,700,000."""
+    if value is None or value == '':
+        return ''
+    return PRICE_FORMAT.format(value)
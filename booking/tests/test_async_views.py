@@ -0,0 +1,83 @@
+from datetime import timedelta
+from django.core.cache import caches
+from django.test import TestCase, AsyncClient
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport
+)
+from booking.metrics import registry
+from django.utils.dateparse import parse_datetime
+
+class AsyncViewsTest(TestCase):
+    """Requests through the async handler, as under ASGI.
+
+    A synchronous database call left in these views would raise
+    SynchronousOnlyOperation here.
+    """
+
+    def setUp(self):
+        caches['search'].clear()
+        registry.reset()
+        self.client = AsyncClient()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A1',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T08:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T08:00:00+0000') + timedelta(hours=1)
+        )
+        FlightTicketType.objects.create(flight=self.flight1, ticket_type=self.tickettype1, price=800000, available_seats=20)
+
+    async def test_index(self):
+        await self.client.aforce_login(self.user)
+        response = await self.client.get(reverse('index'), {
+            'tripType': 'oneway',
+            'from': 'HAN',
+            'to': 'DAD',
+            'departureDate': '2069-09-01',
+            'numPassengers': 1,
+            'chairType': 'Economy',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([flight.flight_id for flight in response.context['departure_flights']], [self.flight1.pk])
+        self.assertContains(response, '800,000 (VND)')
+        self.assertContains(response, reverse('user_bookings'))
+
+    async def test_flight_pages(self):
+        response = await self.client.get(reverse('flight_detail', kwargs={'flight_id': self.flight1.pk}))
+        self.assertContains(response, 'A1')
+        response = await self.client.get(reverse('flight_detail', kwargs={'flight_id': self.flight1.pk + 100}))
+        self.assertEqual(response.status_code, 404)
+        response = await self.client.get(reverse('flight'))
+        self.assertEqual([flight.flight_id for flight in response.context['flights']], [self.flight1.pk])
+
+    async def test_print_ticket_needs_an_active_user(self):
+        response = await self.client.post(reverse('print_ticket', kwargs={'booking_id': 1}))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith('/booking/login?next='))
+
+    async def test_metrics_middleware_counts_async_queries(self):
+        await self.client.get(reverse('flight'))
+        queries = registry.snapshot().get(('booking_view_queries', 'flight'))
+        self.assertIsNotNone(queries)
+        self.assertGreaterEqual(queries.total, 1)
@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+from booking.benchmark import FUNNEL, seed, run_funnel, percentile, compare
+from booking.models import Payment
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(TICKET_CACHE_DIR=self.cache_dir, TICKET_RENDER_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.scale = {'airports': 5, 'days': 3, 'flights_per_day': 4, 'accounts': 5, 'bookings': 10}
+
+    def test_funnel_reports_every_view(self):
+        seed(self.scale)
+        report = run_funnel(2).report()
+        self.assertEqual(list(report), FUNNEL)
+        for row in report.values():
+            self.assertEqual(row['requests'], 2)
+            self.assertGreater(row['queries'], 0)
+            self.assertLessEqual(row['p50_ms'], row['p90_ms'])
+            self.assertLessEqual(row['p90_ms'], row['p99_ms'])
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_compare_flags_query_and_latency_regressions(self):
+        baseline = {'index': {'queries': 3.0, 'p90_ms': 10.0}, 'process': {'queries': 20.0, 'p90_ms': 50.0}}
+        report = {'index': {'queries': 4.0, 'p90_ms': 12.0}, 'process': {'queries': 20.0, 'p90_ms': 90.0}}
+        regressions = compare(report, baseline, latency_tolerance=0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('index: 4.0 queries'))
+        self.assertTrue(regressions[1].startswith('process: p90'))
+
+    def test_compare_ignores_a_slow_p99(self):
+        baseline = {'index': {'queries': 3.0, 'p90_ms': 10.0, 'p99_ms': 12.0}}
+        report = {'index': {'queries': 3.0, 'p90_ms': 11.0, 'p99_ms': 80.0}}
+        self.assertEqual(compare(report, baseline, latency_tolerance=0.5), [])
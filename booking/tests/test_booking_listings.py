@@ -0,0 +1,128 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from booking.models import Account, Flight, FlightTicketType, TicketType, Airport, Booking
+from booking.constants import BOOKING_LIST_PAGE_SIZE
+from django.utils.dateparse import parse_datetime
+
+class BookingListingTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.other = Account.objects.create_user(
+            email="other@example.com",
+            username="other",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.admin = Account.objects.create_superuser(
+            email="admin@example.com",
+            username="admin0",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=200,
+        )
+
+    def create_bookings(self, count, account=None, status='Confirmed'):
+        return [
+            Booking.objects.create(
+                account=account or self.user,
+                flight_ticket_type=self.flighttickettype1,
+                seat_number='1',
+                status=status
+            )
+            for i in range(count)
+        ]
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries), response
+
+    def test_user_bookings_query_count_is_constant(self):
+        self.client.login(username='tester', password='12345678')
+        self.create_bookings(2)
+        small, response = self.count_queries(reverse('user_bookings'))
+        self.assertContains(response, 'A333')
+        self.create_bookings(BOOKING_LIST_PAGE_SIZE * 2)
+        large, response = self.count_queries(reverse('user_bookings'))
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['page']), BOOKING_LIST_PAGE_SIZE)
+
+    def test_pending_cancellations_query_count_is_constant(self):
+        self.client.login(username='admin0', password='12345678')
+        self.create_bookings(2, status='PendingCancellation')
+        small, response = self.count_queries(reverse('pending_cancellations'))
+        self.assertContains(response, 'tester@example.com')
+        self.create_bookings(BOOKING_LIST_PAGE_SIZE * 2, account=self.other, status='PendingCancellation')
+        large, response = self.count_queries(reverse('pending_cancellations'))
+        self.assertEqual(small, large)
+        next_page, response = self.count_queries(
+            reverse('pending_cancellations'), {'after': response.context['page'].next_cursor})
+        self.assertEqual(small, next_page)
+
+    def test_user_bookings_pages_newest_first_and_only_own(self):
+        self.client.login(username='tester', password='12345678')
+        own = self.create_bookings(BOOKING_LIST_PAGE_SIZE + 3)
+        self.create_bookings(2, account=self.other)
+        seen = []
+        params = {}
+        while True:
+            page = self.client.get(reverse('user_bookings'), params).context['page']
+            seen.extend(booking.booking_id for booking in page)
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, [booking.booking_id for booking in reversed(own)])
+
+    def test_status_and_date_filters(self):
+        self.client.login(username='tester', password='12345678')
+        confirmed = self.create_bookings(2)
+        canceled = self.create_bookings(1, status='Canceled')
+        Booking.objects.filter(pk=confirmed[0].pk).update(booking_date=parse_datetime('2030-01-05T10:00:00+0000'))
+        response = self.client.get(reverse('user_bookings'), {'status': 'Canceled'})
+        self.assertEqual([b.booking_id for b in response.context['page']], [canceled[0].booking_id])
+        response = self.client.get(reverse('user_bookings'), {'date_from': '2030-01-05', 'date_to': '2030-01-05'})
+        self.assertEqual([b.booking_id for b in response.context['page']], [confirmed[0].booking_id])
+        response = self.client.get(reverse('user_bookings'), {'date_from': '2030-02-31'})
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_pending_cancellations_ignores_status_filter(self):
+        self.client.login(username='admin0', password='12345678')
+        self.create_bookings(1, status='Confirmed')
+        pending = self.create_bookings(1, status='PendingCancellation')
+        response = self.client.get(reverse('pending_cancellations'), {'status': 'Confirmed'})
+        self.assertEqual([b.booking_id for b in response.context['page']], [pending[0].booking_id])
@@ -0,0 +1,122 @@
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from booking.checkout import checkout
+from booking.inventory import InsufficientSeats
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType,
+    Airport, Booking, Passenger, SeatHold
+)
+from django.utils.dateparse import parse_datetime
+
+class CheckoutTest(TestCase):
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flight2 = Flight.objects.create(
+            flight_number='A334',
+            airline='TestAir',
+            departure_airport=self.airport2,
+            arrival_airport=self.airport1,
+            departure_time=parse_datetime('2069-09-02T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-02T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.flighttickettype2 = FlightTicketType.objects.create(
+            flight=self.flight2,
+            ticket_type=self.tickettype1,
+            price=1000000,
+            available_seats=10,
+        )
+        self.legs = [(self.flight1, 'Economy'), (self.flight2, 'Economy')]
+
+    def passengers(self, count, first_name='Van'):
+        return [
+            Passenger(
+                first_name=first_name,
+                last_name='Nguyen',
+                gender='Male',
+                date_of_birth='1990-01-01',
+                nationality='Vietnamese',
+                passport_number='None',
+                passport_from_country='None'
+            )
+            for i in range(count)
+        ]
+
+    def statements(self, count):
+        with CaptureQueriesContext(connection) as queries:
+            checkout(self.user, self.passengers(count), str(count), self.legs, '0987654321', 'new@example.com')
+        return [q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+
+    def test_round_trip_creates_bookings_links_and_holds(self):
+        bookings = checkout(self.user, self.passengers(3), '3', self.legs, '0987654321', 'new@example.com')
+        self.assertEqual([b.flight_ticket_type_id for b in bookings],
+                         [self.flighttickettype1.pk, self.flighttickettype2.pk])
+        for booking in bookings:
+            self.assertEqual(booking.passengers.count(), 3)
+            self.assertTrue(SeatHold.objects.filter(booking=booking, quantity=3).exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.phone_number, '0987654321')
+        self.assertEqual(self.user.email, 'new@example.com')
+        self.flighttickettype2.refresh_from_db()
+        self.assertEqual(self.flighttickettype2.available_seats, 7)
+
+    def test_statement_count_does_not_depend_on_passengers(self):
+        # On backends that return no ids from a bulk insert (MySQL) the count grows with the passengers
+        if not connection.features.can_return_rows_from_bulk_insert:
+            self.skipTest("Backend cannot return ids from a bulk insert.")
+        one = self.statements(1)
+        nine = self.statements(9)
+        self.assertEqual(len(one), len(nine))
+
+    def test_insufficient_seats_leaves_no_orphans(self):
+        with self.assertRaises(InsufficientSeats):
+            checkout(self.user, self.passengers(11), '11', self.legs, '0987654321', 'new@example.com')
+        self.assertEqual(Passenger.objects.count(), 0)
+        self.assertEqual(Booking.objects.count(), 0)
+        self.flighttickettype1.refresh_from_db()
+        self.assertEqual(self.flighttickettype1.available_seats, 20)
+
+    def test_invalid_passenger_writes_nothing(self):
+        passengers = self.passengers(2) + self.passengers(1, first_name='Van1')
+        with self.assertNumQueries(0), self.assertRaises(ValidationError):
+            checkout(self.user, passengers, '3', self.legs, '0987654321', 'new@example.com')
+        self.assertEqual(Passenger.objects.count(), 0)
+
+    def test_unknown_ticket_type_writes_nothing(self):
+        with self.assertRaises(FlightTicketType.DoesNotExist):
+            checkout(self.user, self.passengers(1), '1', [(self.flight1, 'Business')], '0987654321', 'new@example.com')
+        self.assertEqual(Passenger.objects.count(), 0)
+        self.assertEqual(Booking.objects.count(), 0)
@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport
+)
+from booking.connections import FlightGraph, clear_graphs, find_connections, get_graph, search_graph
+from django.utils.dateparse import parse_datetime
+
+class ConnectionSearchTest(TestCase):
+    def setUp(self):
+        clear_graphs()
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airports = {}
+        for code, name, city in [
+            ('HAN', 'Noi Bai International Airport', 'Ha Noi'),
+            ('DAD', 'Da Nang International Airport', 'Da Nang'),
+            ('SGN', 'Tan Son Nhat International Airport', 'Ho Chi Minh'),
+            ('PQC', 'Phu Quoc International Airport', 'Phu Quoc'),
+        ]:
+            self.airports[code] = Airport.objects.create(
+                airport_code=code,
+                name=name,
+                city=city,
+                country='Viet Nam'
+            )
+        self.flights = {}
+        for number, origin, destination, departure, minutes, price in [
+            ('D1', 'HAN', 'PQC', '2069-09-01T06:00:00+0000', 180, 3000000),
+            ('A1', 'HAN', 'DAD', '2069-09-01T08:00:00+0000', 60, 500000),
+            ('A2', 'DAD', 'PQC', '2069-09-01T10:00:00+0000', 60, 600000),
+            # Only 30 minutes after A1 lands, too short to connect
+            ('A3', 'DAD', 'PQC', '2069-09-01T09:30:00+0000', 60, 100000),
+            # A wait of over 6 hours does not connect either
+            ('A4', 'DAD', 'PQC', '2069-09-01T16:00:00+0000', 60, 100000),
+            ('B1', 'HAN', 'SGN', '2069-09-01T07:00:00+0000', 120, 400000),
+            ('B2', 'SGN', 'DAD', '2069-09-01T10:00:00+0000', 60, 300000),
+            ('B3', 'DAD', 'PQC', '2069-09-01T12:00:00+0000', 60, 200000),
+            ('C1', 'HAN', 'DAD', '2069-09-02T08:00:00+0000', 60, 100000),
+        ]:
+            flight = Flight.objects.create(
+                flight_number=number,
+                airline='TestAir',
+                departure_airport=self.airports[origin],
+                arrival_airport=self.airports[destination],
+                departure_time=parse_datetime(departure),
+                arrival_time=parse_datetime(departure) + timedelta(minutes=minutes)
+            )
+            FlightTicketType.objects.create(flight=flight, ticket_type=self.tickettype1, price=price, available_seats=20)
+            self.flights[number] = flight
+
+    def numbers(self, results):
+        by_id = {flight.pk: number for number, flight in self.flights.items()}
+        return [[by_id[leg.flight_id] for leg in legs] for _itinerary, legs in results]
+
+    def test_itineraries_come_out_cheapest_first(self):
+        results, complete = find_connections('HAN', 'PQC', date(2069, 9, 1), self.tickettype1.pk)
+        self.assertTrue(complete)
+        self.assertEqual(self.numbers(results), [
+            ['A1', 'B3'], ['B1', 'B2', 'A4'], ['B1', 'B2', 'B3'], ['A1', 'A2'], ['D1']
+        ])
+        self.assertEqual([itinerary.price for itinerary, _legs in results], [700000, 800000, 900000, 1100000, 3000000])
+        self.assertEqual(results[0][1][1].departure_airport, 'DAD')
+
+    def test_stops_and_limit(self):
+        results, _complete = find_connections('HAN', 'PQC', date(2069, 9, 1), self.tickettype1.pk, max_stops=1)
+        self.assertNotIn(['B1', 'B2', 'B3'], self.numbers(results))
+        results, _complete = find_connections('HAN', 'PQC', date(2069, 9, 1), self.tickettype1.pk, limit=1)
+        self.assertEqual(self.numbers(results), [['A1', 'B3']])
+
+    def test_seats_are_checked(self):
+        fare = FlightTicketType.objects.get(flight=self.flights['B3'])
+        fare.available_seats = 1
+        fare.save()
+        graph = FlightGraph.load(date(2069, 9, 1), self.tickettype1.pk)
+        itineraries, _complete = search_graph(graph, 'HAN', 'PQC', date(2069, 9, 1), num_passengers=2)
+        self.assertEqual(len(itineraries), 3)
+
+    def test_graph_is_cached(self):
+        get_graph(date(2069, 9, 1), self.tickettype1.pk)
+        with self.assertNumQueries(0):
+            find_connections('HAN', 'PQC', date(2069, 9, 1), self.tickettype1.pk)
+
+    def test_budget_returns_partial_results(self):
+        graph = FlightGraph.load(date(2069, 9, 1), self.tickettype1.pk)
+        itineraries, complete = search_graph(graph, 'HAN', 'PQC', date(2069, 9, 1), budget_ms=-1)
+        self.assertLessEqual(len(itineraries), 5)
+        itineraries, complete = search_graph(graph, 'HAN', 'XXX', date(2069, 9, 1))
+        self.assertEqual((itineraries, complete), ([], True))
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('connections'), {
+            'from': 'HAN',
+            'to': 'PQC',
+            'date': '2069-09-01',
+            'chairType': 'Economy',
+            'limit': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['complete'])
+        self.assertEqual(len(data['itineraries']), 2)
+        first = data['itineraries'][0]
+        self.assertEqual((first['price'], first['stops'], first['duration_minutes']), (700000, 1, 300))
+        self.assertEqual([leg['flight_number'] for leg in first['legs']], ['A1', 'B3'])
+
+    def test_endpoint_rejects_bad_input(self):
+        for params in [
+            {'from': 'HAN', 'to': 'HAN', 'date': '2069-09-01', 'chairType': 'Economy'},
+            {'from': 'HAN', 'to': 'PQC', 'date': 'tomorrow', 'chairType': 'Economy'},
+            {'from': 'HAN', 'to': 'PQC', 'date': '2069-09-01', 'chairType': 'Deck'},
+            {'from': 'HAN', 'to': 'PQC', 'date': '2069-09-01', 'chairType': 'Economy', 'numPassengers': 'x'},
+        ]:
+            response = self.client.get(reverse('connections'), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.test import TestCase
+from booking.datagen import airport_code, build_routes, generate, season_factor
+from booking.models import (
+    Account, Airport, Booking, Flight, FlightSearchIndex, FlightTicketType
+)
+import random
+
+class DataGeneratorTest(TestCase):
+    def setUp(self):
+        self.sizes = {'airports': 8, 'days': 14, 'flights_per_day': 10, 'accounts': 20, 'bookings': 300}
+        self.start = datetime(2069, 1, 5, tzinfo=timezone.utc)
+
+    def snapshot(self):
+        return (
+            list(Flight.objects.order_by('pk').values_list(
+                'departure_airport', 'arrival_airport', 'departure_time', 'arrival_time')),
+            list(FlightTicketType.objects.order_by('pk').values_list('flight', 'ticket_type__name', 'price', 'available_seats')),
+            list(Booking.objects.order_by('pk').values_list('account', 'flight_ticket_type', 'seat_number', 'status')),
+        )
+
+    def test_airport_codes(self):
+        self.assertEqual([airport_code(i) for i in (0, 1, 25, 26)], ['AAA', 'AAB', 'AAZ', 'ABA'])
+
+    def test_generates_requested_volumes(self):
+        generate(**self.sizes, start=self.start, chunk_size=7)
+        self.assertEqual(Airport.objects.count(), 8)
+        self.assertEqual(Account.objects.count(), 20)
+        self.assertEqual(Booking.objects.count(), 300)
+        flights = Flight.objects.count()
+        self.assertGreater(flights, 14 * 10 * 0.6)
+        self.assertLess(flights, 14 * 10 * 1.4)
+        self.assertEqual(FlightTicketType.objects.count(), flights * 2)
+        self.assertEqual(FlightSearchIndex.objects.count(), flights * 2)
+        # Every day has a flight between the two largest airports
+        days = Flight.objects.filter(departure_airport='AAA', arrival_airport='AAB').dates('departure_time', 'day')
+        self.assertEqual(len(days), 14)
+        self.assertFalse(Booking.objects.exclude(flight_ticket_type__in=FlightTicketType.objects.all()).exists())
+
+    def test_same_seed_gives_same_data(self):
+        generate(**self.sizes, start=self.start, seed=3, chunk_size=7)
+        first = self.snapshot()
+        for model in (Booking, Account, Flight, Airport):
+            model.objects.all().delete()
+        generate(**self.sizes, start=self.start, seed=3, chunk_size=50)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_hubs_carry_more_traffic(self):
+        generate(**self.sizes, start=self.start)
+        departures = dict(Flight.objects.values_list('departure_airport').annotate(count=Count('pk')))
+        self.assertGreater(departures['AAA'], departures.get('AAH', 0))
+
+    def test_routes_are_distinct(self):
+        routes = build_routes(random.Random(0), 8, 20)
+        pairs = [(origin, destination) for origin, destination, _weight, _minutes in routes]
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertEqual(pairs[:2], [(0, 1), (1, 0)])
+
+    def test_weekends_and_summer_are_busier(self):
+        self.assertGreater(season_factor(datetime(2069, 1, 4)), season_factor(datetime(2069, 1, 2)))
+        self.assertGreater(season_factor(datetime(2069, 7, 18)), season_factor(datetime(2069, 1, 18)))
+
+    def test_command_refuses_a_database_with_airports(self):
+        Airport.objects.create(airport_code='HAN', name='Noi Bai', city='Ha Noi', country='Viet Nam')
+        with self.assertRaises(CommandError):
+            call_command('generate_data', '--airports', '3')
@@ -0,0 +1,112 @@
+from datetime import date, datetime, timezone as dt_timezone
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from booking.models import Flight, FlightTicketType, FlightSearchIndex, TicketType, Airport
+from booking.dates import local_day_range, local_date
+from django.utils.dateparse import parse_datetime, parse_date
+
+class LocalDayRangeTest(TestCase):
+    def test_range_is_half_open_utc_day_of_local_zone(self):
+        start, end = local_day_range(parse_date('2069-09-02'), 'Asia/Ho_Chi_Minh')
+        self.assertEqual(start, parse_datetime('2069-09-01T17:00:00+0000'))
+        self.assertEqual(end, parse_datetime('2069-09-02T17:00:00+0000'))
+
+    def test_local_date_uses_airport_zone(self):
+        value = parse_datetime('2069-09-01T20:00:00+0000')
+        self.assertEqual(local_date(value, 'Asia/Ho_Chi_Minh'), parse_date('2069-09-02'))
+        self.assertEqual(local_date(value, 'UTC'), parse_date('2069-09-01'))
+
+    def test_unknown_zone_falls_back_to_current_zone(self):
+        start, end = local_day_range(parse_date('2069-09-02'), 'Nowhere/Nothing')
+        self.assertEqual(end - start, parse_datetime('2069-09-03T00:00:00+0000') - parse_datetime('2069-09-02T00:00:00+0000'))
+
+    def test_range_is_clamped_at_the_ends_of_the_calendar(self):
+        start, end = local_day_range(date.max, 'America/New_York')
+        self.assertEqual(start, parse_datetime('9999-12-31T05:00:00+0000'))
+        self.assertEqual(end, datetime.max.replace(tzinfo=dt_timezone.utc))
+        start, end = local_day_range(date.min, 'Asia/Ho_Chi_Minh')
+        self.assertEqual(start, datetime.min.replace(tzinfo=dt_timezone.utc))
+        self.assertEqual(end.date(), date.min)
+
+
+class LocalDateFilterTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam',
+            timezone='Asia/Ho_Chi_Minh'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam',
+            timezone='Asia/Ho_Chi_Minh'
+        )
+        # 20:00 UTC is 03:00 the next morning in Viet Nam
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T20:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T21:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+
+    def test_search_index_uses_departure_airport_date(self):
+        entry = FlightSearchIndex.objects.get(flight_ticket_type=self.flighttickettype1)
+        self.assertEqual(entry.departure_date, parse_date('2069-09-02'))
+
+    def test_homepage_search_finds_flight_on_local_date(self):
+        response = self.client.get(reverse('index'), {
+            'tripType': 'oneway',
+            'from': 'HAN',
+            'to': 'DAD',
+            'departureDate': '2069-09-02',
+            'numPassengers': '1',
+            'chairType': 'Economy'
+        })
+        self.assertContains(response, 'HAN --- DAD')
+
+    def test_flight_list_filters_by_local_date_range(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('flight'), {'departure_date': '2069-09-02'})
+        self.assertContains(response, 'A333')
+        flight_queries = [q['sql'] for q in queries.captured_queries if 'FROM "booking_flight"' in q['sql']]
+        self.assertTrue(flight_queries)
+        for sql in flight_queries:
+            self.assertNotIn('django_datetime_cast_date', sql)
+        response = self.client.get(reverse('flight'), {'departure_date': '2069-09-01'})
+        self.assertNotContains(response, 'A333')
+
+    def test_flight_list_rejects_invalid_date(self):
+        response = self.client.get(reverse('flight'), {'departure_date': '2069-13-45'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'A333')
+
+    def test_last_day_of_the_calendar_is_not_an_error(self):
+        response = self.client.get(reverse('flight'), {'date_to': '9999-12-31'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('index'), {
+            'tripType': 'oneway', 'from': 'HAN', 'to': 'DAD', 'departureDate': '9999-12-31',
+            'numPassengers': '1', 'chairType': 'Economy'
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_changing_airport_timezone_redates_search_rows(self):
+        self.airport1.timezone = 'UTC'
+        self.airport1.save()
+        entry = FlightSearchIndex.objects.get(flight_ticket_type=self.flighttickettype1)
+        self.assertEqual(entry.departure_date, parse_date('2069-09-01'))
@@ -0,0 +1,182 @@
+import shutil
+import tempfile
+from unittest import mock
+from django.core import mail
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from booking import emails
+from booking.holds import place_holds
+from booking.jobs import run_pending
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType,
+    Airport, Booking, Payment, Card, Passenger, Job
+)
+from booking.tickets import ticket_context, ticket_path, ticket_queryset, ticket_version
+from django.utils.dateparse import parse_datetime, parse_date
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ConfirmationEmailTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(TICKET_CACHE_DIR=self.cache_dir, TICKET_RENDER_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.user2 = Account.objects.create_user(
+            email="tester2@example.com",
+            username="tester2",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.card1 = Card.objects.create(
+            user=self.user,
+            card_number='4111111111111111',
+            cardholder_name='Van Nguyen',
+            expiry_date=parse_date('2030-01-01'),
+            card_type='Visa'
+        )
+
+    def confirmed_booking(self, account):
+        passenger = Passenger.objects.create(
+            first_name='Van',
+            last_name='Nguyen',
+            gender='Male',
+            date_of_birth=parse_date('1990-01-01'),
+            passport_number='None'
+        )
+        booking = Booking.objects.create(
+            account=account,
+            flight_ticket_type=self.flighttickettype1,
+            seat_number='1',
+            status='Confirmed'
+        )
+        booking.passengers.add(passenger)
+        Payment.objects.create(
+            booking=booking,
+            card=self.card1,
+            amount=1200000,
+            payment_method='Credit Card',
+            transaction_id=f'ABC{booking.booking_id}'
+        )
+        return booking
+
+    def cached_pdf(self, booking):
+        return ticket_path(booking.booking_id, ticket_version(ticket_context(
+            ticket_queryset().get(booking_id=booking.booking_id))))
+
+    def test_one_message_per_account_with_every_ticket_attached(self):
+        first = self.confirmed_booking(self.user)
+        second = self.confirmed_booking(self.user)
+        other = self.confirmed_booking(self.user2)
+        with mock.patch('booking.emails.get_connection', wraps=emails.get_connection) as get_connection:
+            self.assertEqual(emails.send_confirmations(), 2)
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 2)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['tester@example.com'])
+        self.assertEqual(message.subject, 'Your 2 flight bookings are confirmed')
+        self.assertIn('A333 HAN -> DAD', message.body)
+        self.assertEqual([name for name, _content, _type in message.attachments],
+                         [f'ticket-{first.booking_id}.pdf', f'ticket-{second.booking_id}.pdf'])
+        self.assertEqual(mail.outbox[1].to, ['tester2@example.com'])
+        self.assertEqual(mail.outbox[1].attachments[0][1], self.cached_pdf(other).read_bytes())
+        self.assertEqual(Booking.objects.filter(confirmation_sent_at__isnull=True).count(), 0)
+
+    def test_bookings_are_mailed_once(self):
+        self.confirmed_booking(self.user)
+        self.assertEqual(emails.send_confirmations(), 1)
+        self.assertEqual(emails.send_confirmations(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_is_retried(self):
+        booking = self.confirmed_booking(self.user)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            with self.assertRaises(OSError):
+                emails.send_confirmations()
+        self.assertIsNone(Booking.objects.get(pk=booking.pk).confirmation_sent_at)
+        self.assertEqual(emails.send_confirmations(), 1)
+
+    def test_batches_share_one_connection(self):
+        for _number in range(5):
+            self.confirmed_booking(self.user2)
+            self.confirmed_booking(self.user)
+        with mock.patch('booking.emails.get_connection', wraps=emails.get_connection) as get_connection:
+            # A batch takes all tickets of an account, so each account gets one email
+            self.assertEqual(emails.send_confirmations(batch_size=1), 2)
+        get_connection.assert_called_once()
+        self.assertEqual([len(message.attachments) for message in mail.outbox], [5, 5])
+
+    def test_ticket_that_cannot_be_rendered_does_not_block_others(self):
+        broken = self.confirmed_booking(self.user)
+        broken.payment_set.all().delete()
+        mailed = self.confirmed_booking(self.user)
+        other = self.confirmed_booking(self.user2)
+        with self.assertLogs('booking.emails', 'ERROR'):
+            self.assertEqual(emails.send_confirmations(batch_size=1), 2)
+        # The next run skips the failed ticket again and does not resend the others
+        with self.assertLogs('booking.emails', 'ERROR'):
+            self.assertEqual(emails.send_confirmations(batch_size=1), 0)
+        self.assertEqual([len(message.attachments) for message in mail.outbox], [1, 1])
+        self.assertEqual(mail.outbox[0].attachments[0][0], f'ticket-{mailed.booking_id}.pdf')
+        self.assertIsNone(Booking.objects.get(pk=broken.pk).confirmation_sent_at)
+        self.assertIsNotNone(Booking.objects.get(pk=other.pk).confirmation_sent_at)
+
+    def test_payment_mails_the_ticket_the_download_serves(self):
+        booking = Booking.objects.create(account=self.user, flight_ticket_type=self.flighttickettype1, seat_number='1')
+        place_holds([booking])
+        self.client.login(username='tester', password='12345678')
+        data = {
+            'ticket1': booking.booking_id,
+            'cardNumber': '9876678998766789987',
+            'cardHolderName': 'New Tester',
+            'expMonth': '01',
+            'expYear': '2060',
+            'cardType': 'Visa',
+        }
+        self.client.post(reverse('process'), data)
+        self.assertEqual(Job.objects.filter(name='send_confirmations', status='Pending').count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        # The email job runs a few seconds later to batch several payments
+        Job.objects.update(run_at=timezone.now())
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        attachment = mail.outbox[0].attachments[0][1]
+        with mock.patch('booking.tickets.html_to_pdf') as html_to_pdf:
+            response = self.client.post(reverse('print_ticket', args=[booking.booking_id]))
+        html_to_pdf.assert_not_called()
+        self.assertEqual(b''.join(response.streaming_content), attachment)
@@ -0,0 +1,181 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import Future
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from pypdf import PdfReader
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType,
+    Airport, Booking, Payment, Card, Passenger
+)
+from booking import exports, tickets
+from django.utils.dateparse import parse_datetime, parse_date
+
+class TicketExportTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(TICKET_CACHE_DIR=self.cache_dir, TICKET_RENDER_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.passenger1 = Passenger.objects.create(
+            first_name='Van',
+            last_name='Nguyen',
+            gender='Male',
+            date_of_birth=parse_date('1990-01-01'),
+            passport_number='None'
+        )
+        self.admin = Account.objects.create_superuser(
+            email="admin@example.com",
+            username="admin0",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.card1 = Card.objects.create(
+            user=self.user,
+            card_number='4111111111111111',
+            cardholder_name='Van Nguyen',
+            expiry_date=parse_date('2030-01-01'),
+            card_type='Visa'
+        )
+        self.bookings = []
+        for i in range(3):
+            booking = Booking.objects.create(
+                account=self.user,
+                flight_ticket_type=self.flighttickettype1,
+                seat_number='1',
+                status='Confirmed'
+            )
+            booking.passengers.add(self.passenger1)
+            Payment.objects.create(
+                booking=booking,
+                card=self.card1,
+                amount=1200000,
+                payment_method='Credit Card',
+                transaction_id=f'ABC12{i}'
+            )
+            self.bookings.append(booking)
+        # Unpaid bookings are skipped by the export
+        self.unpaid = Booking.objects.create(
+            account=self.user,
+            flight_ticket_type=self.flighttickettype1,
+            seat_number='1',
+            status='Confirmed'
+        )
+
+    def test_admin_action_streams_zip(self):
+        self.client.login(username='admin0', password='12345678')
+        response = self.client.post(reverse('admin:booking_booking_changelist'), {
+            'action': 'export_tickets_zip',
+            '_selected_action': [booking.booking_id for booking in self.bookings] + [self.unpaid.booking_id],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with self.assertLogs('booking.exports', 'WARNING'):
+            content = b''.join(response.streaming_content)
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        self.assertEqual(
+            archive.namelist(),
+            [f'ticket-{booking.booking_id}.pdf' for booking in self.bookings]
+        )
+        for name in archive.namelist():
+            self.assertTrue(archive.read(name).startswith(b'%PDF'))
+
+    def test_failed_render_becomes_an_error_entry(self):
+        real_schedule = exports.schedule_ticket
+        broken = self.bookings[1].booking_id
+
+        def schedule(context, template=None):
+            if context['ticket'].booking_id == broken:
+                future = Future()
+                future.set_exception(RuntimeError("renderer crashed"))
+                return future
+            return real_schedule(context, template=template)
+
+        with mock.patch('booking.exports.schedule_ticket', side_effect=schedule), \
+                self.assertLogs('booking.exports', 'ERROR'):
+            content = b''.join(exports.stream_ticket_zip(Booking.objects.filter(pk__in=[
+                booking.booking_id for booking in self.bookings])))
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        self.assertEqual(archive.namelist(), [
+            f'ticket-{self.bookings[0].booking_id}.pdf',
+            f'ticket-{broken}.error.txt',
+            f'ticket-{self.bookings[2].booking_id}.pdf',
+        ])
+        self.assertIn(b'could not be rendered', archive.read(f'ticket-{broken}.error.txt'))
+
+    def test_admin_merged_pdf_is_capped(self):
+        self.client.login(username='admin0', password='12345678')
+        with mock.patch('booking.admin.MERGED_PDF_MAX_TICKETS', 2), \
+                mock.patch('booking.admin.write_merged_pdf') as write_merged_pdf:
+            response = self.client.post(reverse('admin:booking_booking_changelist'), {
+                'action': 'export_tickets_pdf',
+                '_selected_action': [booking.booking_id for booking in self.bookings],
+            }, follow=True)
+        write_merged_pdf.assert_not_called()
+        self.assertContains(response, 'Select at most 2 bookings for one PDF')
+
+    def test_command_writes_merged_pdf(self):
+        output = os.path.join(self.cache_dir, 'tickets.pdf')
+        out = io.StringIO()
+        with self.assertLogs('booking.exports', 'WARNING'):
+            call_command('export_tickets', output, '--format', 'pdf', '--flight', str(self.flight1.flight_id), stdout=out)
+        self.assertIn('Exported 3 tickets', out.getvalue())
+        single = tickets.render_ticket(tickets.ticket_context(tickets.ticket_queryset().get(pk=self.bookings[0].pk)))
+        self.assertEqual(len(PdfReader(output).pages), len(PdfReader(single).pages) * 3)
+
+    def test_renders_in_flight_are_bounded(self):
+        scheduled = []
+        real_schedule = exports.schedule_ticket
+
+        def schedule(context, template=None):
+            scheduled.append(context['ticket'].booking_id)
+            return real_schedule(context, template=template)
+
+        with mock.patch('booking.exports.schedule_ticket', side_effect=schedule):
+            files = exports.iter_ticket_files(Booking.objects.all(), window=2)
+            first, path = next(files)
+            # At most 2 tickets are rendered at once
+            self.assertEqual(len(scheduled), 2)
+            with self.assertLogs('booking.exports', 'WARNING'):
+                rest = list(files)
+        self.assertEqual([first] + [ticket for ticket, path in rest], self.bookings)
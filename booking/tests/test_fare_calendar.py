@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport
+)
+from booking.fare_calendar import fare_calendar
+from django.utils.dateparse import parse_datetime
+
+class FareCalendarTest(TestCase):
+    def setUp(self):
+        caches['search'].clear()
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.fares = {}
+        for number, departure, price, seats in [
+            ('A1', '2069-09-01T01:00:00+0000', 1000000, 20),
+            ('A2', '2069-09-01T05:00:00+0000', 800000, 20),
+            # Sold out, so it does not count towards the lowest price
+            ('A3', '2069-09-01T07:00:00+0000', 300000, 1),
+            ('A4', '2069-09-03T05:00:00+0000', 500000, 20),
+            ('B1', '2069-09-09T05:00:00+0000', 100000, 20),
+        ]:
+            flight = Flight.objects.create(
+                flight_number=number,
+                airline='TestAir',
+                departure_airport=self.airport1,
+                arrival_airport=self.airport2,
+                departure_time=parse_datetime(departure),
+                arrival_time=parse_datetime(departure) + timedelta(hours=1)
+            )
+            self.fares[number] = FlightTicketType.objects.create(
+                flight=flight, ticket_type=self.tickettype1, price=price, available_seats=seats)
+
+    def test_lowest_price_per_day(self):
+        calendar = fare_calendar('HAN', 'DAD', date(2069, 9, 2), self.tickettype1.pk, num_passengers=2, days=2)
+        self.assertEqual([fare.date for fare in calendar], [date(2069, 8, 31) + timedelta(days=n) for n in range(5)])
+        self.assertEqual([fare.lowest_price for fare in calendar], [None, 800000, None, 500000, None])
+        self.assertEqual([fare.flights for fare in calendar], [0, 2, 0, 1, 0])
+
+    def test_window_is_cached_until_the_route_changes(self):
+        fare_calendar('HAN', 'DAD', date(2069, 9, 2), self.tickettype1.pk, days=2)
+        with self.assertNumQueries(0):
+            fare_calendar('HAN', 'DAD', date(2069, 9, 2), self.tickettype1.pk, days=2)
+        fare = self.fares['A4']
+        fare.price = 200000
+        fare.save()
+        with self.assertNumQueries(1):
+            calendar = fare_calendar('HAN', 'DAD', date(2069, 9, 2), self.tickettype1.pk, days=2)
+        self.assertEqual(calendar[3].lowest_price, 200000)
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('fare_calendar'), {
+            'from': 'HAN',
+            'to': 'DAD',
+            'date': '2069-09-02',
+            'chairType': 'Economy',
+            'days': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['days'], [
+            {'date': '2069-09-01', 'lowest_price': 300000, 'flights': 3},
+            {'date': '2069-09-02', 'lowest_price': None, 'flights': 0},
+            {'date': '2069-09-03', 'lowest_price': 500000, 'flights': 1},
+        ])
+
+    def test_endpoint_rejects_bad_input(self):
+        for params in [
+            {'from': 'HAN', 'to': 'HAN', 'date': '2069-09-01', 'chairType': 'Economy'},
+            {'from': 'HAN', 'to': 'DAD', 'date': '2069-13-01', 'chairType': 'Economy'},
+            {'from': 'HAN', 'to': 'DAD', 'date': '2069-09-01', 'chairType': 'Deck'},
+            {'from': 'HAN', 'to': 'DAD', 'date': '2069-09-01', 'chairType': 'Economy', 'days': 'all'},
+        ]:
+            response = self.client.get(reverse('fare_calendar'), params)
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking.models import Flight, Airport
+from booking.constants import FLIGHT_LIST_PAGE_SIZE
+from booking import reference
+from django.utils.dateparse import parse_datetime
+
+class FlightListPaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.start = parse_datetime('2069-09-01T00:00:00+0000')
+
+    def create_flights(self, count, airline='TestAir', departure_airport=None, offset=0):
+        flights = []
+        for i in range(count):
+            departure_time = self.start + timedelta(hours=(offset + i) // 2)
+            flights.append(Flight.objects.create(
+                flight_number=f'F{offset + i}',
+                airline=airline,
+                departure_airport=departure_airport or self.airport1,
+                arrival_airport=self.airport2,
+                departure_time=departure_time,
+                arrival_time=departure_time + timedelta(hours=1)
+            ))
+        return flights
+
+    def walk(self, params=None):
+        """Follow the next cursors and return the flights of every page."""
+        seen = []
+        params = dict(params or {})
+        while True:
+            response = self.client.get(reverse('flight'), params)
+            page = response.context['page']
+            seen.extend(page.object_list)
+            if not page.has_next:
+                return seen
+            params['after'] = page.next_cursor
+
+    def test_pages_cover_every_flight_once_in_order(self):
+        # Two flights leave at the same time, flight_id decides the order
+        flights = self.create_flights(FLIGHT_LIST_PAGE_SIZE * 2 + 3)
+        seen = self.walk()
+        self.assertEqual([flight.flight_id for flight in seen], [flight.flight_id for flight in flights])
+
+    def test_previous_cursor_returns_previous_page(self):
+        flights = self.create_flights(FLIGHT_LIST_PAGE_SIZE + 5)
+        first = self.client.get(reverse('flight')).context['page']
+        second = self.client.get(reverse('flight'), {'after': first.next_cursor}).context['page']
+        self.assertTrue(second.has_previous)
+        self.assertFalse(second.has_next)
+        back = self.client.get(reverse('flight'), {'before': second.previous_cursor}).context['page']
+        self.assertEqual(list(back.object_list), list(first.object_list))
+        self.assertFalse(back.has_previous)
+        self.assertEqual(len(second), len(flights) - FLIGHT_LIST_PAGE_SIZE)
+
+    def test_query_count_does_not_grow_with_table_size(self):
+        self.create_flights(5)
+        reference.get_airports()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('flight'))
+        self.assertContains(response, 'Da Nang')
+        self.create_flights(FLIGHT_LIST_PAGE_SIZE * 3, offset=5)
+        reference.get_airports()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('flight'))
+        page = response.context['page']
+        with self.assertNumQueries(1):
+            self.client.get(reverse('flight'), {'after': page.next_cursor})
+
+    def test_filters_by_airline_city_and_date_range(self):
+        self.create_flights(4, airline='TestAir')
+        other = self.create_flights(2, airline='OtherAir', offset=4)
+        seen = self.walk({'airline': 'OtherAir'})
+        self.assertEqual(seen, other)
+        seen = self.walk({'departure_location': 'Da Nang'})
+        self.assertEqual(seen, [])
+        # F0..F3 leave on 2069-09-01, there are no flights the day after
+        seen = self.walk({'date_from': '2069-09-01', 'date_to': '2069-09-01'})
+        self.assertEqual(len(seen), 6)
+        seen = self.walk({'date_from': '2069-09-02'})
+        self.assertEqual(seen, [])
+
+    def test_next_link_keeps_filters(self):
+        self.create_flights(FLIGHT_LIST_PAGE_SIZE + 1)
+        response = self.client.get(reverse('flight'), {'airline': 'TestAir'})
+        page = response.context['page']
+        self.assertContains(response, f'airline=TestAir&amp;after={page.next_cursor}')
+
+    def test_invalid_cursor_shows_first_page(self):
+        flights = self.create_flights(3)
+        response = self.client.get(reverse('flight'), {'after': 'not-a-cursor'})
+        self.assertEqual(list(response.context['page'].object_list), flights)
@@ -0,0 +1,149 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from booking.holds import place_holds, convert_holds, release_expired_holds
+from booking.models import (
+    Account, Flight, FlightTicketType, FlightSearchIndex,
+    TicketType, Airport, Booking, SeatHold, Card, Payment
+)
+from django.utils.dateparse import parse_datetime
+
+class SeatHoldTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+
+    def create_booking(self, seats='2'):
+        return Booking.objects.create(
+            account=self.user,
+            flight_ticket_type=self.flighttickettype1,
+            seat_number=seats
+        )
+
+    def seats(self):
+        self.flighttickettype1.refresh_from_db()
+        entry = FlightSearchIndex.objects.get(flight_ticket_type=self.flighttickettype1)
+        return self.flighttickettype1.available_seats, entry.available_seats
+
+    def test_payment_view_places_hold(self):
+        login = self.client.login(username='tester', password='12345678')
+        self.assertTrue(login)
+        response = self.client.post(reverse('payment'), {
+            'flight1': self.flight1.flight_id,
+            'flight1Class': 'Economy',
+            'countryCode': '84',
+            'mobile': '0123456888',
+            'email': 'tester@gmail.com',
+            'numPassengers': '2',
+            'passenger0Fname': 'New',
+            'passenger0Lname': 'Tester',
+            'passenger0Gender': 'Male',
+            'passenger0DateOfBirth': '2003-10-16',
+            'passenger0Nationality': 'Viet Nam',
+            'passenger1Fname': 'Other',
+            'passenger1Lname': 'Tester',
+            'passenger1Gender': 'Female',
+            'passenger1DateOfBirth': '2004-10-16',
+            'passenger1Nationality': 'Viet Nam',
+        })
+        self.assertEqual(response.status_code, 200)
+        booking = Booking.objects.get(account=self.user)
+        hold = SeatHold.objects.get(booking=booking)
+        self.assertEqual(hold.quantity, 2)
+        self.assertGreater(hold.expires_at, timezone.now())
+        # Held seats no longer show up in search results
+        self.assertEqual(self.seats(), (18, 18))
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        bookings = [self.create_booking('1') for _ in range(5)]
+        place_holds(bookings[:3], ttl=timedelta(minutes=-1))
+        place_holds(bookings[3:])
+        self.assertEqual(self.seats(), (15, 15))
+        with CaptureQueriesContext(connection) as queries:
+            released = release_expired_holds(batch_size=2)
+        statements = [q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        # Per batch: 1 SELECT, 1 DELETE, 2 UPDATEs for one ticket type and 1 SELECT of the routes to expire
+        self.assertEqual(len(statements), 5 * 2)
+        self.assertEqual(released, 3)
+        self.assertEqual(self.seats(), (18, 18))
+        self.assertEqual(SeatHold.objects.count(), 2)
+
+    def test_converting_hold_does_not_take_seats_twice(self):
+        booking = self.create_booking()
+        place_holds([booking])
+        convert_holds([booking])
+        self.assertFalse(SeatHold.objects.filter(booking=booking).exists())
+        self.assertEqual(self.seats(), (18, 18))
+
+    def test_converting_swept_hold_reserves_seats_again(self):
+        booking = self.create_booking()
+        place_holds([booking], ttl=timedelta(minutes=-1))
+        release_expired_holds()
+        self.assertEqual(self.seats(), (20, 20))
+        convert_holds([booking])
+        self.assertEqual(self.seats(), (18, 18))
+
+    def test_approving_cancellation_of_held_booking_releases_once(self):
+        booking = self.create_booking()
+        place_holds([booking])
+        success, message = booking.approve_cancellation()
+        self.assertTrue(success)
+        self.assertEqual(self.seats(), (20, 20))
+        self.assertEqual(release_expired_holds(now=timezone.now() + timedelta(days=1)), 0)
+        self.assertEqual(self.seats(), (20, 20))
+
+    def test_approving_cancellation_after_hold_expired_releases_nothing(self):
+        booking = self.create_booking()
+        place_holds([booking], ttl=timedelta(minutes=-1))
+        release_expired_holds()
+        self.assertEqual(self.seats(), (20, 20))
+        success, message = booking.approve_cancellation()
+        self.assertTrue(success)
+        self.assertEqual(self.seats(), (20, 20))
+
+    def test_approving_cancellation_of_paid_booking_releases_sold_seats(self):
+        booking = self.create_booking()
+        place_holds([booking])
+        convert_holds([booking])
+        card = Card.objects.create(user=self.user, card_number='4111111111111111', cardholder_name='Tester',
+                                   expiry_date=timezone.now().date(), card_type='Visa')
+        Payment.objects.create(booking=booking, card=card, amount=2400000, payment_method='Credit Card',
+                               transaction_id='ABC123-1')
+        success, message = booking.approve_cancellation()
+        self.assertTrue(success)
+        self.assertEqual(self.seats(), (20, 20))
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from booking.holds import place_holds
+from booking.idempotency import REPLAY_HEADER, purge_expired_keys
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType,
+    Airport, Booking, Payment, IdempotencyKey
+)
+from django.utils.dateparse import parse_datetime
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.booking1 = Booking.objects.create(account=self.user, flight_ticket_type=self.flighttickettype1, seat_number='2')
+        place_holds([self.booking1])
+        self.process_data = {
+            'ticket1': self.booking1.booking_id,
+            'cardNumber': '9876678998766789987',
+            'cardHolderName': 'New Tester',
+            'expMonth': '01',
+            'expYear': '2060',
+            'cardType': 'Visa',
+            'transactionId': 'F00D42',
+            'idempotencyKey': 'key-1',
+        }
+        self.payment_data = {
+            'flight1': self.flight1.flight_id,
+            'flight1Class': 'Economy',
+            'countryCode': '84',
+            'mobile': '123456888',
+            'email': 'tester@gmail.com',
+            'numPassengers': '1',
+            'passenger0Fname': 'New',
+            'passenger0Lname': 'Tester',
+            'passenger0Gender': 'Male',
+            'passenger0DateOfBirth': '2003-10-16',
+            'passenger0Nationality': 'Viet Nam',
+            'idempotencyKey': 'key-2',
+        }
+        self.client.login(username="tester", password="12345678")
+
+    def seats(self):
+        self.flighttickettype1.refresh_from_db()
+        return self.flighttickettype1.available_seats
+
+    def test_process_replay_returns_first_response(self):
+        first = self.client.post(reverse('process'), self.process_data)
+        self.assertTemplateUsed(first, 'payment_process.html')
+        seats = self.seats()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post(reverse('process'), self.process_data)
+        # Besides the session, only the INSERT that takes the key and the SELECT of the stored result
+        statements = [q['sql'].split()[0] for q in queries.captured_queries if 'booking_idempotencykey' in q['sql']]
+        self.assertEqual(statements, ['INSERT', 'SELECT'])
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual(second[REPLAY_HEADER], 'true')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.seats(), seats)
+        self.assertEqual(Payment.objects.filter(booking=self.booking1).count(), 1)
+
+    def test_payment_replay_does_not_book_twice(self):
+        first = self.client.post(reverse('payment'), self.payment_data)
+        self.assertTemplateUsed(first, 'payment.html')
+        self.assertContains(first, 'name="idempotencyKey"')
+        second = self.client.post(reverse('payment'), self.payment_data)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second[REPLAY_HEADER], 'true')
+        self.assertEqual(Booking.objects.filter(account=self.user).count(), 2)
+        self.assertEqual(self.seats(), 17)
+
+    def test_same_key_with_other_data_is_refused(self):
+        self.client.post(reverse('process'), self.process_data)
+        self.process_data['cardHolderName'] = 'Other Tester'
+        response = self.client.post(reverse('process'), self.process_data)
+        self.assertEqual(response.status_code, 422)
+
+    def test_submission_in_progress_is_refused(self):
+        self.client.post(reverse('process'), self.process_data)
+        IdempotencyKey.objects.filter(key='key-1').update(status_code=None)
+        response = self.client.post(reverse('process'), self.process_data)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_expired_key_runs_the_view_again(self):
+        self.client.post(reverse('process'), self.process_data)
+        IdempotencyKey.objects.filter(key='key-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.post(reverse('process'), self.process_data)
+        self.assertTemplateUsed(response, 'payment_process.html')
+        self.assertFalse(response.has_header(REPLAY_HEADER))
+        self.assertEqual(IdempotencyKey.objects.filter(key='key-1').count(), 1)
+
+    def test_failed_submission_releases_the_key(self):
+        self.payment_data['mobile'] = ''
+        response = self.client.post(reverse('payment'), self.payment_data)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_unexpected_error_is_not_replayed(self):
+        with mock.patch('booking.views.settle', side_effect=RuntimeError('database went away')), \
+                self.assertLogs('booking.views', 'ERROR'):
+            response = self.client.post(reverse('process'), self.process_data)
+        self.assertEqual(response.status_code, 500)
+        self.assertNotContains(response, 'database went away', status_code=500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.client.post(reverse('process'), self.process_data)
+        self.assertTemplateUsed(response, 'payment_process.html')
+        self.assertFalse(response.has_header(REPLAY_HEADER))
+
+    def test_invalid_key_is_rejected(self):
+        self.process_data['idempotencyKey'] = 'not a key!'
+        response = self.client.post(reverse('process'), self.process_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_purge_expired_keys(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(account=self.user, key='old', fingerprint='x', expires_at=now - timedelta(hours=1))
+        IdempotencyKey.objects.create(account=self.user, key='new', fingerprint='x', expires_at=now + timedelta(hours=1))
+        self.assertEqual(purge_expired_keys(now=now), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
@@ -0,0 +1,101 @@
+import unittest
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.db import IntegrityError
+from booking.models import Account, Flight, FlightTicketType, TicketType, Airport, Booking
+from django.utils.dateparse import parse_datetime
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+
+    def plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return "\n".join(row[-1] for row in cursor.fetchall())
+
+    def test_homepage_search_uses_route_date_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'), {
+                'tripType': 'oneway',
+                'from': 'HAN',
+                'to': 'DAD',
+                'departureDate': '2069-09-01',
+                'numPassengers': '1',
+                'chairType': 'Economy'
+            })
+        self.assertContains(response, 'HAN --- DAD')
+        searches = [q['sql'] for q in queries.captured_queries if 'FROM "booking_flightsearchindex"' in q['sql']]
+        self.assertEqual(len(searches), 1)
+        plan = self.plan(searches[0])
+        self.assertIn('USING INDEX search_route_date_idx', plan)
+        # The price order comes straight from the index, without a sort step
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_flight_route_time_range_uses_index(self):
+        queryset = Flight.objects.filter(
+            departure_airport='HAN',
+            arrival_airport='DAD',
+            departure_time__gte=parse_datetime('2069-09-01T00:00:00+0000'),
+            departure_time__lt=parse_datetime('2069-09-02T00:00:00+0000')
+        )
+        self.assertIn('USING INDEX flight_route_time_idx', queryset.explain())
+
+    def test_booking_listings_use_indexes(self):
+        pending = Booking.objects.filter(status='PendingCancellation').order_by('-booking_date')
+        self.assertIn('USING INDEX booking_status_date_idx', pending.explain())
+        own = Booking.objects.filter(account=self.user).order_by('-booking_date')
+        self.assertIn('USING INDEX booking_account_date_idx', own.explain())
+
+
+class FlightTicketTypeUniquenessTest(TestCase):
+    def test_one_row_per_flight_and_ticket_type(self):
+        tickettype = TicketType.objects.create(name="Economy")
+        airport1 = Airport.objects.create(airport_code='HAN', name='Noi Bai', city='Ha Noi', country='Viet Nam')
+        airport2 = Airport.objects.create(airport_code='DAD', name='Da Nang', city='Da Nang', country='Viet Nam')
+        flight = Flight.objects.create(
+            flight_number='A333',
+            departure_airport=airport1,
+            arrival_airport=airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        FlightTicketType.objects.create(flight=flight, ticket_type=tickettype, price=1, available_seats=1)
+        with self.assertRaises(IntegrityError):
+            FlightTicketType.objects.create(flight=flight, ticket_type=tickettype, price=2, available_seats=2)
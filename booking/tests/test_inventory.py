@@ -0,0 +1,114 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking import inventory
+from booking.inventory import reserve_seats, release_seats, InsufficientSeats
+from booking.models import (
+    Account, Flight, FlightTicketType, FlightSearchIndex,
+    TicketType, Airport, Booking, Passenger
+)
+from django.utils.dateparse import parse_datetime
+
+class InventoryTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flight2 = Flight.objects.create(
+            flight_number='A334',
+            airline='TestAir2',
+            departure_airport=self.airport2,
+            arrival_airport=self.airport1,
+            departure_time=parse_datetime('2069-09-02T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-02T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.flighttickettype2 = FlightTicketType.objects.create(
+            flight=self.flight2,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=1,
+        )
+        inventory.reset_contention_stats()
+
+    def seats(self, flight_ticket_type):
+        flight_ticket_type.refresh_from_db()
+        entry = FlightSearchIndex.objects.get(flight_ticket_type=flight_ticket_type)
+        return flight_ticket_type.available_seats, entry.available_seats
+
+    def test_reserve_and_release_update_seats_and_search_index(self):
+        reserve_seats([(self.flighttickettype1.pk, 3)])
+        self.assertEqual(self.seats(self.flighttickettype1), (17, 17))
+        release_seats([(self.flighttickettype1.pk, 3)])
+        self.assertEqual(self.seats(self.flighttickettype1), (20, 20))
+
+    # The return leg has only 1 seat left, so both legs must be given back
+    def test_multi_leg_reservation_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientSeats):
+            reserve_seats([
+                (self.flighttickettype1.pk, 2),
+                (self.flighttickettype2.pk, 2),
+            ])
+        self.assertEqual(self.seats(self.flighttickettype1), (20, 20))
+        self.assertEqual(self.seats(self.flighttickettype2), (1, 1))
+        self.assertEqual(inventory.contention_stats()['rejected_legs'], 1)
+
+    def test_book_seat_never_oversells(self):
+        self.assertTrue(self.flighttickettype2.book_seat(1))
+        self.assertEqual(self.flighttickettype2.available_seats, 0)
+        self.assertFalse(self.flighttickettype2.book_seat(1))
+        self.assertEqual(self.seats(self.flighttickettype2), (0, 0))
+
+    def test_process_rejects_payment_when_seats_run_out(self):
+        passenger = Passenger.objects.create(first_name='New', last_name='Tester')
+        booking1 = Booking.objects.create(account=self.user, flight_ticket_type=self.flighttickettype1, seat_number='2')
+        booking2 = Booking.objects.create(account=self.user, flight_ticket_type=self.flighttickettype2, seat_number='2')
+        booking1.passengers.add(passenger)
+        booking2.passengers.add(passenger)
+        login = self.client.login(username='tester', password='12345678')
+        self.assertTrue(login)
+        response = self.client.post(reverse('process'), {
+            'ticket1': booking1.booking_id,
+            'ticket2': booking2.booking_id,
+            'cardNumber': '9876678998766789987',
+            'cardHolderName': 'New Tester',
+            'expMonth': '01',
+            'expYear': '2060',
+            'cardType': 'Visa',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'payment.html')
+        messages = list(response.wsgi_request._messages)
+        self.assertEqual(messages[0].message, "There are not enough seats left on this flight.")
+        booking1.refresh_from_db()
+        self.assertEqual(booking1.status, 'PendingCancellation')
+        self.assertEqual(self.seats(self.flighttickettype1), (20, 20))
@@ -0,0 +1,224 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from booking.holds import place_holds
+from booking.jobs import (
+    UnknownTask, claim, enqueue, heartbeat, requeue_stale, run_job, run_pending, task, Worker
+)
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport, Booking, Job
+)
+from django.utils.dateparse import parse_datetime
+
+calls = []
+
+
+@task(name='test.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='test.fail')
+def fail(name):
+    TicketType.objects.create(name=name)
+    raise RuntimeError("boom")
+
+
+@task(name='test.create')
+def create(name):
+    TicketType.objects.create(name=name)
+
+
+@task(name='test.crash')
+def crash():
+    # A child process dying midway (out of memory, a crash in the PDF library)
+    os._exit(1)
+
+
+def shares_database_with_child_processes():
+    return connection.vendor != 'sqlite' or not connection.creation.is_in_memory_db(connection.settings_dict['NAME'])
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(UnknownTask):
+            enqueue('test.missing')
+
+    def test_run_pending_runs_due_jobs(self):
+        enqueue('test.record', {'value': 1})
+        enqueue('test.record', {'value': 2})
+        enqueue('test.record', {'value': 3}, delay=3600)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Job.objects.filter(status='Done').count(), 2)
+        self.assertEqual(Job.objects.get(payload={'value': 3}).status, 'Pending')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue('test.fail', {'name': 'Ghost'}, max_attempts=2)
+        with self.assertLogs('booking.jobs', level='WARNING'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Pending', 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        # A failing task has its database writes rolled back
+        self.assertFalse(TicketType.objects.filter(name='Ghost').exists())
+        self.assertEqual(run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('booking.jobs', level='ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_a_job_is_claimed_once(self):
+        enqueue('test.record', {'value': 1})
+        first = claim('worker-1', 5)
+        second = claim('worker-2', 5)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual(first[0].locked_by, 'worker-1')
+
+    def test_stale_jobs_are_requeued(self):
+        enqueue('test.record', {'value': 1})
+        claim('worker-1', 1)
+        self.assertEqual(requeue_stale(), 0)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get().attempts, 1)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [1])
+
+    def test_job_that_keeps_losing_its_worker_fails(self):
+        job = enqueue('test.record', {'value': 1}, max_attempts=2)
+        claim('worker-1', 1)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        claim('worker-1', 1)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('booking.jobs', level='ERROR'):
+            self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Failed', 2))
+        self.assertEqual(run_pending(), 0)
+
+    def test_heartbeat_keeps_a_long_job_claimed(self):
+        enqueue('test.record', {'value': 1})
+        job = claim('worker-1', 1)[0]
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(heartbeat([job.job_id], 'worker-1'), 1)
+        self.assertEqual(requeue_stale(), 0)
+
+    def test_outcome_is_not_saved_once_the_job_was_taken_over(self):
+        enqueue('test.record', {'value': 1})
+        job = claim('worker-1', 1)[0]
+        Job.objects.update(locked_by='worker-2')
+        with self.assertLogs('booking.jobs', level='WARNING'):
+            run_job(job)
+        self.assertEqual(Job.objects.get().status, 'Running')
+
+
+class WorkerTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_thread_pool_runs_every_job(self):
+        for value in range(5):
+            enqueue('test.record', {'value': value})
+        self.assertEqual(Worker(concurrency=2, poll_seconds=0.01).run(once=True), 5)
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertEqual(Job.objects.filter(status='Done').count(), 5)
+
+    def test_process_pool_survives_a_crashed_child(self):
+        # Checked here rather than in a decorator: only once the test database
+        # is set up does the connection name the database the children will open
+        if not shares_database_with_child_processes():
+            self.skipTest("child processes cannot see an in-memory database")
+        crashing = enqueue('test.crash', max_attempts=1)
+        for name in ('First', 'Second'):
+            enqueue('test.create', {'name': name})
+        with self.assertLogs('booking.jobs', level='ERROR'):
+            Worker(concurrency=1, processes=True, poll_seconds=0.01).run(once=True)
+        crashing.refresh_from_db()
+        self.assertEqual((crashing.status, crashing.attempts), ('Failed', 1))
+        self.assertEqual(Job.objects.filter(status='Done').count(), 2)
+        self.assertEqual(sorted(TicketType.objects.values_list('name', flat=True)), ['First', 'Second'])
+
+    def test_runworker_command(self):
+        enqueue('test.record', {'value': 1})
+        out = StringIO()
+        call_command('runworker', '--once', '--poll', '0.01', stdout=out)
+        self.assertIn('Ran 1 jobs.', out.getvalue())
+        self.assertEqual(calls, [1])
+
+
+class PostPaymentJobTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(TICKET_CACHE_DIR=self.cache_dir, TICKET_RENDER_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A330',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.booking1 = Booking.objects.create(account=self.user, flight_ticket_type=self.flighttickettype1, seat_number='1')
+        place_holds([self.booking1])
+
+    def test_process_queues_ticket_rendering(self):
+        self.client.login(username='tester', password='12345678')
+        response = self.client.post(reverse('process'), {
+            'ticket1': self.booking1.booking_id,
+            'cardNumber': '9876678998766789987',
+            'cardHolderName': 'New Tester',
+            'expMonth': '01',
+            'expYear': '2060',
+            'cardType': 'Visa',
+        })
+        self.assertTemplateUsed(response, 'payment_process.html')
+        job = Job.objects.get(name='render_tickets')
+        self.assertEqual((job.name, job.payload), ('render_tickets', {'booking_ids': [self.booking1.booking_id]}))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, str(self.booking1.booking_id))))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, str(self.booking1.booking_id)))), 1)
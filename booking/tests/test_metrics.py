@@ -0,0 +1,69 @@
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from booking.models import Airport, Account
+from booking.metrics import registry
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        registry.reset()
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+
+    def histogram(self, name, view):
+        return registry.snapshot().get((name, view))
+
+    def test_records_queries_and_template_time_per_view(self):
+        response = self.client.get(reverse('flight'))
+        self.assertEqual(response.status_code, 200)
+        queries = self.histogram('booking_view_queries', 'flight')
+        self.assertIsNotNone(queries)
+        self.assertEqual(list(queries.cumulative())[-1][1], 1)
+        self.assertGreaterEqual(queries.total, 1)
+        template = self.histogram('booking_view_template_seconds', 'flight')
+        self.assertGreater(template.total, 0)
+        latency = self.histogram('booking_view_latency_seconds', 'flight')
+        self.assertGreaterEqual(latency.total, template.total)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sampling_off_records_nothing(self):
+        self.client.get(reverse('flight'))
+        self.assertEqual(registry.snapshot(), {})
+
+    def test_prometheus_endpoint(self):
+        Account.objects.create_user(
+            email="staff@example.com",
+            username="staff",
+            password="12345678",
+            phone_number="0123456789",
+            is_staff=True
+        )
+        self.client.login(username='staff', password='12345678')
+        self.client.get(reverse('flight'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE booking_view_latency_seconds histogram', body)
+        self.assertIn('booking_view_queries_bucket{view="flight",le="+Inf"} 1', body)
+        self.assertIn('booking_view_queries_count{view="flight"} 1', body)
+        self.assertIn('# TYPE booking_inventory_reserved_legs_total counter', body)
+        self.assertIn('booking_metrics_sample_rate 1.0', body)
+
+    def test_prometheus_endpoint_is_private_without_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_endpoint_checks_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,53 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking import reference
+from booking.models import Airport, TicketType
+
+class ReferenceDataTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+
+    def test_warm_homepage_costs_no_queries(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Noi Bai International Airport (HAN)')
+
+    def test_saving_airport_reloads_reference_data(self):
+        self.assertEqual(len(reference.get_airports()), 2)
+        Airport.objects.create(
+            airport_code='SGN',
+            name='Tan Son Nhat International Airport',
+            city='Ho Chi Minh',
+            country='Viet Nam'
+        )
+        self.assertEqual([a['airport_code'] for a in reference.get_airports()], ['DAD', 'HAN', 'SGN'])
+
+    def test_deleting_ticket_type_reloads_reference_data(self):
+        self.assertEqual(len(reference.get_ticket_types()), 1)
+        self.tickettype1.delete()
+        self.assertEqual(reference.get_ticket_types(), [])
+
+    def test_cities_are_distinct(self):
+        Airport.objects.create(
+            airport_code='GLA',
+            name='Gia Lam Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.assertEqual(async_to_sync(reference.aload)()['cities'], ['Da Nang', 'Ha Noi'])
+        self.assertEqual(len(Airport.get_airports()), 3)
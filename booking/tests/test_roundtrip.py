@@ -0,0 +1,111 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport
+)
+from booking.roundtrip import ranked_pairs, rank_key
+from django.utils.dateparse import parse_datetime
+
+def leg(price, departure, minutes):
+    departure = parse_datetime(departure)
+    return SimpleNamespace(price=Decimal(price), departure_time=departure,
+                           arrival_time=departure + timedelta(minutes=minutes))
+
+class RankedPairsTest(TestCase):
+    def test_pairs_come_out_cheapest_then_shortest(self):
+        outbound = sorted([
+            leg(100, '2069-09-01T08:00:00+0000', 120),
+            leg(100, '2069-09-01T09:00:00+0000', 60),
+            leg(300, '2069-09-01T10:00:00+0000', 60),
+        ], key=rank_key)
+        inbound = sorted([
+            leg(150, '2069-09-05T08:00:00+0000', 60),
+            leg(120, '2069-09-05T09:00:00+0000', 90),
+        ], key=rank_key)
+        pairs = list(ranked_pairs(outbound, inbound))
+        self.assertEqual(len(pairs), 6)
+        keys = [(pair.total_price, pair.duration) for pair in pairs]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(keys[0], (Decimal(220), timedelta(minutes=150)))
+
+    def test_pairs_too_close_are_skipped(self):
+        outbound = [leg(100, '2069-09-01T08:00:00+0000', 60)]
+        inbound = sorted([
+            leg(50, '2069-09-01T09:30:00+0000', 60),
+            leg(80, '2069-09-01T10:00:00+0000', 60),
+        ], key=rank_key)
+        pairs = list(ranked_pairs(outbound, inbound))
+        # The 9:30 return leaves only 30 minutes after landing, so it is left out
+        self.assertEqual([pair.total_price for pair in pairs], [Decimal(180)])
+
+    def test_inputs_are_read_lazily(self):
+        read = []
+
+        def flights(prefix, count):
+            for n in range(count):
+                read.append(prefix)
+                yield leg(100 + n, f'2069-09-0{1 if prefix == "out" else 5}T08:00:00+0000', 60)
+        pairs = ranked_pairs(flights('out', 1000), flights('in', 1000))
+        self.assertEqual(len([next(pairs) for _ in range(3)]), 3)
+        self.assertLess(len(read), 10)
+
+class RoundTripSearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flights = {}
+        for number, origin, destination, departure, price in [
+            ('A1', self.airport1, self.airport2, '2069-09-01T08:00:00+0000', 1000000),
+            ('A2', self.airport1, self.airport2, '2069-09-01T12:00:00+0000', 800000),
+            ('A3', self.airport1, self.airport2, '2069-09-02T12:00:00+0000', 500000),
+            ('B1', self.airport2, self.airport1, '2069-09-05T08:00:00+0000', 900000),
+            ('B2', self.airport2, self.airport1, '2069-09-06T08:00:00+0000', 700000),
+        ]:
+            flight = Flight.objects.create(
+                flight_number=number,
+                airline='TestAir',
+                departure_airport=origin,
+                arrival_airport=destination,
+                departure_time=parse_datetime(departure),
+                arrival_time=parse_datetime(departure) + timedelta(hours=1)
+            )
+            FlightTicketType.objects.create(flight=flight, ticket_type=self.tickettype1, price=price, available_seats=20)
+            self.flights[number] = flight
+
+    def test_index_lists_ranked_pairs(self):
+        response = self.client.get(reverse('index'), {
+            'tripType': 'round',
+            'from': 'HAN',
+            'to': 'DAD',
+            'departureDate': '2069-09-01',
+            'returnDate': '2069-09-05',
+            'numPassengers': 1,
+            'chairType': 'Economy',
+        })
+        pairs = response.context['round_trip_pairs']
+        self.assertEqual([(pair.outbound.flight_id, pair.inbound.flight_id) for pair in pairs],
+                         [(self.flights['A2'].pk, self.flights['B1'].pk), (self.flights['A1'].pk, self.flights['B1'].pk)])
+        self.assertEqual(pairs[0].total_price, 1700000)
+        self.assertContains(response, '1,700,000 (VND)')
+        self.assertContains(response, f"r_flight_id={self.flights['B1'].pk}")
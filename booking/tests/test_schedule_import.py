@@ -0,0 +1,137 @@
+import io
+import os
+import tempfile
+from datetime import date
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport, FlightSearchIndex
+)
+from booking.schedule_import import import_schedule
+from booking.search_cache import route_version
+from django.utils.dateparse import parse_datetime
+
+HEADER = "airline,flight_number,departure_airport,arrival_airport,departure_time,arrival_time,ticket_type,price,available_seats\n"
+
+class ScheduleImportTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = Account.objects.create_superuser(
+            email="admin@example.com",
+            username="adminuser",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.tickettype2 = TicketType.objects.create(name="Business")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam',
+            timezone='Asia/Ho_Chi_Minh'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam',
+            timezone='Asia/Ho_Chi_Minh'
+        )
+
+    def run_import(self, text, batch_size=2):
+        return import_schedule(io.StringIO(text), batch_size=batch_size)
+
+    def test_imports_flights_fares_and_search_rows(self):
+        report = self.run_import(HEADER
+            + "TestAir,VN101,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n"
+            + "TestAir,VN101,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Business,3000000,20\n"
+            + "TestAir,VN102,DAD,HAN,2069-09-01T18:00:00+0000,2069-09-01T19:20:00+0000,Economy,1100000,150\n")
+        self.assertEqual((report.rows, report.flights_created, report.fares_created), (3, 2, 3))
+        flight = Flight.objects.get(flight_number='VN101')
+        # Times without a zone are local time at the airport
+        self.assertEqual(flight.departure_time, parse_datetime('2069-09-01T01:00:00+0000'))
+        self.assertEqual(FlightTicketType.objects.filter(flight=flight).count(), 2)
+        self.assertEqual(FlightSearchIndex.objects.count(), 3)
+        entry = FlightSearchIndex.objects.get(flight__flight_number='VN102')
+        self.assertEqual(entry.departure_date, date(2069, 9, 2))
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        self.run_import(HEADER + "TestAir,VN101,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n")
+        fare = FlightTicketType.objects.get()
+        fare.available_seats = 140
+        fare.save()
+        version = route_version('HAN', 'DAD', '2069-09-01')
+        report = self.run_import(HEADER + "TestAir,VN101,HAN,DAD,2069-09-01T08:30:00,2069-09-01T09:50:00,Economy,1300000,150\n")
+        self.assertEqual((report.flights_created, report.flights_updated, report.fares_updated), (0, 1, 1))
+        fare = FlightTicketType.objects.get()
+        self.assertEqual(fare.price, 1300000)
+        self.assertEqual(fare.available_seats, 140)
+        self.assertEqual(Flight.objects.get().departure_time, parse_datetime('2069-09-01T01:30:00+0000'))
+        self.assertEqual(FlightSearchIndex.objects.get().price, 1300000)
+        self.assertNotEqual(route_version('HAN', 'DAD', '2069-09-01'), version)
+
+    def test_period_rows_expand_into_dated_flights(self):
+        report = self.run_import(
+            "flight_number,departure_airport,arrival_airport,departure_time,arrival_time,ticket_type,price,available_seats,period_start,period_end,days,arrival_day_offset\n"
+            "VN201,HAN,DAD,23:30,00:50,Economy,900000,150,2069-09-01,2069-09-14,1 3 5,1\n", batch_size=4)
+        # 2069-09-01 is a Sunday, two weeks have 6 flights on Monday, Wednesday and Friday
+        self.assertEqual(report.flights_created, 6)
+        first = Flight.objects.order_by('departure_time').first()
+        self.assertEqual(first.departure_time, parse_datetime('2069-09-02T16:30:00+0000'))
+        self.assertEqual(first.arrival_time, parse_datetime('2069-09-02T17:50:00+0000'))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        report = self.run_import(HEADER
+            + "TestAir,VN101,HAN,XXX,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n"
+            + "TestAir,VN102,HAN,DAD,2069-09-01T08:00:00,2069-09-01T07:20:00,Economy,1200000,150\n"
+            + "TestAir,VN103,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,First,1200000,150\n"
+            + "TestAir,VN104,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,abc,150\n"
+            + "TestAir,VN105,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n")
+        self.assertEqual(report.error_count, 4)
+        self.assertTrue(report.errors[0].startswith("Line 2:"))
+        self.assertEqual(list(Flight.objects.values_list('flight_number', flat=True)), ['VN105'])
+
+    def statements(self, prefix, count):
+        lines = "".join(
+            f"TestAir,{prefix}{n},HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n"
+            for n in range(count))
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(HEADER + lines, batch_size=100)
+        return [q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+
+    def test_batch_query_count_does_not_depend_on_rows(self):
+        self.assertEqual(len(self.statements('VN', 5)), len(self.statements('QH', 50)))
+
+    def test_command_reports_rows(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as output:
+            output.write(HEADER + "TestAir,VN101,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n")
+        out = io.StringIO()
+        call_command('import_schedule', path, stdout=out)
+        self.assertIn("1 rows", out.getvalue())
+        self.assertIn("1 flights created", out.getvalue())
+
+    def test_command_rejects_file_without_columns(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as output:
+            output.write("flight_number,price\nVN101,1\n")
+        with self.assertRaises(CommandError):
+            call_command('import_schedule', path)
+
+    def test_admin_upload(self):
+        self.client.login(username='adminuser', password='12345678')
+        response = self.client.get(reverse('admin:booking_flight_import'))
+        self.assertEqual(response.status_code, 200)
+        upload = SimpleUploadedFile('schedule.csv', (HEADER
+            + "TestAir,VN101,HAN,DAD,2069-09-01T08:00:00,2069-09-01T09:20:00,Economy,1200000,150\n").encode())
+        response = self.client.post(reverse('admin:booking_flight_import'), {'file': upload, 'batch_size': 100})
+        self.assertRedirects(response, reverse('admin:booking_flight_changelist'))
+        self.assertTrue(Flight.objects.filter(flight_number='VN101').exists())
@@ -0,0 +1,112 @@
+import json
+from datetime import timedelta
+from django.core.cache import caches
+from django.test import TestCase, Client
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType, Airport, FlightSearchIndex
+)
+from django.utils.dateparse import parse_datetime
+
+class SearchApiTest(TestCase):
+    def setUp(self):
+        caches['search'].clear()
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.fares = {}
+        for number, origin, destination, departure, price in [
+            ('A1', self.airport1, self.airport2, '2069-09-01T08:00:00+0000', 1000000),
+            ('A2', self.airport1, self.airport2, '2069-09-01T12:00:00+0000', 800000),
+            ('B1', self.airport2, self.airport1, '2069-09-05T08:00:00+0000', 900000),
+        ]:
+            flight = Flight.objects.create(
+                flight_number=number,
+                airline='TestAir',
+                departure_airport=origin,
+                arrival_airport=destination,
+                departure_time=parse_datetime(departure),
+                arrival_time=parse_datetime(departure) + timedelta(hours=1)
+            )
+            self.fares[number] = FlightTicketType.objects.create(
+                flight=flight, ticket_type=self.tickettype1, price=price, available_seats=20)
+        self.params = {
+            'tripType': 'round',
+            'from': 'HAN',
+            'to': 'DAD',
+            'departureDate': '2069-09-01',
+            'returnDate': '2069-09-05',
+            'numPassengers': 1,
+            'chairType': 'Economy',
+        }
+
+    def test_json_results(self):
+        response = self.client.get(reverse('search_api'), self.params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['version'], 1)
+        self.assertEqual([row['flight_number'] for row in data['departure_flights']], ['A2', 'A1'])
+        self.assertEqual([row['flight_number'] for row in data['return_flights']], ['B1'])
+        # Prices come back as numbers, not formatted
+        self.assertEqual(data['departure_flights'][0]['price'], '800000.00')
+        self.assertEqual(data['departure_flights'][0]['departure_airport_id'], 'HAN')
+
+    def test_ndjson_stream(self):
+        response = self.client.get(reverse('search_api'), self.params, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['direction'], row['flight_number']) for row in lines],
+                         [('departure', 'A2'), ('departure', 'A1'), ('return', 'B1')])
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse('search_api'), self.params)
+        etag = response['ETag']
+        response = self.client.get(reverse('search_api'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse('search_api'), {**self.params, 'format': 'ndjson'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # A price change changes the ETag
+        fare = self.fares['A1']
+        fare.price = 500000
+        fare.save()
+        response = self.client.get(reverse('search_api'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['departure_flights'][0]['flight_number'], 'A1')
+
+    def test_etag_follows_rows_without_cache_invalidation(self):
+        etag = self.client.get(reverse('search_api'), self.params)['ETag']
+        # A change from another process: this process's search cache does not know about it
+        FlightSearchIndex.objects.filter(flight_ticket_type=self.fares['A1']).update(available_seats=3)
+        response = self.client.get(reverse('search_api'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_same_validation_as_homepage(self):
+        response = self.client.get(reverse('search_api'), {**self.params, 'to': 'HAN'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "Departure and destination airports cannot be the same.")
+
+    def test_homepage_formats_prices_in_template(self):
+        response = self.client.get(reverse('index'), self.params)
+        self.assertContains(response, '800,000 (VND)')
+        self.assertEqual(response.context['departure_flights'][0].ticket_type_price, 800000)
@@ -0,0 +1,118 @@
+import tempfile
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from booking.search_cache import acached_search, route_version, _search_keys
+from booking.models import Flight, FlightTicketType, TicketType, Airport
+from django.utils.dateparse import parse_datetime
+
+class SearchCacheTest(TestCase):
+    def setUp(self):
+        caches['search'].clear()
+        self.client = Client()
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.search = {
+            'tripType': 'oneway',
+            'from': 'HAN',
+            'to': 'DAD',
+            'departureDate': '2069-09-01',
+            'numPassengers': '1',
+            'chairType': 'Economy'
+        }
+        self.calls = 0
+
+    async def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def search_cached(self):
+        return async_to_sync(acached_search)('HAN', 'DAD', '2069-09-01', 'Economy', 1, self.compute)
+
+    def test_identical_search_is_served_from_cache(self):
+        self.client.get(reverse('index'), self.search)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'), self.search)
+        self.assertContains(response, '20 (Available Seats)')
+
+    def test_seat_change_invalidates_route(self):
+        self.client.get(reverse('index'), self.search)
+        version = route_version('HAN', 'DAD', '2069-09-01')
+        self.flighttickettype1.book_seat(5)
+        self.assertGreater(route_version('HAN', 'DAD', '2069-09-01'), version)
+        response = self.client.get(reverse('index'), self.search)
+        self.assertContains(response, '15 (Available Seats)')
+
+    def test_lowercase_codes_share_the_invalidated_entry(self):
+        self.client.get(reverse('index'), self.search)
+        self.flighttickettype1.book_seat(5)
+        response = self.client.get(reverse('index'), dict(self.search, **{'from': 'han', 'to': ' dad'}))
+        self.assertContains(response, '15 (Available Seats)')
+
+    def test_unknown_airport_is_rejected(self):
+        response = self.client.get(reverse('index'), dict(self.search, **{'from': 'XXX'}))
+        self.assertEqual(response.context['error_message'], 'Please select a valid airport.')
+        self.assertNotIn('departure_flights', response.context)
+
+    def test_invalidation_from_another_process_expires_results(self):
+        self.client.get(reverse('index'), self.search)
+        # A separate cache instance stands in for another worker process
+        other_process = caches.create_connection('default')
+        with mock.patch('booking.search_cache._versions', return_value=other_process):
+            self.flighttickettype1.book_seat(5)
+        response = self.client.get(reverse('index'), self.search)
+        self.assertContains(response, '15 (Available Seats)')
+
+    def test_other_routes_stay_cached(self):
+        version = route_version('DAD', 'HAN', '2069-09-01')
+        self.flighttickettype1.book_seat(1)
+        self.assertEqual(route_version('DAD', 'HAN', '2069-09-01'), version)
+
+    def test_stale_entry_is_served_while_another_request_refreshes(self):
+        self.assertEqual(self.search_cached(), 1)
+        self.flighttickettype1.book_seat(1)
+        # Another request is already recomputing the result
+        key, lock_key = _search_keys('HAN', 'DAD', '2069-09-01', 'Economy', 1)
+        self.assertTrue(caches['search'].add(lock_key, 1))
+        self.assertEqual(self.search_cached(), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'search': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory,
+                },
+            }):
+                self.assertEqual(self.search_cached(), 1)
+                self.assertEqual(self.search_cached(), 1)
+        self.assertEqual(self.calls, 1)
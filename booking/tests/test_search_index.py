@@ -0,0 +1,89 @@
+from io import StringIO
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.management import call_command
+from booking.models import Flight, FlightTicketType, FlightSearchIndex, TicketType, Airport
+from django.utils.dateparse import parse_datetime, parse_date
+
+class FlightSearchIndexTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.tickettype2 = TicketType.objects.create(name="Business")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.flighttickettype2 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype2,
+            price=3000000,
+            available_seats=5,
+        )
+
+    def test_creating_flight_ticket_type_adds_search_row(self):
+        entry = FlightSearchIndex.objects.get(flight_ticket_type=self.flighttickettype1)
+        self.assertEqual(entry.flight_id, self.flight1.flight_id)
+        self.assertEqual(entry.departure_airport_id, 'HAN')
+        self.assertEqual(entry.arrival_airport_id, 'DAD')
+        self.assertEqual(entry.departure_date, parse_date('2069-09-01'))
+        self.assertEqual(entry.available_seats, 20)
+
+    def test_updating_flight_ticket_type_refreshes_search_row(self):
+        self.flighttickettype1.price = 900000
+        self.flighttickettype1.available_seats = 3
+        self.flighttickettype1.save()
+        entry = FlightSearchIndex.objects.get(flight_ticket_type=self.flighttickettype1)
+        self.assertEqual(float(entry.price), 900000)
+        self.assertEqual(entry.available_seats, 3)
+
+    def test_rescheduling_flight_moves_search_rows(self):
+        self.flight1.departure_time = parse_datetime('2069-09-03T15:00:00+0000')
+        self.flight1.arrival_time = parse_datetime('2069-09-03T16:00:00+0000')
+        self.flight1.save()
+        dates = set(FlightSearchIndex.objects.filter(flight=self.flight1).values_list('departure_date', flat=True))
+        self.assertEqual(dates, {parse_date('2069-09-03')})
+
+    def test_deleting_flight_ticket_type_removes_search_row(self):
+        self.flighttickettype2.delete()
+        self.assertFalse(FlightSearchIndex.objects.filter(ticket_type=self.tickettype2).exists())
+
+    def test_rebuild_command_recreates_index(self):
+        FlightSearchIndex.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(FlightSearchIndex.objects.count(), 2)
+
+    # Business has only 5 seats left, so it is not shown for 6 passengers
+    def test_search_filters_by_seats_left(self):
+        response = self.client.get(reverse('index'), {
+            'tripType': 'oneway',
+            'from': 'HAN',
+            'to': 'DAD',
+            'departureDate': '2069-09-01',
+            'numPassengers': '6',
+            'chairType': 'Business'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "No flights available with the selected criteria. Please try again.")
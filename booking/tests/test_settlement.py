@@ -0,0 +1,139 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from booking.holds import place_holds
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType,
+    Airport, Booking, Payment, Card, SeatHold
+)
+from booking.settlement import settle, SettlementError
+from django.utils.dateparse import parse_datetime, parse_date
+
+class SettlementTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.user2 = Account.objects.create_user(
+            email="tester2@example.com",
+            username="tester2",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flights = []
+        self.flighttickettypes = []
+        for i in range(3):
+            flight = Flight.objects.create(
+                flight_number=f'A33{i}',
+                airline='TestAir',
+                departure_airport=self.airport1,
+                arrival_airport=self.airport2,
+                departure_time=parse_datetime(f'2069-09-0{i + 1}T15:00:00+0000'),
+                arrival_time=parse_datetime(f'2069-09-0{i + 1}T16:00:00+0000')
+            )
+            self.flights.append(flight)
+            self.flighttickettypes.append(FlightTicketType.objects.create(
+                flight=flight,
+                ticket_type=self.tickettype1,
+                price=1200000,
+                available_seats=20,
+            ))
+        self.bookings = [
+            Booking.objects.create(account=self.user, flight_ticket_type=flighttickettype, seat_number='2')
+            for flighttickettype in self.flighttickettypes
+        ]
+        place_holds(self.bookings)
+
+    def pay(self, bookings, reference='ABC123', user=None):
+        return settle(
+            user or self.user, [booking.booking_id for booking in bookings], '4111111111111111', 'Visa',
+            'New Tester', parse_date('2030-01-01'), '2400000', reference
+        )
+
+    def seats(self):
+        return [ftt.available_seats for ftt in FlightTicketType.objects.order_by('pk')]
+
+    def test_settle_confirms_bookings_and_records_payments(self):
+        bookings, payments = self.pay(self.bookings[:2])
+        self.assertEqual([b.status for b in bookings], ['Confirmed', 'Confirmed'])
+        self.assertEqual([p.transaction_id for p in payments], ['ABC123-1', 'ABC123-2'])
+        self.assertEqual(Payment.objects.filter(booking__in=self.bookings[:2]).count(), 2)
+        self.assertEqual(Card.objects.get(user=self.user).card_number, '4111111111111111')
+        self.assertFalse(SeatHold.objects.filter(booking__in=self.bookings[:2]).exists())
+        # The seats were held at booking time, paying does not take more
+        self.assertEqual(self.seats(), [18, 18, 18])
+
+    def test_queries_grow_by_a_constant_per_leg(self):
+        Card.objects.create(user=self.user, card_number='1', cardholder_name='New Tester',
+                            expiry_date=parse_date('2030-01-01'), card_type='Visa')
+        counts = []
+        for index, bookings in enumerate(([self.bookings[0]], self.bookings[1:3])):
+            with CaptureQueriesContext(connection) as queries:
+                self.pay(bookings, reference=f'REF{index}')
+            counts.append(len([q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]))
+        self.assertEqual(counts[1] - counts[0], 1)
+
+    def test_retry_with_same_reference_is_idempotent(self):
+        first_bookings, first_payments = self.pay(self.bookings[:2])
+        seats = self.seats()
+        with CaptureQueriesContext(connection) as queries:
+            bookings, payments = self.pay(self.bookings[:2])
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual([p.pk for p in payments], [p.pk for p in Payment.objects.filter(
+            booking__in=self.bookings[:2]).order_by('booking_id')])
+        self.assertEqual(self.seats(), seats)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_repeated_booking_is_paid_once(self):
+        bookings, payments = self.pay([self.bookings[0], self.bookings[0]])
+        self.assertEqual([b.pk for b in bookings], [self.bookings[0].pk])
+        self.assertEqual([p.transaction_id for p in payments], ['ABC123-1'])
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(self.seats(), [18, 18, 18])
+
+    def test_new_reference_for_confirmed_booking_is_rejected(self):
+        self.pay(self.bookings[:1])
+        with self.assertRaises(SettlementError):
+            self.pay(self.bookings[:1], reference='OTHER1')
+
+    def test_other_users_booking_is_rejected(self):
+        with self.assertRaises(SettlementError):
+            self.pay(self.bookings[:1], user=self.user2)
+        self.assertEqual(Booking.objects.get(pk=self.bookings[0].pk).status, 'PendingCancellation')
+
+    def test_double_submit_of_process_returns_same_result(self):
+        self.client.login(username='tester', password='12345678')
+        data = {
+            'ticket1': self.bookings[0].booking_id,
+            'cardNumber': '9876678998766789987',
+            'cardHolderName': 'New Tester',
+            'expMonth': '01',
+            'expYear': '2060',
+            'cardType': 'Visa',
+            'transactionId': 'F00D42',
+        }
+        first = self.client.post(reverse('process'), data)
+        self.assertTemplateUsed(first, 'payment_process.html')
+        second = self.client.post(reverse('process'), data)
+        self.assertTemplateUsed(second, 'payment_process.html')
+        self.assertEqual(first.context['ref1'], 'F00D42-1')
+        self.assertEqual(second.context['ref1'], 'F00D42-1')
+        self.assertEqual(Payment.objects.filter(booking=self.bookings[0]).count(), 1)
@@ -0,0 +1,137 @@
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from booking.models import (
+    Account, Flight, FlightTicketType, TicketType,
+    Airport, Booking, Payment, Card, Passenger
+)
+from booking import tickets
+from django.utils.dateparse import parse_datetime, parse_date
+
+class TicketRenderingTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(TICKET_CACHE_DIR=self.cache_dir, TICKET_RENDER_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+        self.user = Account.objects.create_user(
+            email="tester@example.com",
+            username="tester",
+            password="12345678",
+            phone_number="0123456789"
+        )
+        self.tickettype1 = TicketType.objects.create(name="Economy")
+        self.airport1 = Airport.objects.create(
+            airport_code='HAN',
+            name='Noi Bai International Airport',
+            city='Ha Noi',
+            country='Viet Nam'
+        )
+        self.airport2 = Airport.objects.create(
+            airport_code='DAD',
+            name='Da Nang International Airport',
+            city='Da Nang',
+            country='Viet Nam'
+        )
+        self.flight1 = Flight.objects.create(
+            flight_number='A333',
+            airline='TestAir',
+            departure_airport=self.airport1,
+            arrival_airport=self.airport2,
+            departure_time=parse_datetime('2069-09-01T15:00:00+0000'),
+            arrival_time=parse_datetime('2069-09-01T16:00:00+0000')
+        )
+        self.flighttickettype1 = FlightTicketType.objects.create(
+            flight=self.flight1,
+            ticket_type=self.tickettype1,
+            price=1200000,
+            available_seats=20,
+        )
+        self.passenger1 = Passenger.objects.create(
+            first_name='Van',
+            last_name='Nguyen',
+            gender='Male',
+            date_of_birth=parse_date('1990-01-01'),
+            passport_number='None'
+        )
+        self.booking1 = Booking.objects.create(
+            account=self.user,
+            flight_ticket_type=self.flighttickettype1,
+            seat_number='1',
+            status='Confirmed'
+        )
+        self.booking1.passengers.add(self.passenger1)
+        self.card1 = Card.objects.create(
+            user=self.user,
+            card_number='4111111111111111',
+            cardholder_name='Van Nguyen',
+            expiry_date=parse_date('2030-01-01'),
+            card_type='Visa'
+        )
+        self.payment1 = Payment.objects.create(
+            booking=self.booking1,
+            card=self.card1,
+            amount=1200000,
+            payment_method='Credit Card',
+            transaction_id='ABC123'
+        )
+        self.client.login(username='tester', password='12345678')
+
+    def print_ticket(self, **headers):
+        return self.client.post(reverse('print_ticket', args=[self.booking1.booking_id]), **headers)
+
+    def test_print_ticket_serves_cached_pdf_with_validators(self):
+        response = self.print_ticket()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with mock.patch('booking.tickets.html_to_pdf') as html_to_pdf:
+            again = self.print_ticket()
+            b''.join(again.streaming_content)
+        html_to_pdf.assert_not_called()
+        self.assertEqual(again['ETag'], response['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.print_ticket()['ETag']
+        response = self.client.get(
+            reverse('print_ticket', args=[self.booking1.booking_id]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_since_last_download_returns_not_modified(self):
+        last_modified = self.print_ticket()['Last-Modified']
+        response = self.client.get(
+            reverse('print_ticket', args=[self.booking1.booking_id]), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_to_ticket_data_make_a_new_version(self):
+        context = tickets.ticket_context(tickets.ticket_queryset().get(pk=self.booking1.pk))
+        version = tickets.ticket_version(context)
+        first = tickets.render_ticket(context, version)
+        self.assertTrue(first.exists())
+
+        # Changing the seats of a FlightTicketType does not change the ticket
+        self.flighttickettype1.available_seats = 3
+        self.flighttickettype1.save()
+        context = tickets.ticket_context(tickets.ticket_queryset().get(pk=self.booking1.pk))
+        self.assertEqual(tickets.ticket_version(context), version)
+
+        self.passenger1.last_name = 'Tran'
+        self.passenger1.save()
+        context = tickets.ticket_context(tickets.ticket_queryset().get(pk=self.booking1.pk))
+        new_version = tickets.ticket_version(context)
+        self.assertNotEqual(new_version, version)
+        second = tickets.render_ticket(context, new_version)
+        self.assertTrue(second.exists())
+        # The old copy is deleted once there is a new one
+        self.assertFalse(first.exists())
+
+    def test_ticket_query_count(self):
+        with self.assertNumQueries(3):
+            context = tickets.ticket_context(tickets.ticket_queryset().get(pk=self.booking1.pk))
+            tickets.ticket_version(context)
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import get_template
+from django.utils import timezone
+from .constants import PRICE_FORMAT, ISO
+from .models import Booking, Payment
+from .pdf import html_to_pdf
+
+logger = logging.getLogger(__name__)
+
+TICKET_TEMPLATE = 'ticket.html'
+
+_lock = threading.Lock()
+_executor = None
+_thread_executor = None
+_inflight = {}
+
+
+def ticket_queryset():
+    """Bookings with everything ticket.html shows, in three queries."""
+    return Booking.objects.select_related(
+        'account',
+        'flight_ticket_type__ticket_type',
+        'flight_ticket_type__flight__departure_airport',
+        'flight_ticket_type__flight__arrival_airport',
+    ).prefetch_related('passengers', 'payment_set')
+
+
+def ticket_context(ticket):
+    """Build the ticket.html context of a booking from ticket_queryset()."""
+    payments = sorted(ticket.payment_set.all(), key=lambda payment: payment.payment_id)
+    if not payments:
+        raise Payment.DoesNotExist(f"Booking {ticket.booking_id} has no payment.")
+    price = float(ticket.flight_ticket_type.price)
+    return {
+        'ticket': ticket,
+        'payment': payments[-1],
+        'flight': ticket.flight_ticket_type.flight,
+        'is_foreign': any(passenger.passport_number != 'None' for passenger in ticket.passengers.all()),
+        'current_year': timezone.now().year,
+        'initial_price': PRICE_FORMAT.format(price),
+        'total_price': PRICE_FORMAT.format(price * int(ticket.seat_number)),
+    }
+
+
+def _row(obj, fields=None, exclude=()):
+    fields = fields or [field.attname for field in obj._meta.concrete_fields if field.attname not in exclude]
+    return [obj._meta.label, [getattr(obj, name) for name in fields]]
+
+
+_template_digests = {}
+
+
+def _template_digest():
+    """Hash the ticket template's source, re-reading it only when it changes."""
+    name = get_template(TICKET_TEMPLATE).origin.name
+    mtime = os.stat(name).st_mtime_ns
+    cached = _template_digests.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(name, 'rb') as template_file:
+            cached = _template_digests[name] = (mtime, hashlib.sha256(template_file.read()).hexdigest())
+    return cached[1]
+
+
+def ticket_version(context):
+    """Hash everything a ticket's PDF depends on.
+
+    Changing the booking, its payment, its passengers, the flight or the
+    template yields a new version, and so a new file. Seat counts, the
+    account's login data and the confirmation email's sent marker are
+    left out so they do not force a re-render.
+    """
+    ticket = context['ticket']
+    flight = context['flight']
+    rows = [
+        _row(ticket, exclude=['confirmation_sent_at']),
+        _row(context['payment']),
+        _row(ticket.flight_ticket_type, ['flight_ticket_types_id', 'ticket_type_id', 'price']),
+        _row(ticket.flight_ticket_type.ticket_type),
+        _row(flight),
+        _row(flight.departure_airport),
+        _row(flight.arrival_airport),
+        _row(ticket.account, ['email', 'phone_number']),
+        [_row(passenger) for passenger in sorted(ticket.passengers.all(), key=lambda p: p.passenger_id)],
+        context['current_year'],
+        _template_digest(),
+    ]
+    raw = json.dumps(rows, cls=DjangoJSONEncoder).encode()
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def ticket_path(booking_id, version):
+    """Return where the PDF of one version of a ticket is stored."""
+    return Path(settings.TICKET_CACHE_DIR) / str(booking_id) / f"{version}.pdf"
+
+
+def _get_executor():
+    """Return the shared rendering pool, or None to render in-process."""
+    global _executor
+    if settings.TICKET_RENDER_WORKERS <= 0:
+        return None
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.TICKET_RENDER_WORKERS)
+        return _executor
+
+
+def _get_thread_executor():
+    """Return the thread pool async views schedule renders on."""
+    global _thread_executor
+    with _lock:
+        if _thread_executor is None:
+            _thread_executor = ThreadPoolExecutor(
+                max_workers=settings.TICKET_RENDER_THREADS, thread_name_prefix='ticket-render')
+        return _thread_executor
+
+
+def _reset_executor(broken):
+    global _executor
+    with _lock:
+        if _executor is broken:
+            _executor = None
+
+
+def _submit(html):
+    executor = _get_executor()
+    if executor is None:
+        future = Future()
+        try:
+            future.set_result(html_to_pdf(html, ISO))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+    try:
+        return executor.submit(html_to_pdf, html, ISO)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool once rather than failing every render.
+        _reset_executor(executor)
+        return _get_executor().submit(html_to_pdf, html, ISO)
+
+
+def _store(path, data):
+    """Write a PDF atomically and drop the booking's older versions."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_name, path)
+    for other in path.parent.glob('*.pdf'):
+        if other != path:
+            other.unlink(missing_ok=True)
+
+
+def _finish(key, path, stored, rendered):
+    try:
+        _store(path, rendered.result())
+        stored.set_result(path)
+    except BaseException as exc:
+        stored.set_exception(exc)
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def schedule_ticket(context, version=None, template=None):
+    """Start rendering a ticket unless it is cached or already rendering.
+
+    The template is rendered here, where the database is available, and
+    only the CPU-bound pisa conversion goes to the process pool. Returns a
+    Future of the PDF's path.
+    """
+    version = version or ticket_version(context)
+    path = ticket_path(context['ticket'].booking_id, version)
+    if path.exists():
+        future = Future()
+        future.set_result(path)
+        return future
+    key = str(path)
+    with _lock:
+        stored = _inflight.get(key)
+        if stored is not None:
+            return stored
+        stored = _inflight[key] = Future()
+    try:
+        html = (template or get_template(TICKET_TEMPLATE)).render(context)
+        rendered = _submit(html)
+    except BaseException as exc:
+        with _lock:
+            _inflight.pop(key, None)
+        stored.set_exception(exc)
+        return stored
+    rendered.add_done_callback(partial(_finish, key, path, stored))
+    return stored
+
+
+def render_ticket(context, version=None):
+    """Return the path of a ticket's PDF, rendering it if needed."""
+    return schedule_ticket(context, version).result()
+
+
+async def arender_ticket(context, version=None):
+    """render_ticket() for async views.
+
+    Scheduling renders the template, and the PDF too when there is no
+    process pool, so it runs on a thread pool of TICKET_RENDER_THREADS
+    rather than on the event loop; the pool bounds how many renders an
+    async worker runs at once. The conversion itself is awaited without
+    holding a thread.
+    """
+    future = await sync_to_async(
+        schedule_ticket, thread_sensitive=False, executor=_get_thread_executor())(context, version)
+    return await asyncio.wrap_future(future)
+
@@ -25,4 +25,10 @@ urlpatterns = [
 
     path('account', views.account, name='account'),
     path('update-account', views.update_account, name='update_account'),
+
+    path('metrics', views.metrics_view, name='metrics'),
+
+    path('api/connections', views.connections_view, name='connections'),
+    path('api/fare-calendar', views.fare_calendar_view, name='fare_calendar'),
+    path('api/v1/search', views.search_api_view, name='search_api'),
 ]
@@ -7,24 +7,52 @@ from .forms import *
 from .models import *
 from .constants import (
     PRICE_FORMAT, REGEX_PATTERN, REGEX_PATTERN_NAME, 
-    REGEX_PATTERN_NUMBER, REGEX_PATTERN_EMAIL, ISO
+    REGEX_PATTERN_NUMBER, REGEX_PATTERN_EMAIL, FLIGHT_LIST_PAGE_SIZE, ROUND_TRIP_PAIR_LIMIT,
+    CONNECTION_MAX_STOPS, CONNECTION_RESULT_LIMIT, FARE_CALENDAR_DAYS, FARE_CALENDAR_MAX_DAYS,
+    NDJSON_CONTENT_TYPE, SEARCH_API_CHUNK_SIZE, CONFIRMATION_EMAIL_DELAY_SECONDS
 )
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from .models import Flight, Airport
+from .inventory import InsufficientSeats, contention_stats
+from .metrics import render_prometheus, sample_rate, is_authorized
+from .tickets import ticket_queryset, ticket_context, ticket_version, arender_ticket
+from .holds import convert_holds, release_booking_seats
+from .checkout import checkout
+from .idempotency import idempotent, new_key
+from .jobs import enqueue, enqueue_once
+from .settlement import settle, clean_reference, new_reference, SettlementError
+from .search_cache import acached_search
+from .dates import local_date_q, local_day_range
+from .pagination import akeyset_paginate, filter_query
+from .listings import booking_listing, booking_queryset
+from .roundtrip import ranked_pairs, rank_key, is_valid_pair
+from .connections import find_connections
+from .fare_calendar import fare_calendar
+from .search_api import (
+    API_VERSION as SEARCH_API_VERSION, wants_ndjson, rows as search_rows, search_etag, ndjson_lines
+)
+from . import reference
 from django.db.models import Min, Q, F
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-from io import BytesIO
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+from django.db import transaction
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+import logging
+import os
 import secrets
+from itertools import islice
 import re
 from ticketbooking import settings
 from django.contrib.auth.decorators import login_required
 import pycountry
 
+logger = logging.getLogger(__name__)
+
 
 # Create your views here.
 def login_view(request):
@@ -77,31 +105,39 @@ def logout_view(request):
     logout(request)
     return HttpResponseRedirect(reverse("login"))
 
-def __get_airports():
-    """Retrieve all airports from the database."""
-    airports = Airport.objects.all().values("airport_code", "name", "city", "country")
-    return list(airports)
-
-def __get_ticket_types():
-    """Retrieve all ticket types from the database."""
-    ticket_types = TicketType.objects.all().values("ticket_type_id", "name")
-    return list(ticket_types)
-
-def __get_available_flights(departure_airport, arrival_airport, departure_date, num_passengers, chair_type_name):
-    return Flight.objects.filter(
+async def __auser(request):
+    """Load the user of an async view and keep it on request.user.
+
+    Templates read request.user through the auth context processor;
+    resolving it here means rendering never has to touch the database
+    from the event loop.
+    """
+    request.user = await request.auser()
+    return request.user
+
+async def __aget_available_flights(departure_airport, arrival_airport, departure_date, num_passengers,
+                                   chair_type_name, ticket_type_id):
+    """Return matching flights, cheapest first, through the search cache."""
+    async def compute():
+        return [flight async for flight in __query_available_flights(
+            departure_airport, arrival_airport, departure_date, num_passengers, ticket_type_id)]
+    return await acached_search(
+        departure_airport, arrival_airport, departure_date, chair_type_name, num_passengers, compute)
+
+def __query_available_flights(departure_airport, arrival_airport, departure_date, num_passengers, ticket_type_id):
+    """Read matching flights from the precomputed search index, cheapest first."""
+    return FlightSearchIndex.objects.filter(
         departure_airport=departure_airport,
         arrival_airport=arrival_airport,
-        departure_time__date=departure_date,
-        flighttickettype__available_seats__gte=num_passengers,
-        flighttickettype__ticket_type__name=chair_type_name
+        departure_date=departure_date,
+        ticket_type=ticket_type_id,
+        available_seats__gte=num_passengers
+    ).select_related(
+        "departure_airport", "arrival_airport"
     ).annotate(
-        min_price=Min(
-            "flighttickettype__price",
-            filter=Q(flighttickettype__available_seats__gte=num_passengers)
-        ),
-        ticket_type_price=F("flighttickettype__price"),
-        ticket_type_available_seats=F("flighttickettype__available_seats")
-    ).order_by("min_price")
+        ticket_type_price=F("price"),
+        ticket_type_available_seats=F("available_seats")
+    ).order_by("price", "departure_time")
 
 def __check_datetime(date):
     try:
@@ -112,99 +148,135 @@ def __check_datetime(date):
         return False
     return True
 
-def index(request):
-    context = {}
-    trip_type = request.GET.get("tripType")
-    from_airport = request.GET.get("from")
-    to_airport = request.GET.get("to")
-    departure_date = request.GET.get("departureDate")
-    return_date = request.GET.get("returnDate")
-    num_passengers = None
+def __search_params(query):
+    """Read the search fields of a query string, as the search form sends them."""
+    params = {
+        "trip_type": query.get("tripType"),
+        # Normalise the airport codes so the cache key matches the codes invalidation uses
+        "from_airport": (query.get("from") or "").strip().upper(),
+        "to_airport": (query.get("to") or "").strip().upper(),
+        "departure_date": query.get("departureDate"),
+        "return_date": query.get("returnDate"),
+        "num_passengers": None,
+        "chair_type": query.get("chairType"),
+    }
     try:
-        num_passengers = int(request.GET.get("numPassengers", 1))  # Default to 1 if not provided
+        params["num_passengers"] = int(query.get("numPassengers", 1))  # Default to 1 if not provided
     except:
-        context["error_message"] = _("Please use number only for number of passengers.")
-    chair_type_name = request.GET.get("chairType")
-
-    context.update({
-        "trip_type": trip_type,
-        "from_airport": from_airport,
-        "to_airport": to_airport,
-        "departure_date": departure_date,
-        "return_date": return_date,
-        "num_passengers": num_passengers,
-        "chair_type": chair_type_name,
-        "airports": __get_airports(),
-        "ticket_types": __get_ticket_types(),
-    })
+        pass
+    return params
+
+def __search_error(params, user, timezones):
+    """Return the message explaining why a search cannot run, or None.
+
+    timezones maps every known airport code to its time zone, as in the
+    reference data.
+    """
+    error_message = None
+    trip_type = params["trip_type"]
+    from_airport = params["from_airport"]
+    to_airport = params["to_airport"]
+    departure_date = params["departure_date"]
+    return_date = params["return_date"]
+    num_passengers = params["num_passengers"]
+    chair_type_name = params["chair_type"]
+    if num_passengers is None:
+        error_message = _("Please use number only for number of passengers.")
 
     # If required fields are missing, return to the homepage
     if not from_airport:
-        context["error_message"] = _("Please select a departure airport.")
+        error_message = _("Please select a departure airport.")
     if not to_airport:
-        context["error_message"] = _("Please select an arrival airport.")
+        error_message = _("Please select an arrival airport.")
     if not departure_date:
-        context["error_message"] = _("Please select a departure date.")
+        error_message = _("Please select a departure date.")
     if trip_type == "round" and not return_date:
-        context["error_message"] = _("Please select a return date.")
+        error_message = _("Please select a return date.")
     if not chair_type_name:
-        context["error_message"] = _("Please select a chair type.")
+        error_message = _("Please select a chair type.")
     if not num_passengers:
-        context["error_message"] = _("Please select the number of passengers.")
+        error_message = _("Please select the number of passengers.")
 
     if not from_airport and not to_airport and not departure_date and not return_date and not chair_type_name:
-        context["error_message"] = _("Fill in all the fields to search for your flights.")
+        error_message = _("Fill in all the fields to search for your flights.")
 
     elif trip_type != "round" and trip_type != "oneway":
-        context["error_message"] = _("The trip type is not valid.")
+        error_message = _("The trip type is not valid.")
 
     elif (departure_date and not __check_datetime(departure_date)) or (trip_type == "round" and return_date and not __check_datetime(return_date)):
-        context["error_message"] = _("The date is not valid.")
+        error_message = _("The date is not valid.")
 
     elif not re.match(REGEX_PATTERN_NUMBER, str(num_passengers)):
-        context["error_message"] = _("The number of passengers is not valid.")
+        error_message = _("The number of passengers is not valid.")
     
+    elif (from_airport and from_airport not in timezones) or (to_airport and to_airport not in timezones):
+        error_message = _("Please select a valid airport.")
+
     else:
         # If departure and destination are the same, return to the homepage
         if from_airport and to_airport and from_airport == to_airport:
-            context["error_message"] = _("Departure and destination airports cannot be the same.")
+            error_message = _("Departure and destination airports cannot be the same.")
 
         if return_date and departure_date and trip_type == "round" and return_date <= departure_date:
-            context["error_message"] = _("Return date cannot be less than departure date.")
-
-        if departure_date and parse_datetime(f"{departure_date}T23:59:59+0000") < timezone.now():
-            context["error_message"] = _("You cannot book flights from the past.")
-
-        if request.user.is_authenticated and request.user.status != 'Active':
-            context["error_message"] = _("You need to activate your account first.")
+            error_message = _("Return date cannot be less than departure date.")
+
+        if departure_date and local_day_range(parse_date(departure_date), timezones.get(from_airport))[1] <= timezone.now():
+            error_message = _("You cannot book flights from the past.")
+
+        if user.is_authenticated and user.status != 'Active':
+            error_message = _("You need to activate your account first.")
+    return error_message
+
+async def index(request):
+    user = await __auser(request)
+    data = await reference.aload()
+    params = __search_params(request.GET)
+    trip_type = params["trip_type"]
+    from_airport = params["from_airport"]
+    to_airport = params["to_airport"]
+    departure_date = params["departure_date"]
+    return_date = params["return_date"]
+    num_passengers = params["num_passengers"]
+    chair_type_name = params["chair_type"]
+    context = dict(params)
+    context.update({
+        "airports": data["airports"],
+        "ticket_types": data["ticket_types"],
+    })
 
-    if context.get("error_message"):
+    error_message = __search_error(params, user, data["timezones"])
+    if error_message:
+        context["error_message"] = error_message
         return render(request, "homepage.html", context)
 
     # Filter flights by chair type and available seats
-    departure_flights = __get_available_flights(from_airport, to_airport, departure_date, num_passengers, chair_type_name)
+    ticket_type_id = data["ticket_type_ids"].get(chair_type_name)
+    departure_flights = await __aget_available_flights(
+        from_airport, to_airport, departure_date, num_passengers, chair_type_name, ticket_type_id)
     if not departure_flights:
         context["error_message"] = _("No flights available with the selected criteria. Please try again.")
         return render(request, "homepage.html", context)
 
     context["departure_flights"] = departure_flights
-    for flight in departure_flights:
-        flight.ticket_type_price = PRICE_FORMAT.format(flight.ticket_type_price)
 
     # If round trip, get return flights with the same conditions
     if trip_type == "round":
-        return_flights = __get_available_flights(to_airport, from_airport, return_date, num_passengers, chair_type_name)
+        return_flights = await __aget_available_flights(
+            to_airport, from_airport, return_date, num_passengers, chair_type_name, ticket_type_id)
         if not return_flights:
             context["error_message"] = _("No return flights available with the selected criteria. Please try again.")
             return render(request, "homepage.html", context)
+        # Pair up valid departure and return flights, cheapest first
+        context["round_trip_pairs"] = list(islice(ranked_pairs(
+            sorted(departure_flights, key=rank_key), sorted(return_flights, key=rank_key)), ROUND_TRIP_PAIR_LIMIT))
         context["return_flights"] = return_flights
-        for flight in return_flights:
-            flight.ticket_type_price = PRICE_FORMAT.format(flight.ticket_type_price)
 
     return render(request, "homepage.html", context)
 
-def flight_detail(request, flight_id):
-    flight = get_object_or_404(Flight, flight_id=flight_id)
+async def flight_detail(request, flight_id):
+    await __auser(request)
+    flight = await aget_object_or_404(
+        Flight.objects.select_related('departure_airport', 'arrival_airport'), flight_id=flight_id)
     departure_airport = flight.departure_airport
     arrival_airport = flight.arrival_airport
     
@@ -216,24 +288,50 @@ def flight_detail(request, flight_id):
     
     return render(request, 'flight_detail.html', context)
 
-def flight_list(request):
-    flights = Flight.objects.all()
-    departure_date = request.GET.get('departure_date')
-    if departure_date:
-        flights = flights.filter(departure_time__date=departure_date)
+def __parse_day(value):
+    """Parse a YYYY-MM-DD query value, or return None."""
+    return parse_date(value) if value and __check_datetime(value) else None
+
+async def flight_list(request):
+    await __auser(request)
+    data = await reference.aload()
+    flights = Flight.objects.select_related('departure_airport', 'arrival_airport')
     departure_location = request.GET.get('departure_location')
     if departure_location:
         flights = flights.filter(departure_airport__city=departure_location)
-    airports = Airport.objects.values_list('city', flat=True).distinct()
+    airline = request.GET.get('airline')
+    if airline:
+        flights = flights.filter(airline=airline)
+    # departure_date is kept for links that still ask for a single day
+    date_from = request.GET.get('date_from') or request.GET.get('departure_date')
+    date_to = request.GET.get('date_to') or request.GET.get('departure_date')
+    first_day, last_day = __parse_day(date_from), __parse_day(date_to)
+    if (date_from and not first_day) or (date_to and not last_day):
+        flights = flights.none()
+    elif first_day or last_day:
+        # Match on the local date at the departure airport, as time ranges so the index is used
+        departure_airports = [
+            airport for airport in data['airports']
+            if not departure_location or airport['city'] == departure_location
+        ]
+        flights = flights.filter(local_date_q(first_day, last_day, departure_airports))
+    page = await akeyset_paginate(
+        flights, ('departure_time', 'flight_id'), FLIGHT_LIST_PAGE_SIZE,
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
     context = {
-        'flights': flights,
-        'airports': airports,
+        'flights': page,
+        'page': page,
+        'filter_query': filter_query(request.GET),
+        'date_from': date_from,
+        'date_to': date_to,
+        'airports': data['cities'],
     }
     return render(request, 'flight_list.html', context)
 @login_required
 def user_bookings(request):
-    bookings = Booking.objects.filter(account=request.user)
-    return render(request, 'user_bookings.html', {'bookings': bookings})
+    context = booking_listing(booking_queryset(account=request.user), request.GET)
+    return render(request, 'user_bookings.html', context)
 
 @login_required
 def cancel_booking(request, booking_id):
@@ -253,8 +351,10 @@ def is_admin(user):
 @login_required
 @user_passes_test(is_admin, '/booking/logout')
 def pending_cancellations(request):
-    bookings = Booking.objects.filter(status="PendingCancellation")
-    return render(request, 'pending_cancellations.html', {'bookings': bookings})
+    params = request.GET.copy()
+    params.pop('status', None)
+    context = booking_listing(booking_queryset(status="PendingCancellation"), params)
+    return render(request, 'pending_cancellations.html', context)
 
 @login_required
 @user_passes_test(is_admin, '/booking/logout')
@@ -265,7 +365,7 @@ def approve_cancellation(request, booking_id):
         messages.error(request, _("This booking cannot be approved."))
         return redirect('pending_cancellations')
     booking.set_status("Canceled")  
-    booking.flight_ticket_type.release_seat(int(booking.seat_number))
+    release_booking_seats(booking)
     booking.save()
     messages.success(request, _("Cancellation approved successfully."))
     return redirect('pending_cancellations')
@@ -355,7 +455,7 @@ def book_infor_view(request):
             elif flight2.arrival_airport.airport_code != flight1.departure_airport.airport_code:
                 messages.error(request, _("Airports are mismatch."))
                 return redirect(reverse('index'))
-            elif flight2.departure_time <= flight1.arrival_time:
+            elif not is_valid_pair(flight1, flight2):
                 messages.error(request, _("Return flight is sooner than departure flight."))
                 return redirect(reverse('index'))
             elif flight2.departure_time <= timezone.now():
@@ -375,7 +475,8 @@ def book_infor_view(request):
                 "total_price": PRICE_FORMAT.format((float(flight1price) + float(flight2price)) * int(request.GET.get('num_passengers'))),
                 "phone_number": request.user.phone_number[1:],
                 "email": request.user.email,
-                "real_price": (float(flight1price) + float(flight2price)) * int(request.GET.get('num_passengers'))
+                "real_price": (float(flight1price) + float(flight2price)) * int(request.GET.get('num_passengers')),
+                "idempotency_key": new_key()
             })
         return render(request, "book_infor.html", {
             'flight1': flight1,
@@ -388,29 +489,14 @@ def book_infor_view(request):
             "total_price": PRICE_FORMAT.format(float(flight1price) * int(request.GET.get('num_passengers'))),
             "phone_number": request.user.phone_number[1:],
             "email": request.user.email,
-            "real_price": float(flight1price) * int(request.GET.get('num_passengers'))
+            "real_price": float(flight1price) * int(request.GET.get('num_passengers')),
+            "idempotency_key": new_key()
         })
     else:
         return redirect(reverse("login"))
 
-def __create_ticket(user, passengers, passengerscount, flight, flight_class, countrycode, mobile, email):
-    booking = Booking.objects.create(
-        account=user, 
-        flight_ticket_type=FlightTicketType.objects.get(flight=flight, ticket_type__name=flight_class)
-    )
-    booking.seat_number = passengerscount
-    for passenger in passengers:
-        booking.passengers.add(passenger)
-    flightTicket = FlightTicketType.objects.get(flight=flight, ticket_type__name=flight_class)
-    booking.flight_ticket_type = flightTicket
-    phone_number = f"0{mobile}"
-    booking.account.phone_number = phone_number
-    booking.account.email = email
-    booking.account.save()
-    booking.save()
-    return booking
-
 @user_passes_test(is_active, '/booking/login')
+@idempotent
 def payment_view(request):
     if request.method == 'POST':
         if request.user.is_authenticated:
@@ -454,7 +540,7 @@ def payment_view(request):
                         raise ValidationError("Flight from the past.")
                     elif flight2.departure_airport != flight1.arrival_airport or flight2.arrival_airport != flight1.departure_airport:
                         raise ValidationError("Airport mismatch.")
-                    elif flight2.departure_time <= flight1.arrival_time:
+                    elif not is_valid_pair(flight1, flight2):
                         raise ValidationError("Flight 2 is sooner than flight 1.")
                 except:
                     messages.error(request, _("The return flight is not valid."))
@@ -521,7 +607,7 @@ def payment_view(request):
                         coi = 'None'
                         expire = timezone.now()
                     if proceed:
-                        passengers.append(Passenger.objects.create(
+                        passengers.append(Passenger(
                             first_name=fname,
                             last_name=lname,
                             gender=gender.capitalize(),
@@ -533,11 +619,19 @@ def payment_view(request):
                         ))
                 if not proceed:
                     return redirect(request.META.get('HTTP_REFERER', '/'))
-                ticket1 = __create_ticket(request.user,passengers,passengerscount,flight1,flight_1class,countrycode,mobile,email)
+                legs = [(flight1, flight_1class)]
+                if f2:
+                    legs.append((flight2, flight_2class))
+                # Passengers, bookings and seat holds are written together or not at all
+                tickets = checkout(request.user, passengers, passengerscount, legs, f"0{mobile}", email)
+                ticket1 = tickets[0]
                 price = str(float(ticket1.flight_ticket_type.price))
                 if f2:
-                    ticket2 = __create_ticket(request.user,passengers,passengerscount,flight2,flight_2class,countrycode,mobile,email)
+                    ticket2 = tickets[1]
                     price = str(float(ticket1.flight_ticket_type.price) + float(ticket2.flight_ticket_type.price))
+            except InsufficientSeats as e:
+                messages.error(request, e.args[0])
+                return redirect(request.META.get('HTTP_REFERER', '/'))
             except Exception as e:
                 messages.error(request, _("Your information is not valid. Please try again."))
                 return redirect(request.META.get('HTTP_REFERER', '/'))
@@ -547,19 +641,34 @@ def payment_view(request):
                     "ticket1": ticket1.booking_id,
                     "ticket2": ticket2.booking_id,
                     "price": PRICE_FORMAT.format(float(price)),
-                    "real_price": price
+                    "real_price": price,
+                    "transaction_id": new_reference(),
+                    "idempotency_key": new_key()
                 })  ##
             return render(request, "payment.html", {
                 "ticket1": ticket1.booking_id,
                 "price": PRICE_FORMAT.format(float(price)),
-                "real_price": price
+                "real_price": price,
+                "transaction_id": new_reference(),
+                "idempotency_key": new_key()
             })
         else:
             return HttpResponseRedirect(reverse("login"))
     else:
         return redirect(reverse('index'))
 
+def __render_payment(request, ticket1_id, ticket2_id, fare):
+    return render(request, 'payment.html', {
+        "ticket1": ticket1_id,
+        "ticket2": ticket2_id,
+        "price": PRICE_FORMAT.format(float(fare)),
+        "real_price": fare,
+        "transaction_id": clean_reference(request.POST.get('transactionId')),
+        "idempotency_key": new_key()
+    })
+
 @user_passes_test(is_active, '/booking/login')
+@idempotent
 def process_view(request):
     if request.user.is_authenticated:
         if request.method == 'POST':
@@ -567,24 +676,26 @@ def process_view(request):
             ticket1_id = request.POST['ticket1']
             ticket = None
             try:
-                ticket = Booking.objects.get(booking_id=ticket1_id)
+                ticket = Booking.objects.select_related('flight_ticket_type').get(booking_id=ticket1_id)
             except:
                 messages.error(request, _('This ticket is not exist.'))
                 proceed = False
-            if ticket and (ticket.status != _('PendingCancellation') or ticket.account != request.user):
+            # settle checks the booking status under the lock, so a repeated payment still gets the earlier result
+            if ticket and ticket.account != request.user:
                 messages.error(request, _('This ticket is not valid.'))
                 proceed = False   
             t2 = False
-            if request.POST.get('ticket2'):
+            # A return booking equal to the departure one is a one-way trip, so it is not charged twice
+            if request.POST.get('ticket2') and request.POST['ticket2'] != ticket1_id:
                 ticket2_id = request.POST['ticket2']
                 ticket2 = None
                 try:
-                    ticket2 = Booking.objects.get(booking_id=ticket2_id)
+                    ticket2 = Booking.objects.select_related('flight_ticket_type').get(booking_id=ticket2_id)
                 except:
                     messages.error(request, _('This ticket is not exist.'))
                     proceed = False
                 t2 = True
-                if ticket2 and (ticket2.status != _('PendingCancellation') or ticket2.account != request.user):
+                if ticket2 and ticket2.account != request.user:
                     messages.error(request, _('This ticket is not valid.'))
                     proceed = False
             fare = '-1'
@@ -641,116 +752,68 @@ def process_view(request):
                 messages.error(request, _("Your card's type is not valid."))
                 proceed = False
             if not proceed:
-                if t2:
-                    return render(request, 'payment.html', {
-                        "ticket1": ticket1_id,
-                        "ticket2": ticket2_id,
-                        "price": PRICE_FORMAT.format(float(fare)),
-                        "real_price": fare
-                    })
-                return render(request, 'payment.html', {
-                    "ticket1": ticket1_id,
-                    "price": PRICE_FORMAT.format(float(fare)),
-                    "real_price": fare
-                })
+                return __render_payment(request, ticket1_id, ticket2_id if t2 else None, fare)
             try:
-                card = Card.objects.filter(user=request.user).exists()
-                if card:
-                    card = Card.objects.get(user=request.user)
-                else:
-                    card = Card.objects.create(user=request.user, expiry_date=timezone.now())
-                card.card_number = card_number
-                card.card_type = card_type
-                card.cardholder_name = card_holder_name
-                card.expiry_date = expiry_date
-                card.save()
-
-                ticket = Booking.objects.get(booking_id=ticket1_id)
-                ticket.status = 'Confirmed'
-                ticket.booking_date = timezone.now()
-                ticket.flight_ticket_type.book_seat(int(ticket.seat_number))
-                ticket.flight_ticket_type.save()
-                ticket.save()
-                payment = Payment.objects.filter(booking=ticket).exists()
-                if payment:
-                    payment = Payment.objects.get(booking=ticket)
-                else:
-                    payment = Payment.objects.create(booking=ticket,card=card,amount=fare)
-                    payment.transaction_id = secrets.token_hex(3).upper()
-                payment.card = card
-                payment.amount = fare
-                payment.payment_method = 'Credit Card'
-                id1 = payment.transaction_id
-                payment.save()
+                booking_ids = [ticket1_id, ticket2_id] if t2 else [ticket1_id]
+                tickets, payments = settle(
+                    request.user, booking_ids, card_number, card_type, card_holder_name,
+                    expiry_date, fare, clean_reference(request.POST.get('transactionId'))
+                )
+                # Ticket PDFs are rendered by the background worker, off the payment page
+                enqueue('render_tickets', {'booking_ids': [t.booking_id for t in tickets]})
+                # Confirmation emails are batched, several payments share one SMTP connection
+                enqueue_once('send_confirmations', delay=CONFIRMATION_EMAIL_DELAY_SECONDS)
                 if t2:
-                    ticket2 = Booking.objects.get(booking_id=ticket2_id)
-                    ticket2.status = 'Confirmed'
-                    ticket2.booking_date = timezone.now()
-                    ticket2.flight_ticket_type.book_seat(int(ticket2.seat_number))
-                    ticket2.flight_ticket_type.save()
-                    ticket2.save()
-                    payment2 = Payment.objects.filter(booking=ticket2).exists()
-                    if payment2:
-                        payment2 = Payment.objects.get(booking=ticket2)
-                    else:
-                        payment2 = Payment.objects.create(booking=ticket2,card=card,amount=fare)
-                        payment2.transaction_id = secrets.token_hex(3).upper()
-                    payment2.card = card
-                    payment2.amount = fare
-                    payment2.payment_method = 'Credit Card'
-                    id2 = payment2.transaction_id
-                    payment2.save()
                     return render(request, 'payment_process.html', {
-                        'ticket1': ticket,
-                        'ticket2': ticket2,
-                        'ref1': id1,
-                        'ref2': id2
+                        'ticket1': tickets[0],
+                        'ticket2': tickets[1],
+                        'ref1': payments[0].transaction_id,
+                        'ref2': payments[1].transaction_id
                     })
                 return render(request, 'payment_process.html', {
-                    'ticket1': ticket,
+                    'ticket1': tickets[0],
                     'ticket2': "",
-                    'ref1': id1,
+                    'ref1': payments[0].transaction_id,
                     'ref2': ""
                 })
-            except Exception as e:
-                return HttpResponse(e)
+            except (InsufficientSeats, SettlementError) as e:
+                messages.error(request, e.args[0])
+                return __render_payment(request, ticket1_id, ticket2_id if t2 else None, fare)
+            except Exception:
+                # Answer with a 5xx so @idempotent does not store the failure and the customer can pay again
+                logger.exception("Could not process the payment of booking %s.", ticket1_id)
+                return HttpResponse(_("The payment could not be processed. Please try again."), status=500)
         else:
             return redirect(reverse('index'))
     else:
         return HttpResponseRedirect(reverse('login'))
 
-def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html = template.render(context_dict)
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode(ISO)), result)
-    if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
-    return None
-
 @csrf_exempt
-@user_passes_test(is_active, '/booking/login')
-def print_ticket(request, booking_id):
-    ticket = Booking.objects.get(booking_id=booking_id)
-    payment = Payment.objects.get(booking_id=booking_id)
-    flight = ticket.flight_ticket_type.flight
-    is_foreign = False
-    for passenger in ticket.passengers.all():
-        if passenger.passport_number != 'None':
-            is_foreign = True
-            break
-    data = {
-        'ticket': ticket,
-        'payment': payment,
-        'flight': flight,
-        'is_foreign': is_foreign,
-        'current_year': timezone.now().year,
-        'initial_price': PRICE_FORMAT.format(float(ticket.flight_ticket_type.price)),
-        'total_price': PRICE_FORMAT.format(float(ticket.flight_ticket_type.price) 
-                                           * int(ticket.seat_number))
-    }
-    pdf = render_to_pdf('ticket.html', data)
-    return HttpResponse(pdf, content_type='application/pdf')
+async def print_ticket(request, booking_id):
+    # user_passes_test only wraps sync views in Django 5.0, so check directly
+    if not is_active(await __auser(request)):
+        return redirect_to_login(request.get_full_path(), '/booking/login')
+    ticket = await aget_object_or_404(ticket_queryset(), booking_id=booking_id)
+    context = ticket_context(ticket)
+    version = ticket_version(context)
+    etag = quote_etag(version)
+    # An unchanged ticket is served from the browser cache without rendering it again
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    path = await arender_ticket(context, version)
+    ticket_file = open(path, 'rb')
+    # Take the mtime from the open file: an old copy can be deleted right after opening
+    last_modified = int(os.fstat(ticket_file.fileno()).st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        ticket_file.close()
+        return not_modified
+    response = FileResponse(ticket_file, content_type='application/pdf')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @login_required
 def account(request):
@@ -779,3 +842,145 @@ def update_account(request):
         form = UpdateAccountForm(instance=request.user)
 
     return render(request, 'update_account.html', {'form': form, 'countries': countries, 'user': user})
+
+def metrics_view(request):
+    """Expose the request metrics of this process to Prometheus."""
+    if not is_authorized(request):
+        return HttpResponse(status=403)
+    counters = {
+        f'booking_inventory_{name}_total': (f'Seat inventory {name.replace("_", " ")} in this process.', value)
+        for name, value in contention_stats().items()
+    }
+    gauges = {
+        'booking_metrics_sample_rate': (
+            'Share of requests measured by the metrics middleware.',
+            sample_rate()
+        ),
+    }
+    return HttpResponse(
+        render_prometheus(counters=counters, gauges=gauges),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+def connections_view(request):
+    """Return direct, one-stop and two-stop itineraries for a route and day as JSON."""
+    from_airport = request.GET.get('from', '').upper()
+    to_airport = request.GET.get('to', '').upper()
+    day = __parse_day(request.GET.get('date'))
+    ticket_type_id = reference.get_ticket_type_id(request.GET.get('chairType', ''))
+    try:
+        num_passengers = int(request.GET.get('numPassengers', 1))
+        max_stops = min(int(request.GET.get('maxStops', CONNECTION_MAX_STOPS)), CONNECTION_MAX_STOPS)
+        limit = min(int(request.GET.get('limit', CONNECTION_RESULT_LIMIT)), CONNECTION_RESULT_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': str(_("Please use numbers only."))}, status=400)
+    if not from_airport or not to_airport or from_airport == to_airport:
+        return JsonResponse({'error': str(_("Please select two different airports."))}, status=400)
+    if day is None:
+        return JsonResponse({'error': str(_("The date is not valid."))}, status=400)
+    if ticket_type_id is None:
+        return JsonResponse({'error': str(_("Seat type is not valid."))}, status=400)
+    if num_passengers < 1 or max_stops < 0 or limit < 1:
+        return JsonResponse({'error': str(_("Please use positive numbers only."))}, status=400)
+    results, complete = find_connections(
+        from_airport, to_airport, day, ticket_type_id, num_passengers, max_stops=max_stops, limit=limit)
+    flight_numbers = dict(Flight.objects.filter(
+        flight_id__in=[leg.flight_id for _itinerary, legs in results for leg in legs]
+    ).values_list('flight_id', 'flight_number'))
+    return JsonResponse({
+        'complete': complete,
+        'itineraries': [
+            {
+                'price': itinerary.price,
+                'duration_minutes': itinerary.duration // 60,
+                'stops': len(legs) - 1,
+                'legs': [
+                    {
+                        'flight_id': leg.flight_id,
+                        'flight_number': flight_numbers.get(leg.flight_id),
+                        'from': leg.departure_airport,
+                        'to': leg.arrival_airport,
+                        'departure_time': leg.departure_time.isoformat(),
+                        'arrival_time': leg.arrival_time.isoformat(),
+                        'price': leg.price,
+                    }
+                    for leg in legs
+                ],
+            }
+            for itinerary, legs in results
+        ],
+    })
+
+def fare_calendar_view(request):
+    """Return the lowest price of each day around a date for a route as JSON."""
+    from_airport = request.GET.get('from', '').upper()
+    to_airport = request.GET.get('to', '').upper()
+    day = __parse_day(request.GET.get('date'))
+    ticket_type_id = reference.get_ticket_type_id(request.GET.get('chairType', ''))
+    try:
+        num_passengers = int(request.GET.get('numPassengers', 1))
+        days = min(int(request.GET.get('days', FARE_CALENDAR_DAYS)), FARE_CALENDAR_MAX_DAYS)
+    except ValueError:
+        return JsonResponse({'error': str(_("Please use numbers only."))}, status=400)
+    if not from_airport or not to_airport or from_airport == to_airport:
+        return JsonResponse({'error': str(_("Please select two different airports."))}, status=400)
+    if day is None:
+        return JsonResponse({'error': str(_("The date is not valid."))}, status=400)
+    if ticket_type_id is None:
+        return JsonResponse({'error': str(_("Seat type is not valid."))}, status=400)
+    if num_passengers < 1 or days < 0:
+        return JsonResponse({'error': str(_("Please use positive numbers only."))}, status=400)
+    airport_timezone = reference.get_airport_timezone(from_airport)
+    now = timezone.now()
+    return JsonResponse({
+        'days': [
+            {
+                'date': fare.date.isoformat(),
+                # Past days are no longer on sale
+                'lowest_price': None if fare.lowest_price is None or local_day_range(
+                    fare.date, airport_timezone)[1] <= now else int(fare.lowest_price),
+                'flights': fare.flights,
+            }
+            for fare in fare_calendar(from_airport, to_airport, day, ticket_type_id, num_passengers, days)
+        ],
+    })
+
+def search_api_view(request):
+    """Search flights like the homepage does and return them as JSON or NDJSON."""
+    params = __search_params(request.GET)
+    error_message = __search_error(params, request.user, reference.get_airport_timezones())
+    if error_message:
+        return JsonResponse({'error': str(error_message)}, status=400)
+    from_airport, to_airport = params["from_airport"], params["to_airport"]
+    num_passengers, chair_type_name = params["num_passengers"], params["chair_type"]
+    ticket_type_id = reference.get_ticket_type_id(chair_type_name)
+    directions = [('departure', from_airport, to_airport, params["departure_date"])]
+    if params["trip_type"] == "round":
+        directions.append(('return', to_airport, from_airport, params["return_date"]))
+    querysets = [
+        (direction, search_rows(__query_available_flights(
+            departure_airport, arrival_airport, day, num_passengers, ticket_type_id)))
+        for direction, departure_airport, arrival_airport, day in directions
+    ]
+    ndjson = wants_ndjson(request)
+    if ndjson:
+        # One pass computes the ETag, a second one streams to the client
+        etag = search_etag([
+            (direction, queryset.iterator(chunk_size=SEARCH_API_CHUNK_SIZE)) for direction, queryset in querysets
+        ], params, ndjson)
+    else:
+        results = [(direction, list(queryset)) for direction, queryset in querysets]
+        etag = search_etag(results, params, ndjson)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    if ndjson:
+        response = StreamingHttpResponse(ndjson_lines(querysets), content_type=NDJSON_CONTENT_TYPE)
+    else:
+        response = JsonResponse({
+            'version': SEARCH_API_VERSION,
+            **{f'{direction}_flights': rows for direction, rows in results},
+        })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
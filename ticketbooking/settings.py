@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'booking.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +60,7 @@ ROOT_URLCONF = 'ticketbooking.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'booking.metrics.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'booking/templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -92,6 +93,82 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The default cache holds the reference-data version and the search route
+# versions, so it must be shared by every worker process for changes to airports,
+# ticket types, seats and prices to reach them all. It is a file-based cache under var/cache by default, which all processes
+# on one host see; set DEFAULT_CACHE_BACKEND/LOCATION for memcached, redis or
+# the database when workers run on several hosts.
+# The search cache only holds results and can stay per-process, or be moved to a
+# shared backend, e.g.
+# django.core.cache.backends.filebased.FileBasedCache with a directory, or
+# django.core.cache.backends.db.DatabaseCache with a table made by createcachetable.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DEFAULT_CACHE_BACKEND') or 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('DEFAULT_CACHE_LOCATION') or os.path.join(BASE_DIR, 'var', 'cache', 'default'),
+    },
+    'search': {
+        'BACKEND': os.getenv('SEARCH_CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('SEARCH_CACHE_LOCATION') or 'flight-search',
+    },
+}
+
+SEARCH_CACHE_FRESH_SECONDS = int(os.getenv('SEARCH_CACHE_FRESH_SECONDS') or 60)
+
+SEARCH_CACHE_STALE_SECONDS = int(os.getenv('SEARCH_CACHE_STALE_SECONDS') or 300)
+
+
+# Metrics
+# Share of requests measured by booking.middleware.MetricsMiddleware (0 turns it
+# off). The Prometheus endpoint at /booking/metrics requires
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set; without one it is
+# only open with DEBUG on or to staff users.
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE') or 1.0)
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or ''
+
+
+# Tickets
+# Rendered ticket PDFs are kept under TICKET_CACHE_DIR, one file per booking and
+# content version. TICKET_RENDER_WORKERS processes run the PDF conversion; 0
+# renders inside the request instead. Async views hand renders to a pool of
+# TICKET_RENDER_THREADS threads.
+
+TICKET_CACHE_DIR = os.getenv('TICKET_CACHE_DIR') or os.path.join(BASE_DIR, 'var', 'tickets')
+
+TICKET_RENDER_WORKERS = int(os.getenv('TICKET_RENDER_WORKERS') or (os.cpu_count() or 1))
+
+TICKET_RENDER_THREADS = int(os.getenv('TICKET_RENDER_THREADS') or 4)
+
+
+# Email
+# Booking confirmations are sent over SMTP when EMAIL_HOST is set; without it
+# they are written as files under EMAIL_FILE_PATH so everything runs locally.
+
+EMAIL_HOST = os.getenv('EMAIL_HOST') or ''
+
+EMAIL_PORT = int(os.getenv('EMAIL_PORT') or 587)
+
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER') or ''
+
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD') or ''
+
+EMAIL_USE_TLS = (os.getenv('EMAIL_USE_TLS') or '1') == '1'
+
+EMAIL_BACKEND = (
+    'django.core.mail.backends.smtp.EmailBackend' if EMAIL_HOST
+    else 'django.core.mail.backends.filebased.EmailBackend'
+)
+
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH') or os.path.join(BASE_DIR, 'var', 'mail')
+
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL') or 'no-reply@ticketbooking.local'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 